@@ -1,47 +1,132 @@
-from typing import Any, Generator, Optional
+from typing import Any, Callable, Generator
 
 from databases import Database
-from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
-from jose import jwt
+from fastapi import Body, Depends, HTTPException, Query, Request, status
+from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from pydantic import ValidationError
 
 from app import crud, schemas
 from app.core import security
 from app.core.config import settings
+from app.core.throttling import ThrottleRule, throttler
+from app.core.tokens import InvalidTokenError
+from app.db.database import (
+    DatabaseSession,
+    detached_reader,
+    postgres_pool,
+    replica_router,
+)
+from app.schemas.mapper import RowMapper
+from app.services.token_revocation import token_revocation
 
 reusable_oauth2 = OAuth2PasswordBearer(
     tokenUrl=f"{settings.API_V1_STR}/login/access-token"
 )
 
+login_ip_throttle = ThrottleRule(
+    name="login:ip",
+    limit=settings.LOGIN_THROTTLE_PER_IP,
+    window=settings.LOGIN_THROTTLE_WINDOW,
+)
+login_account_throttle = ThrottleRule(
+    name="login:account",
+    limit=settings.LOGIN_THROTTLE_PER_ACCOUNT,
+    window=settings.LOGIN_THROTTLE_WINDOW,
+)
+password_recovery_ip_throttle = ThrottleRule(
+    name="password-recovery:ip",
+    limit=settings.PASSWORD_RECOVERY_THROTTLE_PER_IP,
+    window=settings.PASSWORD_RECOVERY_THROTTLE_WINDOW,
+)
+password_recovery_account_throttle = ThrottleRule(
+    name="password-recovery:account",
+    limit=settings.PASSWORD_RECOVERY_THROTTLE_PER_ACCOUNT,
+    window=settings.PASSWORD_RECOVERY_THROTTLE_WINDOW,
+)
+
 
 async def get_db_pg() -> Generator:
     """
-    Connect to database. After response disconnect from database.
+    Open a request-scoped session over the application pools.
+    Connections are borrowed on first use and returned after response.
     """
-    db: Optional[Database] = None
+    db = DatabaseSession(postgres_pool, replica_router, detached=detached_reader)
     try:
-        db = Database(settings.POSTGRES_URL)
-        await db.connect()
         yield db
     finally:
-        if db is not None:
-            await db.disconnect()
+        await db.close()
 
 
-async def get_request_user(
+SPARSE_FIELDS_DESCRIPTION = "Comma-separated fields to return, all by default"
+
+
+def sparse_fields(mapper: RowMapper) -> Callable[..., RowMapper]:
+    """
+    Dependency narrowing `mapper` to the comma-separated `fields` query parameter.
+    """
+
+    def get_fields_mapper(
+        fields: str | None = Query(None, description=SPARSE_FIELDS_DESCRIPTION),
+    ) -> RowMapper:
+        if not fields:
+            return mapper
+        try:
+            return mapper.only(fields.split(","))
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+
+    return get_fields_mapper
+
+
+def get_client_address(request: Request) -> str:
+    """
+    Address of the client, the last X-Forwarded-For hop not added by a
+    proxy in `settings.TRUSTED_PROXIES`.
+    """
+    address = request.client.host if request.client else "unknown"
+    forwarded = request.headers.get("x-forwarded-for", "")
+    hops = [hop.strip() for hop in forwarded.split(",") if hop.strip()]
+    while address in settings.TRUSTED_PROXIES and hops:
+        address = hops.pop()
+    return address
+
+
+async def throttle_login(
+    request: Request, form_data: OAuth2PasswordRequestForm = Depends()
+) -> None:
+    """
+    Reject excess attempts before the password is hashed or the user loaded.
+    """
+    await throttler.hit(login_ip_throttle, get_client_address(request))
+    await throttler.hit(login_account_throttle, form_data.username.lower())
+
+
+async def throttle_password_recovery(request: Request, email: str = Body(...)) -> None:
+    await throttler.hit(password_recovery_ip_throttle, get_client_address(request))
+    await throttler.hit(password_recovery_account_throttle, email.lower())
+
+
+async def get_request_token(
     db: Database = Depends(get_db_pg), token: str = Depends(reusable_oauth2)
-) -> Any:
+) -> schemas.TokenPayload:
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail="Could not validate credentials",
+    )
     try:
-        payload = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[security.ENCODING_ALGORITHM]
-        )
-        token_data = schemas.TokenPayload(**payload)
-    except (jwt.JWTError, ValidationError):
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Could not validate credentials",
-        )
+        token_data = security.decode_access_token(token)
+    except (InvalidTokenError, ValidationError):
+        raise credentials_exception
+    if token_data.jti is not None:
+        if await token_revocation.is_revoked(db, token_data.jti):
+            raise credentials_exception
+    return token_data
+
+
+async def get_request_user(
+    db: Database = Depends(get_db_pg),
+    token_data: schemas.TokenPayload = Depends(get_request_token),
+) -> Any:
     user = await crud.user.get(db, model_id=token_data.sub)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -57,10 +142,36 @@ async def get_request_active_user(
 
 
 async def get_request_active_superuser(
-    request_user: Any = Depends(get_request_active_user),
-) -> Any:
-    if not request_user.is_superuser:
+    db: Database = Depends(get_db_pg),
+    token_data: schemas.TokenPayload = Depends(get_request_token),
+) -> schemas.TokenPayload:
+    """
+    Tokens with authorization claims are checked against the cached
+    token_version only, other tokens load the user.
+    Returns the token payload, with the claims of the user for the latter.
+    """
+    if token_data.token_version is None:
+        user = await get_request_active_user(await get_request_user(db, token_data))
+        token_data = token_data.copy(
+            update={
+                "is_active": user.is_active,
+                "is_superuser": user.is_superuser,
+                "token_version": user.token_version,
+            }
+        )
+    else:
+        token_version = await crud.user.get_token_version(db, model_id=token_data.sub)
+        if token_version is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        if token_version != token_data.token_version:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Could not validate credentials",
+            )
+        if not token_data.is_active:
+            raise HTTPException(status_code=400, detail="Inactive user")
+    if not token_data.is_superuser:
         raise HTTPException(
             status_code=400, detail="The user doesn't have enough privileges"
         )
-    return request_user
+    return token_data
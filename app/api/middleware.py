@@ -0,0 +1,366 @@
+import functools
+import logging
+import re
+import time
+import uuid
+import zlib
+from typing import Callable
+
+import orjson
+from asyncpg import (
+    CannotConnectNowError,
+    DataError,
+    IntegrityConstraintViolationError,
+    InterfaceError,
+    PostgresConnectionError,
+    QueryCanceledError,
+    TooManyConnectionsError,
+    UniqueViolationError,
+)
+from fastapi import status
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# Checked in order, the first matching class wins. Database errors only:
+# other socket errors and timeouts are not the database's and give 500
+ERROR_STATUS_CODES: list[tuple[tuple[type[BaseException], ...], int, str]] = [
+    ((UniqueViolationError,), status.HTTP_409_CONFLICT, "Already exists"),
+    (
+        (IntegrityConstraintViolationError, DataError),
+        status.HTTP_422_UNPROCESSABLE_ENTITY,
+        "Invalid data",
+    ),
+    ((QueryCanceledError,), status.HTTP_504_GATEWAY_TIMEOUT, "Database timed out"),
+    (
+        (
+            InterfaceError,
+            PostgresConnectionError,
+            CannotConnectNowError,
+            TooManyConnectionsError,
+        ),
+        status.HTTP_503_SERVICE_UNAVAILABLE,
+        "Database is unavailable, try again later",
+    ),
+]
+
+REQUEST_ID_PATTERN = re.compile(r"[\w\-.:]{1,128}")
+
+
+def error_status(exc: BaseException) -> tuple[int, str]:
+    for classes, status_code, detail in ERROR_STATUS_CODES:
+        if isinstance(exc, classes):
+            return status_code, detail
+    return status.HTTP_500_INTERNAL_SERVER_ERROR, "Internal server error"
+
+
+class RequestContextMiddleware:
+    def __init__(self, app: ASGIApp, header: str = "X-Request-ID") -> None:
+        """
+        Tag each request with an id and report how long it took.
+        The client's id is kept when it looks sane, otherwise a new one is made.
+        The id is stored in `request.state.request_id` and echoed in `header`,
+        the duration is sent as `Server-Timing: app;dur=<ms>`.
+
+        **Parameters**
+
+        * `app`: Wrapped ASGI application
+        * `header`: Request and response header carrying the id
+        """
+        self.app = app
+        self.header = header.lower().encode()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        request_id = next(
+            (
+                value.decode("latin-1")
+                for name, value in scope["headers"]
+                if name == self.header
+            ),
+            "",
+        )
+        if not REQUEST_ID_PATTERN.fullmatch(request_id):
+            request_id = uuid.uuid4().hex
+        scope.setdefault("state", {})["request_id"] = request_id
+
+        async def send_with_context(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                headers.append(self.header.decode(), request_id)
+                duration = (time.perf_counter() - started) * 1000
+                headers.append("Server-Timing", f"app;dur={duration:.2f}")
+            await send(message)
+
+        await self.app(scope, receive, send_with_context)
+
+
+class ErrorMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        """
+        Turn exceptions not handled by the exception handlers into JSON
+        responses: unique violations into 409, cancelled queries into 504,
+        lost database connections into 503 and anything else into 500.
+
+        **Parameters**
+
+        * `app`: Wrapped ASGI application
+        """
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response_started = False
+
+        async def send_tracking(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_tracking)
+        except Exception as exc:
+            status_code, detail = error_status(exc)
+            if status_code >= status.HTTP_500_INTERNAL_SERVER_ERROR:
+                logger.exception("%s %s failed", scope["method"], scope["path"])
+            if response_started:
+                # Too late for an error response, let the server drop the connection
+                raise
+            body = orjson.dumps({"detail": detail})
+            await send(
+                {
+                    "type": "http.response.start",
+                    "status": status_code,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode()),
+                    ],
+                }
+            )
+            await send({"type": "http.response.body", "body": body})
+
+
+class GzipCompressor:
+    encoding = "gzip"
+
+    def __init__(self, level: int) -> None:
+        # wbits 31: zlib stream with a gzip header and trailer
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        """
+        Compress a chunk and flush it, so streamed chunks reach the client
+        without waiting for the next one.
+        """
+        return self._compressor.compress(data) + self._compressor.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class BrotliCompressor:
+    """
+    Requires the `brotli` package.
+    """
+
+    encoding = "br"
+
+    def __init__(self, level: int) -> None:
+        import brotli
+
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self) -> bytes:
+        return self._compressor.finish()
+
+
+def available_compressors() -> dict[str, type]:
+    """
+    Supported encodings in order of preference.
+    """
+    compressors: dict[str, type] = {}
+    try:
+        import brotli  # noqa: F401
+    except ImportError:
+        pass
+    else:
+        compressors[BrotliCompressor.encoding] = BrotliCompressor
+    compressors[GzipCompressor.encoding] = GzipCompressor
+    return compressors
+
+
+def negotiate_encoding(accept_encoding: str, encodings: list[str]) -> str | None:
+    """
+    The encoding from `encodings` the client accepts with the highest weight,
+    earlier `encodings` win ties. None when the client accepts none of them.
+    """
+    weights: dict[str, float] = {}
+    for item in accept_encoding.lower().split(","):
+        name, _, params = item.partition(";")
+        weight = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    weight = float(value)
+                except ValueError:
+                    weight = 0.0
+        weights[name.strip()] = weight
+    wildcard = weights.get("*", 0.0)
+    best, best_weight = None, 0.0
+    for encoding in encodings:
+        weight = weights.get(encoding, wildcard)
+        if weight > best_weight:
+            best, best_weight = encoding, weight
+    return best
+
+
+class CompressionMiddleware:
+    def __init__(
+        self,
+        app: ASGIApp,
+        *,
+        minimum_size: int = 1000,
+        levels: dict[str, int] | None = None,
+        cached_paths: list[str] | None = None,
+    ) -> None:
+        """
+        Compress responses with the best encoding the client accepts.
+        Streamed responses are compressed chunk by chunk.
+
+        **Parameters**
+
+        * `app`: Wrapped ASGI application
+        * `minimum_size`: Responses with a smaller body are sent as is
+        * `levels`: Compression level by encoding
+        * `cached_paths`: Paths of static documents, such as the OpenAPI schema,
+        compressed once per encoding and then served from memory
+        """
+        self.app = app
+        self.minimum_size = minimum_size
+        self.levels = levels or {}
+        self.compressors = available_compressors()
+        self.cached_paths = set(cached_paths or ())
+        self._cache: dict[tuple[str, str], tuple[Message, bytes]] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(
+            Headers(scope=scope).get("accept-encoding", ""), list(self.compressors)
+        )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        store = None
+        if scope["method"] == "GET" and scope["path"] in self.cached_paths:
+            key = (scope["path"], encoding)
+            if key in self._cache:
+                start, body = self._cache[key]
+                # Copied, outer middleware add headers to the message
+                await send(dict(start, headers=list(start["headers"])))
+                await send({"type": "http.response.body", "body": body})
+                return
+            store = functools.partial(self._store, key)
+
+        compressor = self.compressors[encoding](self.levels.get(encoding, 6))
+        responder = CompressionResponder(
+            self.app, compressor, self.minimum_size, store=store
+        )
+        await responder(scope, receive, send)
+
+    def _store(self, key: tuple[str, str], start: Message, body: bytes) -> None:
+        self._cache[key] = (dict(start, headers=list(start["headers"])), body)
+
+
+class CompressionResponder:
+    def __init__(
+        self,
+        app: ASGIApp,
+        compressor: GzipCompressor | BrotliCompressor,
+        minimum_size: int,
+        store: Callable[[Message, bytes], None] | None = None,
+    ) -> None:
+        """
+        Compress one response.
+
+        **Parameters**
+
+        * `app`: Wrapped ASGI application
+        * `compressor`: Compressor of the negotiated encoding
+        * `minimum_size`: Responses with a smaller body are sent as is
+        * `store`: Called with a compressed, unstreamed 200 response
+        """
+        self.app = app
+        self.compressor = compressor
+        self.minimum_size = minimum_size
+        self.store = store
+        self.send: Send
+        self.start: Message = {}
+        # None until the first body chunk decides whether to compress
+        self.compressing: bool | None = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    async def send_compressed(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # Held back until the first body chunk shows the response size
+            self.start = message
+            return
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.compressing is None:
+            headers = MutableHeaders(scope=self.start)
+            self.compressing = "content-encoding" not in headers and (
+                more_body or len(body) >= self.minimum_size
+            )
+            if not self.compressing:
+                await self.send(self.start)
+                await self.send(message)
+                return
+            headers["Content-Encoding"] = self.compressor.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if not more_body:
+                body = self.compressor.compress(body) + self.compressor.finish()
+                headers["Content-Length"] = str(len(body))
+                if self.store is not None and self.start["status"] == 200:
+                    self.store(self.start, body)
+                await self.send(self.start)
+                await self.send({"type": "http.response.body", "body": body})
+                return
+            # Streamed: the length is unknown until the end
+            del headers["Content-Length"]
+            await self.send(self.start)
+        elif not self.compressing:
+            await self.send(message)
+            return
+
+        body = self.compressor.compress(body)
+        if not more_body:
+            body += self.compressor.finish()
+        await self.send(
+            {"type": "http.response.body", "body": body, "more_body": more_body}
+        )
@@ -0,0 +1,35 @@
+from typing import Any, Sequence
+
+from fastapi import Response, status
+
+from app.schemas.mapper import RowMapper
+
+
+def rows_response(
+    rows: Sequence[Any],
+    mapper: RowMapper,
+    *,
+    status_code: int = status.HTTP_200_OK,
+    headers: dict[str, str] | None = None,
+) -> Response:
+    """
+    JSON array of trusted rows encoded by `mapper`, skipping per-row model
+    validation and `jsonable_encoder`.
+    """
+    return Response(
+        mapper.encode(rows),
+        status_code=status_code,
+        headers=headers,
+        media_type="application/json",
+    )
+
+
+def row_response(
+    row: Any,
+    mapper: RowMapper,
+    *,
+    status_code: int = status.HTTP_200_OK,
+) -> Response:
+    return Response(
+        mapper.encode_one(row), status_code=status_code, media_type="application/json"
+    )
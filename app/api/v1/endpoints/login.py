@@ -5,16 +5,31 @@ from databases import Database
 from fastapi import APIRouter, Body, Depends, HTTPException
 from fastapi.background import BackgroundTasks
 from fastapi.security import OAuth2PasswordRequestForm
+from pydantic import ValidationError
 
 from app import crud, schemas, utils
-from app.api.deps import get_db_pg
+from app.api.deps import (
+    get_db_pg,
+    get_request_active_superuser,
+    get_request_token,
+    login_account_throttle,
+    throttle_login,
+    throttle_password_recovery,
+)
 from app.core import security
 from app.core.config import settings
+from app.core.throttling import throttler
+from app.core.tokens import InvalidTokenError
+from app.services.token_revocation import token_revocation
 
 router = APIRouter()
 
 
-@router.post("/access-token", response_model=schemas.Token)
+@router.post(
+    "/access-token",
+    response_model=schemas.Token,
+    dependencies=[Depends(throttle_login)],
+)
 async def login_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(), db: Database = Depends(get_db_pg)
 ) -> Any:
@@ -29,17 +44,59 @@ async def login_access_token(
         raise HTTPException(status_code=400, detail="Incorrect email or password")
     elif not user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
+    await throttler.reset(login_account_throttle, form_data.username.lower())
 
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     return dict(
         access_token=security.create_access_token(
-            user.id, expires_delta=access_token_expires
+            user.id,
+            expires_delta=access_token_expires,
+            claims=security.authz_claims(user) if settings.TOKEN_AUTHZ_CLAIMS else None,
         ),
         token_type="bearer",
     )
 
 
-@router.post("/password-recovery", response_model=schemas.Message)
+@router.post("/logout", response_model=schemas.Message)
+async def logout(
+    db: Database = Depends(get_db_pg),
+    token_data: schemas.TokenPayload = Depends(get_request_token),
+) -> Any:
+    """
+    Revoke the access token of this request.
+    """
+    if token_data.jti is None:
+        raise HTTPException(status_code=400, detail="Token can't be revoked")
+    await token_revocation.revoke(db, token_data)
+    return dict(message="Token revoked")
+
+
+@router.post(
+    "/revoke",
+    response_model=schemas.Message,
+    dependencies=[Depends(get_request_active_superuser)],
+)
+async def revoke_token(
+    token: str = Body(..., embed=True), db: Database = Depends(get_db_pg)
+) -> Any:
+    """
+    Revoke an access token.
+    """
+    try:
+        token_data = security.decode_access_token(token)
+    except (InvalidTokenError, ValidationError):
+        raise HTTPException(status_code=400, detail="Invalid token")
+    if token_data.jti is None:
+        raise HTTPException(status_code=400, detail="Token can't be revoked")
+    await token_revocation.revoke(db, token_data)
+    return dict(message="Token revoked")
+
+
+@router.post(
+    "/password-recovery",
+    response_model=schemas.Message,
+    dependencies=[Depends(throttle_password_recovery)],
+)
 async def recover_password(
     background_tasks: BackgroundTasks,
     email: str = Body(...),
@@ -48,7 +105,7 @@ async def recover_password(
     """
     Password Recovery.
     """
-    db_user = await crud.user.get_by_email(db, email=email)
+    db_user = await crud.user.get_by_email(db, email=email, filtered=True)
 
     if not db_user:
         raise HTTPException(
@@ -76,11 +133,11 @@ async def reset_password(
     """
     Reset password.
     """
-    email = security.verify_password_reset_token(token)
-    if not email:
+    user_id = security.verify_password_reset_token(token)
+    if user_id is None:
         raise HTTPException(status_code=400, detail="Invalid token")
 
-    user = await crud.user.get_by_email(db, email=email)
+    user = await crud.user.get(db, model_id=user_id)
 
     if not user:
         raise HTTPException(
@@ -93,7 +150,9 @@ async def reset_password(
     await crud.user.update(
         db,
         db_obj=user,
-        obj_in=dict(hashed_password=security.get_password_hash(new_password)),
+        obj_in=dict(
+            hashed_password=await security.get_password_hash_async(new_password)
+        ),
     )
 
     return dict(message="Password updated successfully")
@@ -0,0 +1,37 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends, status
+
+from app import crud
+from app.api.deps import get_request_active_superuser
+from app.core.security import password_hasher, password_policy, token_cache
+from app.core.throttling import throttler
+from app.db.database import postgres_pool, replica_router
+from app.services.token_revocation import token_revocation
+
+router = APIRouter()
+
+
+@router.get(
+    "/",
+    status_code=status.HTTP_200_OK,
+    response_model=dict[str, Any],
+    dependencies=[Depends(get_request_active_superuser)],
+)
+async def read_metrics() -> Any:
+    """
+    Retrieve runtime statistics of the application.
+    """
+    return dict(
+        postgres_pool=postgres_pool.stats(),
+        postgres_replicas=replica_router.stats(),
+        password_hasher=password_hasher.stats(),
+        password_policy=password_policy.stats(),
+        user_cache=crud.user.cache.stats(),
+        user_single_flight=crud.user.flights.stats(),
+        token_version_cache=crud.user.token_versions.stats(),
+        email_filter=crud.user.emails.stats(),
+        token_cache=token_cache.stats(),
+        token_revocation=token_revocation.stats(),
+        throttling=throttler.stats(),
+    )
@@ -1,4 +1,4 @@
-from typing import Any
+from typing import Any, Literal
 
 from databases import Database
 from fastapi import (
@@ -9,21 +9,35 @@ from fastapi import (
     HTTPException,
     Path,
     Query,
+    Request,
     status,
 )
-from pydantic import EmailStr
+from fastapi.responses import StreamingResponse
+from pydantic import EmailStr, ValidationError
 
 from app import crud, schemas, utils
 from app.api.deps import (
     get_db_pg,
     get_request_active_superuser,
     get_request_active_user,
+    sparse_fields,
 )
+from app.api.responses import row_response, rows_response
 from app.core.config import settings
+from app.crud.pagination import Cursor
+from app.schemas.mapper import RowMapper
+from app.services import user_export, user_import
 
 router = APIRouter()
 
 
+def email_taken() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="The user with this email already exists.",
+    )
+
+
 @router.get(
     "/",
     status_code=status.HTTP_200_OK,
@@ -32,14 +46,48 @@ router = APIRouter()
 )
 async def read_users(
     *,
+    request: Request,
     skip: int = Query(0),
     limit: int = Query(100),
+    cursor: str | None = Query(None),
+    order_by: Literal["id", "email"] = Query("id"),
+    mapper: RowMapper = Depends(sparse_fields(schemas.user_mapper)),
     db: Database = Depends(get_db_pg),
 ) -> Any:
     """
     Retrieve users.
+
+    Pages are linked with opaque cursors in the `Link` header (`rel="next"`,
+    `rel="prev"`). `skip` switches to OFFSET pagination for compatibility.
+    Only the columns named in `fields` are read.
     """
-    return await crud.user.get_multi(db, skip=skip, limit=limit)
+    if skip:
+        users = await crud.user.get_multi(
+            db, skip=skip, limit=limit, columns=mapper.fields
+        )
+        return rows_response(users, mapper)
+
+    try:
+        users, next_cursor, prev_cursor = await crud.user.get_page(
+            db,
+            limit=limit,
+            cursor=Cursor.decode(cursor) if cursor else None,
+            order_by=order_by,
+            columns=mapper.fields,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(exc))
+
+    links = [
+        f'<{request.url.include_query_params(cursor=page_cursor.encode())}>; rel="{rel}"'
+        for rel, page_cursor in (("next", next_cursor), ("prev", prev_cursor))
+        if page_cursor is not None
+    ]
+    return rows_response(
+        users,
+        mapper,
+        headers={"Link": ", ".join(links)} if links else None,
+    )
 
 
 @router.post(
@@ -57,12 +105,12 @@ async def create_user(
     """
     Create new user.
     """
-    db_user = await crud.user.get_by_email(db, email=user.email)
-    if db_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="The user with this email already exists.",
-        )
+    # Spares hashing the password of a taken email, new emails skip the query
+    if await crud.user.get_by_email(db, email=user.email, filtered=True):
+        raise email_taken()
+    db_user = await crud.user.create_or_conflict(db, obj_in=user)
+    if db_user is None:
+        raise email_taken()
 
     background_tasks.add_task(
         utils.send_new_account_email,
@@ -70,7 +118,185 @@ async def create_user(
         fullname=crud.user.get_fullname(db_user=user),
     )
 
-    return await crud.user.create(db, obj_in=user)
+    return schemas.user_mapper.to_model(db_user)
+
+
+@router.post(
+    "/bulk",
+    status_code=status.HTTP_200_OK,
+    response_model=list[schemas.UserBulkResult],
+    dependencies=[Depends(get_request_active_superuser)],
+)
+async def create_users(
+    *,
+    users: list[dict[str, Any]] = Body(...),
+    background_tasks: BackgroundTasks,
+    db: Database = Depends(get_db_pg),
+) -> Any:
+    """
+    Create new users in bulk. Every item is reported separately.
+    """
+    results = [dict(index=index, user=None, error=None) for index in range(len(users))]
+    users_in: dict[int, schemas.UserIn] = {}
+    for index, data in enumerate(users):
+        try:
+            users_in[index] = schemas.UserIn.parse_obj(data)
+        except ValidationError as exc:
+            results[index]["error"] = exc.errors()
+
+    # Taken emails are skipped by the insert itself, which sees rows
+    # committed concurrently and not yet replicated
+    db_users = await crud.user.create_many(
+        db, objs_in=list(users_in.values()), conflict_columns=("email",)
+    )
+    for index, db_user in zip(users_in, db_users):
+        if db_user is None:
+            results[index]["error"] = "The user with this email already exists."
+            continue
+        results[index]["user"] = schemas.user_mapper.to_model(db_user)
+        background_tasks.add_task(
+            utils.send_new_account_email,
+            email_to=db_user.email,
+            fullname=crud.user.get_fullname(db_user=db_user),
+        )
+
+    return results
+
+
+@router.patch(
+    "/bulk",
+    status_code=status.HTTP_200_OK,
+    response_model=list[schemas.UserBulkResult],
+    dependencies=[Depends(get_request_active_superuser)],
+)
+async def update_users(
+    *,
+    users: list[dict[str, Any]] = Body(...),
+    db: Database = Depends(get_db_pg),
+) -> Any:
+    """
+    Update users in bulk. Every item is reported separately.
+    """
+    results = [dict(index=index, user=None, error=None) for index in range(len(users))]
+    users_in: dict[int, schemas.UserBulkUpdate] = {}
+    for index, data in enumerate(users):
+        try:
+            users_in[index] = schemas.UserBulkUpdate.parse_obj(data)
+        except ValidationError as exc:
+            results[index]["error"] = exc.errors()
+
+    db_users = {
+        db_user.id: db_user
+        for db_user in await crud.user.get_multi_by_id(
+            db, model_ids=[user_in.id for user_in in users_in.values()]
+        )
+    }
+    new_emails = [
+        user_in.email.lower() for user_in in users_in.values() if user_in.email
+    ]
+    email_owners = {
+        db_user.email: db_user.id
+        for db_user in await crud.user.get_multi_by_email(db, emails=new_emails)
+    }
+    for index, user_in in list(users_in.items()):
+        email = user_in.email.lower() if user_in.email else None
+        if user_in.id not in db_users:
+            results[index]["error"] = "The user with this id does not exist"
+        elif email and email_owners.setdefault(email, user_in.id) != user_in.id:
+            results[index]["error"] = "The user with this email already exists."
+        else:
+            continue
+        del users_in[index]
+
+    updated_users = await crud.user.update_many(
+        db,
+        objs_in=[
+            (db_users[user_in.id], user_in.dict(exclude={"id"}, exclude_unset=True))
+            for user_in in users_in.values()
+        ],
+    )
+    for index, db_user in zip(users_in, updated_users):
+        results[index]["user"] = schemas.user_mapper.to_model(db_user)
+
+    return results
+
+
+@router.delete(
+    "/bulk",
+    status_code=status.HTTP_200_OK,
+    response_model=list[schemas.UserBulkResult],
+    dependencies=[Depends(get_request_active_superuser)],
+)
+async def delete_users(
+    *,
+    user_ids: list[int] = Body(...),
+    db: Database = Depends(get_db_pg),
+) -> Any:
+    """
+    Delete users in bulk. Every item is reported separately.
+    """
+    removed_users = {
+        db_user.id: db_user
+        for db_user in await crud.user.remove_many(db, model_ids=user_ids)
+    }
+    return [
+        dict(
+            index=index,
+            user=schemas.user_mapper.to_model(removed_users[user_id]),
+            error=None,
+        )
+        if user_id in removed_users
+        else dict(index=index, error="The user with this id does not exist")
+        for index, user_id in enumerate(user_ids)
+    ]
+
+
+@router.post(
+    "/import",
+    status_code=status.HTTP_200_OK,
+    response_model=schemas.UserImportResult,
+    dependencies=[Depends(get_request_active_superuser)],
+)
+async def import_users(
+    *,
+    request: Request,
+    import_format: user_import.ImportFormat = Query("csv", alias="format"),
+    on_conflict: user_import.ConflictAction = Query("skip"),
+    db: Database = Depends(get_db_pg),
+) -> Any:
+    """
+    Import users from a CSV or NDJSON request body streamed into the database.
+    Rows may carry a plain `password` or a bcrypt `hashed_password`.
+    """
+    return await user_import.import_users(
+        db,
+        user_import.iter_lines(request.stream()),
+        import_format=import_format,
+        on_conflict=on_conflict,
+    )
+
+
+@router.get(
+    "/export",
+    status_code=status.HTTP_200_OK,
+    response_class=StreamingResponse,
+    dependencies=[Depends(get_request_active_superuser)],
+)
+async def export_users(
+    *,
+    export_format: user_export.ExportFormat = Query("ndjson", alias="format"),
+    db: Database = Depends(get_db_pg),
+) -> Any:
+    """
+    Stream all users as NDJSON or CSV.
+    """
+    return StreamingResponse(
+        user_export.export_users(db, export_format),
+        media_type=user_export.MEDIA_TYPES[export_format],
+        headers={
+            "Content-Disposition": f'attachment; filename="users.{export_format}"'
+        },
+    )
 
 
 @router.get("/me", status_code=status.HTTP_200_OK, response_model=schemas.User)
@@ -80,7 +306,7 @@ async def read_user_me(
     """
     Get request user.
     """
-    return request_user
+    return schemas.user_mapper.to_model(request_user)
 
 
 @router.patch("/me", status_code=status.HTTP_200_OK, response_model=schemas.User)
@@ -93,7 +319,8 @@ async def update_user_me(
     """
     Update request user.
     """
-    return await crud.user.update(db, db_obj=request_user, obj_in=user_in)
+    user = await crud.user.update(db, db_obj=request_user, obj_in=user_in)
+    return schemas.user_mapper.to_model(user)
 
 
 @router.get(
@@ -105,19 +332,20 @@ async def update_user_me(
 async def read_user_by_id(
     *,
     user_id: int = Path(...),
+    mapper: RowMapper = Depends(sparse_fields(schemas.user_mapper)),
     db: Database = Depends(get_db_pg),
 ) -> Any:
     """
-    Get a specific user by id.
+    Get a specific user by id, only the columns named in `fields` are read.
     """
-    user = await crud.user.get(db, model_id=user_id)
+    user = await crud.user.get(db, model_id=user_id, columns=mapper.fields)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="The user with this id does not exist",
         )
 
-    return user
+    return row_response(user, mapper)
 
 
 @router.patch(
@@ -142,7 +370,8 @@ async def update_user(
             detail="The user with this id does not exist",
         )
 
-    return await crud.user.update(db, db_obj=user, obj_in=user_in)
+    user = await crud.user.update(db, db_obj=user, obj_in=user_in)
+    return schemas.user_mapper.to_model(user)
 
 
 @router.delete(
@@ -192,14 +421,10 @@ async def open_sign_up(
             detail="Open user registration is forbidden on this server",
         )
 
-    db_user = await crud.user.get_by_email(db, email=email)
-    if db_user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="The user with this email already exists.",
-        )
-
-    user = await crud.user.create(
+    # Spares hashing the password of a taken email, new emails skip the query
+    if await crud.user.get_by_email(db, email=email, filtered=True):
+        raise email_taken()
+    user = await crud.user.create_or_conflict(
         db,
         obj_in=schemas.UserIn(
             email=email,
@@ -209,6 +434,8 @@ async def open_sign_up(
             last_name=last_name,
         ),
     )
+    if user is None:
+        raise email_taken()
 
     background_tasks.add_task(
         utils.send_new_account_email,
@@ -216,4 +443,4 @@ async def open_sign_up(
         fullname=crud.user.get_fullname(db_user=user),
     )
 
-    return user
+    return schemas.user_mapper.to_model(user)
@@ -0,0 +1,70 @@
+import hashlib
+import math
+from typing import Any
+
+
+class BloomFilter:
+    def __init__(self, *, capacity: int, error_rate: float) -> None:
+        """
+        Compact set of strings with no false negatives and a bounded
+        false-positive rate. Items cannot be removed, rebuild instead.
+
+        **Parameters**
+
+        * `capacity`: Items the filter is sized for
+        * `error_rate`: False-positive rate at `capacity` items
+        """
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.size = max(
+            8, math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2)
+        )
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self._bits = bytearray(-(-self.size // 8))
+        # Distinct items added, repeated adds set no new bits and are not counted
+        self.count = 0
+
+    def _positions(self, item: str) -> list[int]:
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item: str) -> None:
+        new = False
+        for position in self._positions(item):
+            byte, mask = position >> 3, 1 << (position & 7)
+            if not self._bits[byte] & mask:
+                self._bits[byte] |= mask
+                new = True
+        if new:
+            self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(
+            self._bits[position >> 3] & 1 << (position & 7)
+            for position in self._positions(item)
+        )
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def is_full(self) -> bool:
+        return self.count >= self.capacity
+
+    def false_positive_rate(self) -> float:
+        """
+        Expected false-positive rate at the current number of items.
+        """
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+    def stats(self) -> dict[str, Any]:
+        return dict(
+            count=self.count,
+            capacity=self.capacity,
+            memory_bytes=len(self._bits),
+            hashes=self.hashes,
+            false_positive_rate=self.false_positive_rate(),
+        )
@@ -0,0 +1,274 @@
+import abc
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Hashable
+
+import orjson
+
+from app.core.config import settings
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, *, maxsize: int, ttl: float) -> None:
+        """
+        In-process LRU cache with expiring entries and hit/miss counters.
+
+        **Parameters**
+
+        * `maxsize`: Entries kept before the least recently used are evicted
+        * `ttl`: Default seconds an entry lives, 0 disables the cache
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key, _MISSING)
+        if entry is not _MISSING:
+            expires_at, value = entry
+            if expires_at > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._data[key]
+        self.misses += 1
+        return default
+
+    def set(self, key: Hashable, value: Any, *, ttl: float | None = None) -> None:
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0 or self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic() + ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def delete(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        return dict(
+            size=len(self._data),
+            maxsize=self.maxsize,
+            hits=self.hits,
+            misses=self.misses,
+            hit_ratio=self.hits / lookups if lookups else 0.0,
+            evictions=self.evictions,
+        )
+
+
+class CachedRow(dict):
+    """
+    Cached database row, readable by key and by attribute like a `Record`.
+    """
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self[name]
+        except KeyError:
+            raise AttributeError(name)
+
+
+class CacheBackend(abc.ABC):
+    """
+    Storage of cached rows. Values are `CachedRow`s, a missing key reads as None.
+    """
+
+    @abc.abstractmethod
+    async def get(self, key: str) -> CachedRow | None:
+        ...
+
+    @abc.abstractmethod
+    async def set(self, key: str, value: CachedRow, *, ttl: float) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def delete(self, *keys: str) -> None:
+        ...
+
+    @abc.abstractmethod
+    async def clear(self) -> None:
+        ...
+
+    def stats(self) -> dict[str, Any]:
+        return {}
+
+
+class MemoryCacheBackend(CacheBackend):
+    def __init__(self, *, maxsize: int, ttl: float) -> None:
+        """
+        Per-process LRU cache. Other workers don't see its invalidations,
+        so entries may be stale there for up to `ttl` seconds.
+
+        **Parameters**
+
+        * `maxsize`: Entries kept before the least recently used are evicted
+        * `ttl`: Longest lifetime of an entry, 0 disables the cache
+        """
+        self.cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    async def get(self, key: str) -> CachedRow | None:
+        return self.cache.get(key)
+
+    async def set(self, key: str, value: CachedRow, *, ttl: float) -> None:
+        self.cache.set(key, value, ttl=ttl)
+
+    async def delete(self, *keys: str) -> None:
+        for key in keys:
+            self.cache.delete(key)
+
+    async def clear(self) -> None:
+        self.cache.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return self.cache.stats()
+
+
+class MemoryKeyValueStore:
+    """
+    In-process stand-in for the subset of the `redis.asyncio.Redis`
+    interface used by `KeyValueCacheBackend` and `KeyValueThrottleBackend`.
+    """
+
+    def __init__(self) -> None:
+        self._data: dict[str, tuple[float, bytes]] = {}
+
+    async def get(self, name: str) -> bytes | None:
+        expires_at, value = self._data.get(name, (0.0, None))
+        if expires_at <= time.monotonic():
+            self._data.pop(name, None)
+            return None
+        return value
+
+    async def set(
+        self, name: str, value: bytes, *, px: int, nx: bool = False
+    ) -> bool | None:
+        if nx and await self.get(name) is not None:
+            return None
+        self._data[name] = (time.monotonic() + px / 1000, value)
+        return True
+
+    async def incr(self, name: str) -> int:
+        expires_at, value = self._data.get(name, (math.inf, b"0"))
+        if expires_at <= time.monotonic():
+            expires_at, value = math.inf, b"0"
+        count = int(value) + 1
+        self._data[name] = (expires_at, str(count).encode())
+        return count
+
+    async def pttl(self, name: str) -> int:
+        if await self.get(name) is None:
+            return -2
+        expires_at, _ = self._data[name]
+        if expires_at == math.inf:
+            return -1
+        return int((expires_at - time.monotonic()) * 1000)
+
+    async def delete(self, *names: str) -> int:
+        return sum(self._data.pop(name, None) is not None for name in names)
+
+    async def scan_iter(self, match: str) -> AsyncIterator[str]:
+        prefix = match.rstrip("*")
+        for name in list(self._data):
+            if name.startswith(prefix):
+                yield name
+
+
+class KeyValueCacheBackend(CacheBackend):
+    def __init__(
+        self,
+        client: Any,
+        *,
+        prefix: str = "crud:",
+        client_errors: tuple[type[BaseException], ...] = (
+            OSError,
+            asyncio.TimeoutError,
+        ),
+    ) -> None:
+        """
+        Cache shared by all workers in an external key-value store,
+        so an invalidation is seen everywhere at once.
+        Rows are stored as JSON and must hold JSON-compatible values only.
+        While the store is unreachable every read is a miss served by the
+        database, and rows whose keys could not be dropped may be stale
+        until their TTL runs out.
+
+        **Parameters**
+
+        * `client`: `redis.asyncio.Redis` or a `MemoryKeyValueStore`
+        * `prefix`: Prepended to all keys
+        * `client_errors`: Exceptions of `client` counted in `errors`
+        and otherwise ignored
+        """
+        self.client = client
+        self.prefix = prefix
+        self.client_errors = client_errors
+        self.errors = 0
+
+    async def get(self, key: str) -> CachedRow | None:
+        try:
+            value = await self.client.get(self.prefix + key)
+        except self.client_errors:
+            self.errors += 1
+            return None
+        return None if value is None else CachedRow(orjson.loads(value))
+
+    async def set(self, key: str, value: CachedRow, *, ttl: float) -> None:
+        if ttl <= 0:
+            return
+        try:
+            await self.client.set(
+                self.prefix + key, orjson.dumps(value), px=int(ttl * 1000)
+            )
+        except self.client_errors:
+            self.errors += 1
+
+    async def delete(self, *keys: str) -> None:
+        if not keys:
+            return
+        try:
+            await self.client.delete(*(self.prefix + key for key in keys))
+        except self.client_errors:
+            self.errors += 1
+
+    async def clear(self) -> None:
+        try:
+            keys = [key async for key in self.client.scan_iter(match=self.prefix + "*")]
+            if keys:
+                await self.client.delete(*keys)
+        except self.client_errors:
+            self.errors += 1
+
+    def stats(self) -> dict[str, Any]:
+        return dict(errors=self.errors)
+
+
+def create_cache_backend(maxsize: int, ttl: float) -> CacheBackend:
+    """
+    Backend picked by `settings.CACHE_BACKEND`.
+    """
+    if settings.CACHE_BACKEND == "redis":
+        try:
+            from redis import asyncio as redis
+        except ImportError:  # pragma: no cover
+            raise RuntimeError("redis cache backend requires the redis package")
+        return KeyValueCacheBackend(
+            redis.from_url(settings.CACHE_REDIS_URL),
+            client_errors=(redis.RedisError, OSError, asyncio.TimeoutError),
+        )
+    return MemoryCacheBackend(maxsize=maxsize, ttl=ttl)
@@ -1,6 +1,6 @@
 import logging
 from pathlib import Path
-from typing import Any, Mapping
+from typing import Any, Literal, Mapping
 
 from pydantic import AnyHttpUrl, BaseSettings, EmailStr, PostgresDsn, validator
 
@@ -11,6 +11,37 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     # 60 minutes * 24 hours * 8 days = 8 days
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
+    # Cache of verified access tokens, entries never outlive the token
+    TOKEN_CACHE_SIZE: int = 10_000
+    TOKEN_CACHE_TTL: float = 60 * 60
+    # JWT implementation: "hmac" (HS* only), "pyjwt" or "jose"
+    TOKEN_BACKEND: Literal["hmac", "pyjwt", "jose"] = "hmac"
+    # HS256/HS384/HS512, or ES256/EdDSA/RS256 with the pyjwt backend
+    TOKEN_ALGORITHM: str = "HS256"
+    # Keys by kid, JSON-formatted: secrets for HS*, PEM private keys otherwise.
+    # SECRET_KEY is used when empty. Keep retired keys in TOKEN_PUBLIC_KEYS
+    # (or here) until the tokens they signed have expired
+    TOKEN_KEYS: dict[str, str] = {}
+    TOKEN_PUBLIC_KEYS: dict[str, str] = {}
+    # kid of the key new tokens are signed with
+    TOKEN_KEY_ID: str | None
+    # Embed is_active, is_superuser and token_version in access tokens, so
+    # superuser endpoints authorize without loading the user
+    TOKEN_AUTHZ_CLAIMS: bool = False
+    # Bloom filter of revoked token ids kept by every worker: memory grows with
+    # capacity and shrinks with the error rate, a false positive costs a query
+    TOKEN_REVOCATION_CAPACITY: int = 100_000
+    TOKEN_REVOCATION_ERROR_RATE: float = 0.001
+    TOKEN_REVOCATION_REFRESH_INTERVAL: float = 5.0
+    # Seconds re-read on every refresh to catch slowly committed revocations
+    TOKEN_REVOCATION_OVERLAP: float = 30.0
+    # Request id taken from the client or generated, echoed in the response
+    REQUEST_ID_HEADER: str = "X-Request-ID"
+    # Response compression: smaller bodies are sent as is, levels are 1-9 for
+    # gzip and 0-11 for brotli (used when the `brotli` package is installed)
+    COMPRESSION_MINIMUM_SIZE: int = 1000
+    COMPRESSION_GZIP_LEVEL: int = 6
+    COMPRESSION_BROTLI_QUALITY: int = 4
     SERVER_NAME: str | None
     SERVER_HOST: AnyHttpUrl
     # BACKEND_CORS_ORIGINS is a JSON-formatted list of origins
@@ -79,6 +110,97 @@ class Settings(BaseSettings):
             )
         )
 
+    # Postgres connection pool
+    POSTGRES_POOL_MIN_SIZE: int = 1
+    POSTGRES_POOL_MAX_SIZE: int = 10
+    # Seconds an idle connection stays open before it is closed by the pool
+    POSTGRES_POOL_IDLE_TIMEOUT: float = 300.0
+    # Seconds a request waits for a free connection before failing with 503
+    POSTGRES_POOL_ACQUIRE_TIMEOUT: float = 10.0
+
+    # Streaming replicas serving reads, e.g: "postgresql://u:p@replica-1/db,..."
+    REPLICA_URLS: list[PostgresDsn] = []
+
+    @validator("REPLICA_URLS", pre=True)
+    def assemble_replica_urls(cls, v: str | list[str]) -> list[str] | str:
+        if isinstance(v, str) and not v.startswith("["):
+            return [i.strip() for i in v.split(",") if i.strip()]
+        elif isinstance(v, (list, str)):
+            return v
+        raise ValueError(v)
+
+    REPLICA_SELECTION: Literal["round_robin", "least_busy"] = "round_robin"
+    # Replicas lagging more seconds than this are skipped until they catch up
+    REPLICA_MAX_LAG: float = 5.0
+    REPLICA_CHECK_INTERVAL: float = 2.0
+
+    # Rows per statement in CRUD bulk operations
+    CRUD_BULK_CHUNK_SIZE: int = 500
+
+    # User import: rows per COPY batch, passwords are hashed by the hasher pool
+    USER_IMPORT_BATCH_SIZE: int = 5000
+    # User export: rows encoded per chunk written to the client
+    USER_EXPORT_CHUNK_SIZE: int = 500
+
+    # Password hashing pool: workers, jobs waiting before 503 and pool type
+    PASSWORD_HASHER_WORKERS: int = 4
+    PASSWORD_HASHER_MAX_QUEUE: int = 64
+    PASSWORD_HASHER_EXECUTOR: Literal["thread", "process"] = "thread"
+    # Seconds clients are asked to wait when the hashing queue is full
+    PASSWORD_HASHER_RETRY_AFTER: int = 1
+    # bcrypt cost of new hashes, see `python -m app.password_policy calibrate`.
+    # Stored hashes with a lower cost are rehashed on login
+    PASSWORD_BCRYPT_ROUNDS: int | None
+    # Hash time `calibrate` aims for on the machine it runs on
+    PASSWORD_HASH_TARGET_SECONDS: float = 0.25
+
+    # Login and password recovery attempts per client address and per account
+    # within the window: "memory" counts per worker (THROTTLE_MAX_KEYS keys),
+    # "redis" counts for all workers via THROTTLE_REDIS_URL
+    THROTTLE_ENABLED: bool = True
+    THROTTLE_BACKEND: Literal["memory", "redis"] = "memory"
+    THROTTLE_REDIS_URL: str | None = None
+    THROTTLE_MAX_KEYS: int = 100_000
+    LOGIN_THROTTLE_PER_IP: int = 20
+    LOGIN_THROTTLE_PER_ACCOUNT: int = 5
+    LOGIN_THROTTLE_WINDOW: float = 60
+    PASSWORD_RECOVERY_THROTTLE_PER_IP: int = 10
+    PASSWORD_RECOVERY_THROTTLE_PER_ACCOUNT: int = 3
+    PASSWORD_RECOVERY_THROTTLE_WINDOW: float = 60 * 15
+
+    # Reverse proxies whose X-Forwarded-For names the client address,
+    # e.g: "10.0.0.2,10.0.0.3". Alternatively run uvicorn with
+    # --proxy-headers --forwarded-allow-ips and leave this empty
+    TRUSTED_PROXIES: list[str] = []
+
+    @validator("TRUSTED_PROXIES", pre=True)
+    def assemble_trusted_proxies(cls, v: str | list[str]) -> list[str] | str:
+        if isinstance(v, str) and not v.startswith("["):
+            return [i.strip() for i in v.split(",") if i.strip()]
+        elif isinstance(v, (list, str)):
+            return v
+        raise ValueError(v)
+
+    # Read-through cache of rows by id and other unique columns: "memory" is
+    # per worker (USER_CACHE_SIZE entries), "redis" is shared via CACHE_REDIS_URL
+    CACHE_BACKEND: Literal["memory", "redis"] = "memory"
+    CACHE_REDIS_URL: str | None = None
+    # Cached users, TTL of 0 disables the cache
+    USER_CACHE_SIZE: int = 10_000
+    USER_CACHE_TTL: float = 30.0
+    # Bloom filter of user emails answering "no such user" without a query on
+    # sign-up and password recovery. Emails created or changed by other workers
+    # are seen after the next refresh
+    EMAIL_FILTER_CAPACITY: int = 1_000_000
+    EMAIL_FILTER_ERROR_RATE: float = 0.01
+    EMAIL_FILTER_REFRESH_INTERVAL: float = 1.0
+    # Seconds re-read on every refresh to catch slowly committed writes
+    EMAIL_FILTER_OVERLAP: float = 30.0
+    EMAIL_FILTER_REBUILD_INTERVAL: float = 60 * 5
+    # Seconds a worker trusts a user's token_version before checking it again,
+    # bounds how long other workers accept tokens of a deactivated user
+    TOKEN_VERSION_CACHE_TTL: float = 5.0
+
     # Email
     SEND_EMAILS_TO_USERS: bool = True
     SMTP_TLS: bool = True
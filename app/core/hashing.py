@@ -0,0 +1,118 @@
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Sequence, TypeVar
+
+from app.core.config import settings
+
+T = TypeVar("T")
+
+
+class PasswordHasherBusyError(Exception):
+    """Too many password hashing jobs are waiting for a worker."""
+
+
+class PasswordHasher:
+    def __init__(
+        self,
+        *,
+        workers: int | None = None,
+        max_queue: int | None = None,
+        executor_type: str | None = None,
+    ) -> None:
+        """
+        Run CPU-bound password hashing off the event loop on a bounded pool.
+
+        **Parameters**
+
+        * `workers`: Jobs running at the same time
+        * `max_queue`: Jobs allowed to wait for a worker before new ones are rejected
+        * `executor_type`: "thread" or "process"
+        """
+        self.workers = workers or settings.PASSWORD_HASHER_WORKERS
+        self.max_queue = (
+            max_queue if max_queue is not None else settings.PASSWORD_HASHER_MAX_QUEUE
+        )
+        self.executor_type = executor_type or settings.PASSWORD_HASHER_EXECUTOR
+        self._executor: Executor | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor_type == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="password-hasher"
+                )
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        if self._semaphore is None or self._loop is not loop:
+            self._semaphore, self._loop = asyncio.Semaphore(self.workers), loop
+        return self._semaphore
+
+    async def run(
+        self, func: Callable[..., T], *args: Any, reject_when_full: bool = True
+    ) -> T:
+        semaphore = self._get_semaphore()
+        if reject_when_full and semaphore.locked() and self.queued >= self.max_queue:
+            self.rejected += 1
+            raise PasswordHasherBusyError("Password hashing queue is full")
+
+        self.queued += 1
+        queued_at = time.perf_counter()
+        try:
+            await semaphore.acquire()
+        finally:
+            self.queued -= 1
+        wait = time.perf_counter() - queued_at
+        self.wait_seconds_total += wait
+        self.wait_seconds_max = max(self.wait_seconds_max, wait)
+
+        self.running += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            self.running -= 1
+            self.completed += 1
+            semaphore.release()
+
+    async def map(self, func: Callable[[Any], T], items: Sequence[Any]) -> list[T]:
+        """
+        Run `func` over many items for batch work.
+        Waits for free workers instead of being rejected when the queue is full.
+        """
+        return list(
+            await asyncio.gather(
+                *(self.run(func, item, reject_when_full=False) for item in items)
+            )
+        )
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    def stats(self) -> dict[str, Any]:
+        return dict(
+            workers=self.workers,
+            queued=self.queued,
+            running=self.running,
+            completed=self.completed,
+            rejected=self.rejected,
+            wait_seconds_avg=self.wait_seconds_total / self.completed
+            if self.completed
+            else 0.0,
+            wait_seconds_max=self.wait_seconds_max,
+        )
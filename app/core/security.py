@@ -1,57 +1,154 @@
-from datetime import datetime, timedelta
+import functools
+import hashlib
+import math
+import time
+import uuid
+from datetime import timedelta
 from typing import Any
 
-from jose import jwt
 from passlib.context import CryptContext
 
+from app import schemas
+from app.core.cache import TTLCache
 from app.core.config import settings
+from app.core.hashing import PasswordHasher
+from app.core.tokens import InvalidTokenError, token_codec
 
-ENCODING_ALGORITHM = "HS256"
+PASSWORD_RESET_TOKEN_TYPE = "password_reset"
 
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+password_hasher = PasswordHasher()
+
+BCRYPT_MIN_ROUNDS = 10
+BCRYPT_MAX_ROUNDS = 16
+
+
+class PasswordPolicy:
+    def __init__(self, rounds: int | None = None) -> None:
+        """
+        bcrypt cost of new password hashes. Hashing functions get the cost
+        passed explicitly, so pool worker processes follow it too.
+
+        **Parameters**
+
+        * `rounds`: Cost factor, passlib's default when not given
+        """
+        self.rounds = rounds or pwd_context.handler("bcrypt").default_rounds
+        self.rehashed = 0
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        # $2b$12$<salt and checksum>, stronger hashes are kept
+        try:
+            return int(hashed_password[4:6]) < self.rounds
+        except ValueError:
+            return True
+
+    def stats(self) -> dict[str, Any]:
+        return dict(rounds=self.rounds, rehashed=self.rehashed)
+
+
+password_policy = PasswordPolicy(settings.PASSWORD_BCRYPT_ROUNDS)
+
+
+@functools.lru_cache
+def bcrypt_with_rounds(rounds: int) -> Any:
+    return pwd_context.handler("bcrypt").using(rounds=rounds)
 
 
 def verify_password(plain_password, hashed_password) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
 
-def get_password_hash(password) -> str:
-    return pwd_context.hash(password)
+def get_password_hash(password, rounds: int | None = None) -> str:
+    return bcrypt_with_rounds(rounds or password_policy.rounds).hash(password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await password_hasher.run(verify_password, plain_password, hashed_password)
 
 
-def create_access_token(subject: str | Any, expires_delta: timedelta = None) -> str:
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(
-            minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES
-        )
-    to_encode = {"exp": expire, "sub": str(subject)}
-    encoded_jwt = jwt.encode(
-        to_encode, settings.SECRET_KEY, algorithm=ENCODING_ALGORITHM
+async def get_password_hash_async(password: str) -> str:
+    return await password_hasher.run(
+        get_password_hash, password, password_policy.rounds
     )
-    return encoded_jwt
+
+
+def calibrate_bcrypt_rounds(
+    target_seconds: float | None = None, *, samples: int = 3
+) -> int:
+    """
+    Pick the bcrypt cost whose hash time is closest to `target_seconds`
+    on this machine. Every extra round doubles the time.
+    """
+    target_seconds = target_seconds or settings.PASSWORD_HASH_TARGET_SECONDS
+    handler = bcrypt_with_rounds(BCRYPT_MIN_ROUNDS)
+    started = time.perf_counter()
+    for _ in range(samples):
+        handler.hash("calibration")
+    seconds = (time.perf_counter() - started) / samples
+    rounds = BCRYPT_MIN_ROUNDS + round(math.log2(target_seconds / seconds))
+    return min(max(rounds, BCRYPT_MIN_ROUNDS), BCRYPT_MAX_ROUNDS)
+
+
+def create_access_token(
+    subject: str | Any,
+    expires_delta: timedelta = None,
+    claims: dict[str, Any] | None = None,
+) -> str:
+    if expires_delta is None:
+        expires_delta = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    expire = int(time.time() + expires_delta.total_seconds())
+    return token_codec.encode(
+        dict(claims or {}, exp=expire, sub=str(subject), jti=uuid.uuid4().hex)
+    )
+
+
+def authz_claims(user: Any) -> dict[str, Any]:
+    return dict(
+        is_active=user.is_active,
+        is_superuser=user.is_superuser,
+        token_version=user.token_version,
+    )
+
+
+# Verified access token payloads keyed by a digest of the token
+token_cache = TTLCache(maxsize=settings.TOKEN_CACHE_SIZE, ttl=settings.TOKEN_CACHE_TTL)
+
+
+def decode_access_token(token: str) -> schemas.TokenPayload:
+    """
+    Verify an access token, reusing the result for tokens seen before.
+    Raises `InvalidTokenError` or `ValidationError` for invalid tokens.
+    """
+    key = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    token_data = token_cache.get(key)
+    if token_data is None:
+        payload = token_codec.decode(token)
+        if "typ" in payload:
+            # Password reset and other single-purpose tokens
+            raise InvalidTokenError("Not an access token")
+        token_data = schemas.TokenPayload(**payload)
+        ttl = token_data.exp - time.time() if token_data.exp is not None else None
+        token_cache.set(key, token_data, ttl=ttl)
+    elif token_data.exp is not None and token_data.exp <= time.time():
+        raise InvalidTokenError("Signature has expired")
+    return token_data
 
 
 def generate_password_reset_token(user_id: int) -> str:
-    delta = timedelta(minutes=settings.EMAIL_RESET_TOKEN_EXPIRE_MINUTES)
-    now = datetime.utcnow()
-    expires = now + delta
-    exp = expires.timestamp()
-    encoded_jwt = jwt.encode(
-        dict(exp=exp, nbf=now, sub=user_id),
-        settings.SECRET_KEY,
-        algorithm=ENCODING_ALGORITHM,
+    now = int(time.time())
+    expire = now + settings.EMAIL_RESET_TOKEN_EXPIRE_MINUTES * 60
+    return token_codec.encode(
+        dict(exp=expire, nbf=now, sub=str(user_id), typ=PASSWORD_RESET_TOKEN_TYPE)
     )
-    return encoded_jwt
 
 
-def verify_password_reset_token(token: str) -> str | None:
+def verify_password_reset_token(token: str) -> int | None:
     try:
-        decoded_token = jwt.decode(
-            token, settings.SECRET_KEY, algorithms=[ENCODING_ALGORITHM]
-        )
-        return decoded_token["sub"]
-    except jwt.JWTError:
+        decoded_token = token_codec.decode(token)
+    except InvalidTokenError:
+        return
+    if decoded_token.get("typ") != PASSWORD_RESET_TOKEN_TYPE:
         return
+    return int(decoded_token["sub"])
@@ -0,0 +1,52 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    def __init__(self) -> None:
+        """
+        Run one call per key at a time: callers arriving while a call with
+        their key is in flight wait for its result instead of starting another.
+        """
+        self._flights: dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+        task = self._flights.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._flights[key] = task
+            task.add_done_callback(lambda task: self._land(key, task))
+        else:
+            self.shared += 1
+        # A cancelled caller doesn't cancel the call the others wait for
+        return await asyncio.shield(task)
+
+    def _land(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._flights.get(key) is task:
+            del self._flights[key]
+        if not task.cancelled():
+            # Retrieved, so an error nobody waited for isn't logged as unhandled
+            task.exception()
+
+    def forget(self, key: Hashable) -> None:
+        """
+        Let later callers start a new call, for when the data the call
+        in flight reads has just changed.
+        """
+        self._flights.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    def stats(self) -> dict[str, Any]:
+        return dict(
+            in_flight=len(self._flights),
+            calls=self.calls,
+            shared=self.shared,
+            shared_ratio=self.shared / self.calls if self.calls else 0.0,
+        )
@@ -0,0 +1,160 @@
+import abc
+import time
+from collections import OrderedDict, deque
+from typing import Any
+
+from pydantic import BaseModel
+
+from app.core.config import settings
+
+
+class ThrottledError(Exception):
+    """Too many attempts in the window, retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(f"Too many attempts, retry after {retry_after:.0f}s")
+        self.retry_after = retry_after
+
+
+class ThrottleRule(BaseModel):
+    name: str
+    # Attempts allowed per key within `window` seconds
+    limit: int
+    window: float
+
+
+class ThrottleBackend(abc.ABC):
+    """
+    Storage of attempt counters.
+    """
+
+    @abc.abstractmethod
+    async def hit(self, key: str, *, limit: int, window: float) -> float:
+        """
+        Record an attempt unless `limit` is reached.
+        Returns seconds to wait, 0 when the attempt is allowed.
+        """
+
+    @abc.abstractmethod
+    async def reset(self, key: str) -> None:
+        ...
+
+    def stats(self) -> dict[str, Any]:
+        return {}
+
+
+class MemoryThrottleBackend(ThrottleBackend):
+    def __init__(self, *, max_keys: int | None = None) -> None:
+        """
+        Per-process sliding window log: the last `limit` attempt times per key.
+
+        **Parameters**
+
+        * `max_keys`: Keys tracked before the least recently used are dropped
+        """
+        self.max_keys = max_keys or settings.THROTTLE_MAX_KEYS
+        self._attempts: OrderedDict[str, tuple[float, deque[float]]] = OrderedDict()
+
+    def _expire(self, now: float) -> None:
+        while self._attempts:
+            window, attempts = next(iter(self._attempts.values()))
+            if attempts and attempts[-1] + window > now:
+                break
+            self._attempts.popitem(last=False)
+
+    async def hit(self, key: str, *, limit: int, window: float) -> float:
+        now = time.monotonic()
+        self._expire(now)
+        _, attempts = self._attempts.get(key) or (window, deque(maxlen=limit))
+        while attempts and attempts[0] + window <= now:
+            attempts.popleft()
+        if len(attempts) >= limit:
+            return attempts[0] + window - now
+        attempts.append(now)
+        self._attempts[key] = (window, attempts)
+        self._attempts.move_to_end(key)
+        while len(self._attempts) > self.max_keys:
+            self._attempts.popitem(last=False)
+        return 0.0
+
+    async def reset(self, key: str) -> None:
+        self._attempts.pop(key, None)
+
+    def stats(self) -> dict[str, Any]:
+        return dict(keys=len(self._attempts), max_keys=self.max_keys)
+
+
+class KeyValueThrottleBackend(ThrottleBackend):
+    def __init__(self, client: Any, *, prefix: str = "throttle:") -> None:
+        """
+        Fixed window counters shared by all workers in an external key-value
+        store. A key allows `limit` attempts from its first attempt until
+        `window` seconds later.
+
+        **Parameters**
+
+        * `client`: `redis.asyncio.Redis` or a `MemoryKeyValueStore`
+        * `prefix`: Prepended to all keys
+        """
+        self.client = client
+        self.prefix = prefix
+
+    async def hit(self, key: str, *, limit: int, window: float) -> float:
+        name = self.prefix + key
+        # The expiry is set before counting, no counter outlives its window
+        await self.client.set(name, b"0", px=int(window * 1000), nx=True)
+        if await self.client.incr(name) <= limit:
+            return 0.0
+        ttl = await self.client.pttl(name)
+        return ttl / 1000 if ttl > 0 else window
+
+    async def reset(self, key: str) -> None:
+        await self.client.delete(self.prefix + key)
+
+
+def create_throttle_backend() -> ThrottleBackend:
+    """
+    Backend picked by `settings.THROTTLE_BACKEND`.
+    """
+    if settings.THROTTLE_BACKEND == "redis":
+        try:
+            from redis import asyncio as redis
+        except ImportError:  # pragma: no cover
+            raise RuntimeError("redis throttle backend requires the redis package")
+        return KeyValueThrottleBackend(redis.from_url(settings.THROTTLE_REDIS_URL))
+    return MemoryThrottleBackend()
+
+
+class Throttler:
+    def __init__(self, backend: ThrottleBackend) -> None:
+        """
+        Apply throttle rules to keys such as client addresses or account names.
+
+        **Parameters**
+
+        * `backend`: Where attempts are counted
+        """
+        self.backend = backend
+        self.throttled: dict[str, int] = {}
+
+    async def hit(self, rule: ThrottleRule, key: str) -> None:
+        """
+        Count an attempt, raise `ThrottledError` when the rule's limit is reached.
+        """
+        if not settings.THROTTLE_ENABLED:
+            return
+        retry_after = await self.backend.hit(
+            f"{rule.name}:{key}", limit=rule.limit, window=rule.window
+        )
+        if retry_after:
+            self.throttled[rule.name] = self.throttled.get(rule.name, 0) + 1
+            raise ThrottledError(retry_after)
+
+    async def reset(self, rule: ThrottleRule, key: str) -> None:
+        await self.backend.reset(f"{rule.name}:{key}")
+
+    def stats(self) -> dict[str, Any]:
+        return self.backend.stats() | dict(throttled=self.throttled)
+
+
+throttler = Throttler(create_throttle_backend())
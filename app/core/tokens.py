@@ -0,0 +1,310 @@
+import abc
+import base64
+import binascii
+import hashlib
+import hmac
+import time
+from typing import Any
+
+import orjson
+from pydantic import BaseModel
+
+from app.core.config import settings
+
+HMAC_DIGESTS = {
+    "HS256": hashlib.sha256,
+    "HS384": hashlib.sha384,
+    "HS512": hashlib.sha512,
+}
+
+
+class InvalidTokenError(Exception):
+    """Token is malformed, badly signed, expired or not yet valid."""
+
+
+class TokenKey(BaseModel):
+    kid: str | None
+    algorithm: str
+    # Secret for HS* algorithms, PEM private key for asymmetric ones
+    signing_key: str | None
+    # PEM public key, derived from the private key when not given
+    verifying_key: str | None = None
+
+    @property
+    def is_symmetric(self) -> bool:
+        return self.algorithm in HMAC_DIGESTS
+
+
+class Keyring:
+    def __init__(self, keys: list[TokenKey], signing_kid: str | None) -> None:
+        """
+        Keys by `kid`. New tokens are signed with `signing_kid`,
+        tokens signed with any other listed key are still accepted.
+        Services that only verify tokens need no signing key.
+        """
+        self.keys = {key.kid: key for key in keys}
+        self.signing_kid = signing_kid
+
+    @classmethod
+    def from_settings(cls) -> "Keyring":
+        if not settings.TOKEN_KEYS and not settings.TOKEN_PUBLIC_KEYS:
+            key = TokenKey(
+                kid=None,
+                algorithm=settings.TOKEN_ALGORITHM,
+                signing_key=settings.SECRET_KEY,
+            )
+            return cls([key], signing_kid=None)
+
+        keys = [
+            TokenKey(
+                kid=kid,
+                algorithm=settings.TOKEN_ALGORITHM,
+                signing_key=signing_key,
+                verifying_key=settings.TOKEN_PUBLIC_KEYS.get(kid),
+            )
+            for kid, signing_key in settings.TOKEN_KEYS.items()
+        ]
+        keys += [
+            TokenKey(
+                kid=kid,
+                algorithm=settings.TOKEN_ALGORITHM,
+                signing_key=None,
+                verifying_key=verifying_key,
+            )
+            for kid, verifying_key in settings.TOKEN_PUBLIC_KEYS.items()
+            if kid not in settings.TOKEN_KEYS
+        ]
+        return cls(keys, signing_kid=settings.TOKEN_KEY_ID)
+
+    @property
+    def signing_key(self) -> TokenKey:
+        key = self.keys.get(self.signing_kid)
+        if key is None or key.signing_key is None:
+            raise ValueError(f"No signing key with kid {self.signing_kid!r}")
+        return key
+
+    def verifying_key(self, kid: str | None) -> TokenKey:
+        """
+        Tokens without `kid` are verified with the key of `signing_kid`.
+        """
+        try:
+            return self.keys[kid if kid is not None else self.signing_kid]
+        except KeyError:
+            raise InvalidTokenError(f"Unknown key {kid!r}")
+
+
+def validate_claims(claims: Any) -> dict[str, Any]:
+    if not isinstance(claims, dict):
+        raise InvalidTokenError("Claims must be an object")
+    now = time.time()
+    try:
+        if "exp" in claims and float(claims["exp"]) <= now:
+            raise InvalidTokenError("Signature has expired")
+        if "nbf" in claims and float(claims["nbf"]) > now:
+            raise InvalidTokenError("The token is not yet valid")
+    except (TypeError, ValueError):
+        raise InvalidTokenError("exp and nbf must be numbers")
+    return claims
+
+
+class TokenCodec(abc.ABC):
+    name: str
+
+    def __init__(self, keyring: Keyring) -> None:
+        """
+        Encode and verify JWTs. Key objects are prepared once per key.
+
+        **Parameters**
+
+        * `keyring`: Keys to sign and verify with
+        """
+        self.keyring = keyring
+
+    @abc.abstractmethod
+    def encode(self, claims: dict[str, Any]) -> str:
+        ...
+
+    @abc.abstractmethod
+    def decode(self, token: str) -> dict[str, Any]:
+        """
+        Verify the signature and the time claims and return the claims.
+        Raises `InvalidTokenError`.
+        """
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+class HMACCodec(TokenCodec):
+    """
+    Minimal HS256/HS384/HS512 JWT implementation on top of `hmac`.
+    """
+
+    name = "hmac"
+
+    def __init__(self, keyring: Keyring) -> None:
+        super().__init__(keyring)
+        self._macs = {}
+        self._headers = {}
+        for kid, key in keyring.keys.items():
+            # Retired secrets may be listed as verifying keys only
+            secret = key.verifying_key or key.signing_key
+            if not key.is_symmetric or secret is None:
+                raise ValueError("hmac token backend supports only HS* secrets")
+            self._macs[kid] = hmac.new(
+                secret.encode(), digestmod=HMAC_DIGESTS[key.algorithm]
+            )
+            header = {"alg": key.algorithm, "typ": "JWT"}
+            if kid is not None:
+                header["kid"] = kid
+            self._headers[kid] = _b64encode(orjson.dumps(header))
+
+    def _sign(self, kid: str | None, signing_input: bytes) -> bytes:
+        mac = self._macs[kid].copy()
+        mac.update(signing_input)
+        return mac.digest()
+
+    def encode(self, claims: dict[str, Any]) -> str:
+        kid = self.keyring.signing_key.kid
+        signing_input = self._headers[kid] + b"." + _b64encode(orjson.dumps(claims))
+        signature = _b64encode(self._sign(kid, signing_input))
+        return (signing_input + b"." + signature).decode()
+
+    def decode(self, token: str) -> dict[str, Any]:
+        try:
+            signing_input, signature = token.encode().rsplit(b".", 1)
+            header_segment, payload_segment = signing_input.split(b".")
+            header = orjson.loads(_b64decode(header_segment))
+            key = self.keyring.verifying_key(header.get("kid"))
+            if header.get("alg") != key.algorithm:
+                raise InvalidTokenError("Unexpected algorithm")
+            if not hmac.compare_digest(
+                self._sign(key.kid, signing_input), _b64decode(signature)
+            ):
+                raise InvalidTokenError("Signature verification failed")
+            claims = orjson.loads(_b64decode(payload_segment))
+        except (ValueError, AttributeError, binascii.Error, orjson.JSONDecodeError):
+            raise InvalidTokenError("Malformed token")
+        return validate_claims(claims)
+
+
+class PyJWTCodec(TokenCodec):
+    """
+    PyJWT backend, supports asymmetric algorithms such as ES256 and EdDSA.
+    Requires the `pyjwt` extra, `PyJWT[crypto]`.
+    """
+
+    name = "pyjwt"
+
+    def __init__(self, keyring: Keyring) -> None:
+        super().__init__(keyring)
+        try:
+            import jwt
+        except ImportError:  # pragma: no cover
+            raise RuntimeError(
+                "pyjwt token backend requires the pyjwt extra: PyJWT[crypto]"
+            )
+        self._jwt = jwt
+        algorithms = jwt.algorithms.get_default_algorithms()
+        self._signing_keys: dict[str | None, Any] = {}
+        self._verifying_keys: dict[str | None, Any] = {}
+        for kid, key in keyring.keys.items():
+            algorithm = algorithms[key.algorithm]
+            if key.signing_key is not None:
+                self._signing_keys[kid] = algorithm.prepare_key(key.signing_key)
+            if key.verifying_key is not None:
+                self._verifying_keys[kid] = algorithm.prepare_key(key.verifying_key)
+            elif key.is_symmetric:
+                self._verifying_keys[kid] = self._signing_keys[kid]
+            else:
+                self._verifying_keys[kid] = self._signing_keys[kid].public_key()
+
+    def encode(self, claims: dict[str, Any]) -> str:
+        key = self.keyring.signing_key
+        return self._jwt.encode(
+            claims,
+            self._signing_keys[key.kid],
+            algorithm=key.algorithm,
+            headers={"kid": key.kid} if key.kid is not None else None,
+        )
+
+    def decode(self, token: str) -> dict[str, Any]:
+        try:
+            header = self._jwt.get_unverified_header(token)
+            key = self.keyring.verifying_key(header.get("kid"))
+            return self._jwt.decode(
+                token,
+                self._verifying_keys[key.kid],
+                algorithms=[key.algorithm],
+                options={"verify_sub": False},
+            )
+        except self._jwt.PyJWTError as exc:
+            raise InvalidTokenError(str(exc))
+
+
+class JoseCodec(TokenCodec):
+    """
+    python-jose backend.
+    """
+
+    name = "jose"
+
+    def __init__(self, keyring: Keyring) -> None:
+        super().__init__(keyring)
+        from jose import jwk, jwt
+
+        self._jwt = jwt
+        self._signing_keys = {
+            kid: jwk.construct(key.signing_key, key.algorithm)
+            for kid, key in keyring.keys.items()
+            if key.signing_key is not None
+        }
+        self._verifying_keys = {
+            kid: jwk.construct(key.verifying_key or key.signing_key, key.algorithm)
+            for kid, key in keyring.keys.items()
+        }
+
+    def encode(self, claims: dict[str, Any]) -> str:
+        key = self.keyring.signing_key
+        return self._jwt.encode(
+            claims,
+            self._signing_keys[key.kid],
+            algorithm=key.algorithm,
+            headers={"kid": key.kid} if key.kid is not None else None,
+        )
+
+    def decode(self, token: str) -> dict[str, Any]:
+        try:
+            header = self._jwt.get_unverified_header(token)
+            key = self.keyring.verifying_key(header.get("kid"))
+            return self._jwt.decode(
+                token,
+                self._verifying_keys[key.kid],
+                algorithms=[key.algorithm],
+                options={"verify_sub": False},
+            )
+        except self._jwt.JWTError as exc:
+            raise InvalidTokenError(str(exc))
+
+
+TOKEN_BACKENDS: dict[str, type[TokenCodec]] = {
+    "hmac": HMACCodec,
+    "pyjwt": PyJWTCodec,
+    "jose": JoseCodec,
+}
+
+
+def create_token_codec(
+    backend: str | None = None, keyring: Keyring | None = None
+) -> TokenCodec:
+    return TOKEN_BACKENDS[backend or settings.TOKEN_BACKEND](
+        keyring or Keyring.from_settings()
+    )
+
+
+token_codec = create_token_codec()
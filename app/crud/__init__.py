@@ -1,2 +1,3 @@
 # flake8: noqa
+from .revoked_token import revoked_token
 from .user import user
@@ -1,41 +1,330 @@
-from typing import Any, Generic, Type, TypeVar
+from itertools import groupby
+from typing import (
+    Any,
+    AsyncIterator,
+    Generic,
+    Iterable,
+    Iterator,
+    Sequence,
+    Type,
+    TypeVar,
+)
 
 from databases import Database
 from pydantic import BaseModel
-from sqlalchemy import Table, delete, update
+from sqlalchemy import (
+    Column,
+    Table,
+    case,
+    cast,
+    delete,
+    func,
+    literal_column,
+    select,
+    tuple_,
+    update,
+)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.sql import Select
+
+from app.core.cache import CacheBackend
+from app.core.config import settings
+from app.core.singleflight import SingleFlight
+from app.crud.cache import RowCache
+from app.crud.pagination import Cursor
+from app.db.database import DatabaseSession, DetachedReader
 
 ModelTable = TypeVar("ModelTable", bound=Table)
 CreateSchemaType = TypeVar("CreateSchemaType", bound=BaseModel)
 UpdateSchemaType = TypeVar("UpdateSchemaType", bound=BaseModel)
+T = TypeVar("T")
+
+
+def chunked(items: Sequence[T], size: int | None) -> Iterator[Sequence[T]]:
+    size = size or settings.CRUD_BULK_CHUNK_SIZE
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def insert_default(column: Column) -> Any:
+    """
+    Value of a column a row of a multi-row INSERT leaves out.
+    """
+    default = column.default
+    if default is not None and (default.is_scalar or default.is_clause_element):
+        return default.arg
+    # The server default, NULL when there is none
+    return literal_column("DEFAULT")
 
 
 class CRUDBase(Generic[ModelTable, CreateSchemaType, UpdateSchemaType]):
-    def __init__(self, model: Type[ModelTable]):
+    # Indexed columns rows can be ordered by in keyset pagination
+    sortable_columns: tuple[str, ...] = ("id",)
+    # Unique columns rows are cached by when the object has a cache
+    cached_columns: tuple[str, ...] = ("id",)
+
+    def __init__(
+        self,
+        model: Type[ModelTable],
+        *,
+        cache: CacheBackend | None = None,
+        cache_ttl: float = 0,
+    ):
         """
         CRUD object with async default methods to Create, Read, Update, Delete (CRUD).
 
         **Parameters**
 
         * `model`: A SQLAlchemy model class
-        * `schema`: A Pydantic model (schema) class
+        * `cache`: Backend of a read-through cache of whole rows by
+        `cached_columns`, kept current by the write methods. No caching when None
+        * `cache_ttl`: Seconds a row stays cached
         """
         self.model = model
+        self.cache = (
+            RowCache(
+                model,
+                cache,
+                columns=self.cached_columns,
+                ttl=cache_ttl,
+                # Until replicas that may still have the old row are skipped
+                hold=settings.REPLICA_MAX_LAG + settings.REPLICA_CHECK_INTERVAL
+                if settings.REPLICA_URLS
+                else 0,
+            )
+            if cache is not None
+            else None
+        )
+        # Lookups by a unique column in flight, shared by concurrent callers
+        self.flights = SingleFlight()
+
+    async def invalidate(self, db_objs: Iterable[Any]) -> None:
+        """
+        Drop cached copies of rows, called by every write with the rows
+        it changed, both before and after the change.
+        """
+        db_objs = [db_obj for db_obj in db_objs if db_obj is not None]
+        # Reads already in flight may miss the change, later ones start anew
+        for db_obj in db_objs:
+            for column in self.cached_columns:
+                self.flights.forget((column, db_obj[column]))
+        if self.cache is not None:
+            await self.cache.invalidate(db_objs)
 
-    async def get(self, db: Database, *, model_id: int) -> Any:
+    def _select(self, columns: Sequence[str] | None = None) -> Select:
+        """
+        SELECT of the given columns only, all columns when None.
+        """
+        if columns is None:
+            return self.model.select()
+        return select(*(self.model.c[column] for column in columns))
+
+    async def get(
+        self, db: Database, *, model_id: int, columns: Sequence[str] | None = None
+    ) -> Any:
+        if columns is None:
+            return await self.get_by(db, column="id", value=model_id)
         return await db.fetch_one(
-            self.model.select().where(self.model.c.id == model_id)
+            self._select(columns).where(self.model.c.id == model_id)
+        )
+
+    async def get_by(
+        self, db: Database, *, column: str, value: Any, cached: bool = True
+    ) -> Any:
+        """
+        Row where the unique `column` equals `value`. Read through the cache
+        when there is one and `column` is cached, unless `cached` is False.
+        Concurrent lookups of the same row share one query, except on
+        sessions that wrote and must read their own changes from the primary.
+        Sessions batch lookups by id with other ids requested at the same time.
+        """
+
+        def query(reader: Any) -> Any:
+            if column == "id" and isinstance(reader, (DatabaseSession, DetachedReader)):
+                return reader.loader(self.model).load(value)
+            return reader.fetch_one(
+                self.model.select().where(self.model.c[column] == value)
+            )
+
+        def fetch() -> Any:
+            if getattr(db, "on_primary", False):
+                return query(db)
+            # Other requests may wait for the result: read on connections of its
+            # own, which the cancellation of the request that started it can't close
+            reader = db.detached if isinstance(db, DatabaseSession) else db
+            return self.flights.do((column, value), lambda: query(reader))
+
+        if cached and self.cache is not None and column in self.cache.columns:
+            return await self.cache.get(column, value, fetch)
+        return await fetch()
+
+    async def get_multi_by_id(
+        self, db: Database, *, model_ids: Sequence[int]
+    ) -> list[Any]:
+        return await db.fetch_all(
+            self.model.select().where(self.model.c.id.in_(model_ids))
         )
 
     async def get_multi(
-        self, db: Database, *, skip: int = 0, limit: int = 100
+        self,
+        db: Database,
+        *,
+        skip: int = 0,
+        limit: int = 100,
+        columns: Sequence[str] | None = None,
     ) -> list[Any]:
-        return await db.fetch_all(self.model.select().offset(skip).limit(limit))
+        return await db.fetch_all(
+            self._select(columns).order_by(self.model.c.id).offset(skip).limit(limit)
+        )
+
+    async def iterate(
+        self, db: Database, *, columns: Sequence[str] | None = None
+    ) -> AsyncIterator[Any]:
+        """
+        Stream all rows ordered by id through a server-side cursor.
+        """
+        query = self._select(columns).order_by(self.model.c.id)
+        async for row in db.iterate(query):
+            yield row
+
+    async def get_page(
+        self,
+        db: Database,
+        *,
+        limit: int = 100,
+        cursor: Cursor | None = None,
+        order_by: str = "id",
+        columns: Sequence[str] | None = None,
+    ) -> tuple[list[Any], Cursor | None, Cursor | None]:
+        """
+        Keyset pagination: return rows next to `cursor` with cursors
+        of the next and the previous pages. Cost doesn't depend on page depth.
+        `columns` are selected along with the keys the cursors need.
+        """
+        if cursor is not None:
+            order_by = cursor.order_by
+        if order_by not in self.sortable_columns:
+            raise ValueError(f"Can't order by {order_by}")
+        backward = cursor is not None and cursor.backward
+
+        keys = [self.model.c.id]
+        if order_by != "id":
+            keys.insert(0, self.model.c[order_by])
+        if columns is not None:
+            columns = list(dict.fromkeys([*columns, *(key.name for key in keys)]))
+        query = self._select(columns)
+        if cursor is not None:
+            position = [cursor.value, cursor.id] if order_by != "id" else [cursor.id]
+            query = query.where(
+                tuple_(*keys) < tuple_(*position)
+                if backward
+                else tuple_(*keys) > tuple_(*position)
+            )
+        query = query.order_by(*(key.desc() if backward else key for key in keys))
+        rows = await db.fetch_all(query.limit(limit + 1))
+
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        if backward:
+            rows.reverse()
+        if not rows:
+            return rows, None, None
+
+        def row_cursor(row: Any, backward: bool) -> Cursor:
+            return Cursor(
+                order_by=order_by, value=row[order_by], id=row.id, backward=backward
+            )
+
+        # Coming from a cursor means rows exist on that side of the page
+        has_next = backward or has_more
+        has_prev = has_more if backward else cursor is not None
+        return (
+            rows,
+            row_cursor(rows[-1], backward=False) if has_next else None,
+            row_cursor(rows[0], backward=True) if has_prev else None,
+        )
 
     async def create(self, db: Database, *, obj_in: CreateSchemaType) -> Any:
         obj_in_data = obj_in.dict(exclude_unset=True)
-        db_query = self.model.insert().values(**obj_in_data)
-        obj_id = await db.execute(db_query)
-        return await self.get(db=db, model_id=obj_id)
+        db_obj = await db.fetch_one(
+            self.model.insert().values(**obj_in_data).returning(*self.model.c)
+        )
+        await self.invalidate([db_obj])
+        return db_obj
+
+    async def create_or_conflict(
+        self,
+        db: Database,
+        *,
+        obj_in: CreateSchemaType,
+        conflict_columns: Sequence[str] = ("id",),
+    ) -> Any:
+        """
+        Insert unless a row with the same `conflict_columns` exists, in one
+        statement. Returns the created row, None when the row already existed.
+        """
+        return await self._create_or_conflict(
+            db,
+            values=obj_in.dict(exclude_unset=True),
+            conflict_columns=conflict_columns,
+        )
+
+    async def upsert(
+        self,
+        db: Database,
+        *,
+        obj_in: CreateSchemaType,
+        conflict_columns: Sequence[str] = ("id",),
+    ) -> Any:
+        """
+        Insert, or update the row with the same `conflict_columns`
+        with the given fields, in one statement. Returns the row.
+        """
+        return await self._upsert(
+            db,
+            values=obj_in.dict(exclude_unset=True),
+            conflict_columns=conflict_columns,
+        )
+
+    async def _create_or_conflict(
+        self,
+        db: Database,
+        *,
+        values: dict[str, Any],
+        conflict_columns: Sequence[str],
+    ) -> Any:
+        db_obj = await db.fetch_one(
+            insert(self.model)
+            .values(**values)
+            .on_conflict_do_nothing(index_elements=conflict_columns)
+            .returning(*self.model.c)
+        )
+        await self.invalidate([db_obj])
+        return db_obj
+
+    async def _upsert(
+        self,
+        db: Database,
+        *,
+        values: dict[str, Any],
+        conflict_columns: Sequence[str],
+        extra_updates: dict[str, Any] | None = None,
+    ) -> Any:
+        query = insert(self.model).values(**values)
+        updates = {
+            field: query.excluded[field]
+            for field in values
+            if field not in conflict_columns
+        }
+        db_obj = await db.fetch_one(
+            query.on_conflict_do_update(
+                index_elements=conflict_columns,
+                set_=updates | (extra_updates or {}),
+            ).returning(*self.model.c)
+        )
+        # Conflict columns can't change, the row's keys are the same before
+        await self.invalidate([db_obj])
+        return db_obj
 
     async def update(
         self, db: Database, *, db_obj: Any, obj_in: UpdateSchemaType | dict[str, Any]
@@ -44,11 +333,176 @@ class CRUDBase(Generic[ModelTable, CreateSchemaType, UpdateSchemaType]):
             update_data = obj_in
         else:
             update_data = obj_in.dict(exclude_unset=True)
-        obj_id = db_obj.id
-        await db.execute(
-            update(self.model).where(self.model.c.id == obj_id).values(**update_data)
+        if all(db_obj[field] == value for field, value in update_data.items()):
+            # Nothing changes, skip the round trip
+            return db_obj
+        updated = await db.fetch_one(
+            update(self.model)
+            .where(self.model.c.id == db_obj.id)
+            .values(**update_data)
+            .returning(*self.model.c)
         )
-        return await self.get(db=db, model_id=obj_id)
+        await self.invalidate([db_obj, updated])
+        return updated
 
     async def remove(self, db: Database, *, model_id: int) -> None:
-        return await db.execute(delete(self.model).where(self.model.c.id == model_id))
+        db_obj = await db.fetch_one(
+            delete(self.model)
+            .where(self.model.c.id == model_id)
+            .returning(*self.model.c)
+        )
+        await self.invalidate([db_obj])
+
+    async def create_many(
+        self,
+        db: Database,
+        *,
+        objs_in: Sequence[CreateSchemaType],
+        chunk_size: int | None = None,
+        conflict_columns: Sequence[str] | None = None,
+    ) -> list[Any]:
+        """
+        Insert objects with one multi-row INSERT per chunk.
+        Created rows are returned in input order. With `conflict_columns`,
+        objects conflicting on them are skipped and None takes their place.
+        """
+        return await self._insert_many(
+            db,
+            rows=[obj_in.dict(exclude_unset=True) for obj_in in objs_in],
+            chunk_size=chunk_size,
+            conflict_columns=conflict_columns,
+        )
+
+    async def update_many(
+        self,
+        db: Database,
+        *,
+        objs_in: Sequence[tuple[Any, UpdateSchemaType | dict[str, Any]]],
+        chunk_size: int | None = None,
+    ) -> list[Any]:
+        """
+        Apply `(db_obj, obj_in)` updates with one UPDATE per chunk and set of fields.
+        Updated rows are returned in input order.
+        """
+        return await self._update_many(
+            db,
+            updates=[
+                (
+                    db_obj,
+                    obj_in
+                    if isinstance(obj_in, dict)
+                    else obj_in.dict(exclude_unset=True),
+                )
+                for db_obj, obj_in in objs_in
+            ],
+            chunk_size=chunk_size,
+        )
+
+    async def remove_many(
+        self, db: Database, *, model_ids: Sequence[int], chunk_size: int | None = None
+    ) -> list[Any]:
+        """
+        Delete objects with one DELETE per chunk and return the deleted rows.
+        """
+        removed = []
+        for chunk in chunked(model_ids, chunk_size):
+            removed += await db.fetch_all(
+                delete(self.model)
+                .where(self.model.c.id.in_(chunk))
+                .returning(*self.model.c)
+            )
+        await self.invalidate(removed)
+        return removed
+
+    async def _insert_many(
+        self,
+        db: Database,
+        *,
+        rows: list[dict[str, Any]],
+        chunk_size: int | None,
+        conflict_columns: Sequence[str] | None = None,
+    ) -> list[Any]:
+        # A multi-row INSERT needs the same columns in every row. Columns with
+        # Python defaults are rendered even when no row sets them
+        fields = {field for row in rows for field in row}
+        defaults = {
+            field: insert_default(column)
+            for field, column in self.model.c.items()
+            if field in fields or column.default is not None
+        }
+        created = []
+        for chunk in chunked(rows, chunk_size):
+            # RETURNING doesn't keep VALUES order: ids are drawn up front,
+            # so that the returned rows can be matched to the inputs
+            ids = iter(
+                await self._next_ids(db, count=sum("id" not in row for row in chunk))
+            )
+            values = [
+                defaults | row if "id" in row else defaults | row | dict(id=next(ids))
+                for row in chunk
+            ]
+            query = insert(self.model).values(values)
+            if conflict_columns is not None:
+                query = query.on_conflict_do_nothing(index_elements=conflict_columns)
+            db_objs = await db.fetch_all(query.returning(*self.model.c))
+            db_objs_by_id = {db_obj.id: db_obj for db_obj in db_objs}
+            created += [db_objs_by_id.get(row["id"]) for row in values]
+        await self.invalidate(created)
+        return created
+
+    async def _next_ids(self, db: Database, *, count: int) -> list[int]:
+        """
+        Draw `count` values from the sequence of the id column.
+        """
+        if not count:
+            return []
+        if isinstance(db, DatabaseSession):
+            # nextval writes, replicas can't run it
+            db.use_primary()
+        sequence = func.pg_get_serial_sequence(func.quote_ident(self.model.name), "id")
+        rows = await db.fetch_all(
+            select(func.nextval(sequence)).select_from(func.generate_series(1, count))
+        )
+        return [row[0] for row in rows]
+
+    async def _update_many(
+        self,
+        db: Database,
+        *,
+        updates: list[tuple[Any, dict[str, Any]]],
+        chunk_size: int | None,
+    ) -> list[Any]:
+        updated = {}
+        changed = [
+            (db_obj, update_data)
+            for db_obj, update_data in updates
+            if any(db_obj[field] != value for field, value in update_data.items())
+        ]
+
+        def fields_key(item: tuple[Any, dict[str, Any]]) -> tuple[str, ...]:
+            return tuple(sorted(item[1]))
+
+        for fields, group in groupby(sorted(changed, key=fields_key), key=fields_key):
+            for chunk in chunked(list(group), chunk_size):
+                ids = [db_obj.id for db_obj, _ in chunk]
+                values = {
+                    field: case(
+                        {
+                            db_obj.id: cast(
+                                update_data[field], self.model.c[field].type
+                            )
+                            for db_obj, update_data in chunk
+                        },
+                        value=self.model.c.id,
+                    )
+                    for field in fields
+                }
+                db_objs = await db.fetch_all(
+                    update(self.model)
+                    .where(self.model.c.id.in_(ids))
+                    .values(values)
+                    .returning(*self.model.c)
+                )
+                updated |= {db_obj.id: db_obj for db_obj in db_objs}
+        await self.invalidate([*(db_obj for db_obj, _ in changed), *updated.values()])
+        return [updated.get(db_obj.id, db_obj) for db_obj, _ in updates]
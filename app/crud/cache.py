@@ -0,0 +1,119 @@
+import time
+from typing import Any, Awaitable, Callable, Iterable
+
+from sqlalchemy import Table
+
+from app.core.cache import CacheBackend, CachedRow
+
+
+class RowCache:
+    def __init__(
+        self,
+        table: Table,
+        backend: CacheBackend,
+        *,
+        columns: Iterable[str],
+        ttl: float,
+        hold: float = 0,
+    ) -> None:
+        """
+        Read-through cache of the rows of `table` by unique columns.
+        Every cached row is stored once per column, writes drop all its keys.
+
+        **Parameters**
+
+        * `table`: Table the rows belong to
+        * `backend`: Where rows are stored
+        * `columns`: Unique columns rows are looked up by
+        * `ttl`: Seconds a row is kept
+        * `hold`: Seconds after an invalidation during which a key isn't stored
+        again, so a lagging replica can't put the old row back
+        """
+        self.table = table
+        self.backend = backend
+        self.columns = tuple(columns)
+        self.ttl = ttl
+        self.hold = hold
+        # Bumped by every invalidation: a row read before it is not stored
+        self._generation = 0
+        # Monotonic time until which a recently invalidated key isn't stored
+        self._held: dict[str, float] = {}
+
+        self.hits = 0
+        self.misses = 0
+        self.hit_seconds = 0.0
+        self.miss_seconds = 0.0
+
+    def key(self, column: str, value: Any) -> str:
+        return f"{self.table.name}:{column}:{value}"
+
+    def keys(self, row: Any) -> list[str]:
+        return [self.key(column, row[column]) for column in self.columns]
+
+    async def get(
+        self, column: str, value: Any, fetch: Callable[[], Awaitable[Any]]
+    ) -> Any:
+        """
+        Cached row where `column` equals `value`, read with `fetch` on a miss.
+        Missing rows are not cached.
+        """
+        started = time.perf_counter()
+        row = await self.backend.get(self.key(column, value))
+        if row is not None:
+            self.hits += 1
+            self.hit_seconds += time.perf_counter() - started
+            return row
+
+        generation = self._generation
+        row = await fetch()
+        self.misses += 1
+        self.miss_seconds += time.perf_counter() - started
+        if row is not None and generation == self._generation:
+            row = CachedRow((name, row[name]) for name in row)
+            keys = self.keys(row)
+            if not self._is_held(keys):
+                for key in keys:
+                    await self.backend.set(key, row, ttl=self.ttl)
+        return row
+
+    def _is_held(self, keys: list[str]) -> bool:
+        if not self._held:
+            return False
+        now = time.monotonic()
+        return any(self._held.get(key, 0.0) > now for key in keys)
+
+    async def invalidate(self, rows: Iterable[Any]) -> None:
+        """
+        Drop the keys of `rows`, pass both the old and the new version
+        of an updated row so that a changed unique value is dropped too.
+        """
+        self._generation += 1
+        keys = list(
+            dict.fromkeys(
+                key for row in rows if row is not None for key in self.keys(row)
+            )
+        )
+        if self.hold > 0:
+            now = time.monotonic()
+            self._held = {
+                key: until for key, until in self._held.items() if until > now
+            } | dict.fromkeys(keys, now + self.hold)
+        await self.backend.delete(*keys)
+
+    async def clear(self) -> None:
+        self._generation += 1
+        await self.backend.clear()
+
+    def stats(self) -> dict[str, Any]:
+        lookups = self.hits + self.misses
+        mean_hit = self.hit_seconds / self.hits if self.hits else 0.0
+        mean_miss = self.miss_seconds / self.misses if self.misses else 0.0
+        return self.backend.stats() | dict(
+            hits=self.hits,
+            misses=self.misses,
+            hit_ratio=self.hits / lookups if lookups else 0.0,
+            mean_hit_ms=mean_hit * 1000,
+            mean_miss_ms=mean_miss * 1000,
+            # Hits would each have cost a miss without the cache
+            latency_saved_seconds=self.hits * max(mean_miss - mean_hit, 0.0),
+        )
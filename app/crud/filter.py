@@ -0,0 +1,169 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Callable
+
+from databases import Database
+from sqlalchemy import Table, func, select
+
+from app.core.bloom import BloomFilter
+from app.db.database import DatabasePool
+
+logger = logging.getLogger(__name__)
+
+# Missed refreshes after which "absent" is no longer trusted
+STALE_AFTER_REFRESHES = 10
+
+
+class ExistenceFilter:
+    def __init__(
+        self,
+        table: Table,
+        column: str,
+        *,
+        changed_column: str,
+        capacity: int,
+        error_rate: float,
+        refresh_interval: float,
+        overlap: float,
+        rebuild_interval: float,
+        normalize: Callable[[str], str] | None = None,
+    ) -> None:
+        """
+        Bloom filter of the values of a unique column, answering "definitely
+        absent" without a query. Values written by this worker are added before
+        the write, values written by other workers are picked up by the periodic
+        refresh. So "absent" may be wrong for a value another worker wrote
+        within the last refresh interval, and is not given at all while the
+        filter isn't loaded or its refreshes fail.
+
+        **Parameters**
+
+        * `table`: Table the values are read from
+        * `column`: Column whose values are tracked
+        * `changed_column`: Timestamp column set by every insert and update
+        * `capacity`: Values the filter is sized for, grows with the table
+        * `error_rate`: False-positive rate at `capacity` values
+        * `refresh_interval`: Seconds between reads of rows written since the
+        last one
+        * `overlap`: Seconds re-read on every refresh to catch rows of slowly
+        committed transactions
+        * `rebuild_interval`: Seconds between full rebuilds, which drop deleted
+        and replaced values
+        * `normalize`: Applied to values before they are added or looked up,
+        to match how the database stores them
+        """
+        self.table = table
+        self.column = table.c[column]
+        self.changed_column = table.c[changed_column]
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.refresh_interval = refresh_interval
+        self.overlap = overlap
+        self.rebuild_interval = rebuild_interval
+        self.normalize = normalize
+        self.filter = BloomFilter(capacity=capacity, error_rate=error_rate)
+        self.loaded = False
+        self._loaded_at = 0.0
+        self._refreshed_at = 0.0
+        # Latest `changed_column` value read
+        self._since: datetime | None = None
+        # Values added while a load runs, copied into the new filter
+        self._added_during_load: list[str] | None = None
+        self._refresher: asyncio.Task | None = None
+
+        self.checks = 0
+        self.negatives = 0
+
+    def add(self, value: str) -> None:
+        if self.normalize is not None:
+            value = self.normalize(value)
+        self.filter.add(value)
+        if self._added_during_load is not None:
+            self._added_during_load.append(value)
+
+    @property
+    def is_fresh(self) -> bool:
+        age = time.monotonic() - self._refreshed_at
+        return self.loaded and age < self.refresh_interval * STALE_AFTER_REFRESHES
+
+    def might_contain(self, value: str) -> bool:
+        self.checks += 1
+        if self.normalize is not None:
+            value = self.normalize(value)
+        if not self.is_fresh or value in self.filter:
+            return True
+        self.negatives += 1
+        return False
+
+    async def load(self, db: Database) -> None:
+        """
+        Build a new filter from all rows.
+        """
+        self._added_during_load = []
+        try:
+            count = await db.fetch_val(select(func.count()).select_from(self.table))
+            bloom = BloomFilter(
+                capacity=max(self.capacity, 2 * count), error_rate=self.error_rate
+            )
+            since = None
+            async for row in db.iterate(select(self.column, self.changed_column)):
+                since = self._add_row(bloom, row, since)
+            for value in self._added_during_load:
+                bloom.add(value)
+        finally:
+            self._added_during_load = None
+        self.filter, self._since = bloom, since
+        self.loaded = True
+        self._loaded_at = self._refreshed_at = time.monotonic()
+
+    def _add_row(
+        self, bloom: BloomFilter, row: Any, since: datetime | None
+    ) -> datetime | None:
+        bloom.add(row[self.column.name])
+        changed_at = row[self.changed_column.name]
+        return changed_at if since is None or changed_at > since else since
+
+    async def refresh(self, db: Database) -> None:
+        """
+        Add values written since the last refresh, rebuild when due.
+        """
+        due = time.monotonic() - self._loaded_at > self.rebuild_interval
+        if not self.loaded or self.filter.is_full or due:
+            await self.load(db)
+            return
+        query = select(self.column, self.changed_column)
+        if self._since is not None:
+            query = query.where(
+                self.changed_column >= self._since - timedelta(seconds=self.overlap)
+            )
+        since = self._since
+        for row in await db.fetch_all(query):
+            since = self._add_row(self.filter, row, since)
+        self._since, self._refreshed_at = since, time.monotonic()
+
+    async def refresh_forever(self, pool: DatabasePool) -> None:
+        while True:
+            try:
+                async with pool.acquire() as db:
+                    await self.refresh(db)
+            except Exception as exc:
+                logger.warning("%s filter refresh failed: %s", self.column, exc)
+            await asyncio.sleep(self.refresh_interval)
+
+    async def start(self, pool: DatabasePool) -> None:
+        self._refresher = asyncio.create_task(self.refresh_forever(pool))
+
+    async def stop(self) -> None:
+        if self._refresher is not None:
+            self._refresher.cancel()
+            self._refresher = None
+
+    def stats(self) -> dict[str, Any]:
+        return self.filter.stats() | dict(
+            loaded=self.loaded,
+            fresh=self.is_fresh,
+            checks=self.checks,
+            negatives=self.negatives,
+        )
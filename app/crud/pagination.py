@@ -0,0 +1,26 @@
+import base64
+from typing import Any
+
+import orjson
+from pydantic import BaseModel, ValidationError
+
+
+class Cursor(BaseModel):
+    """
+    Position of a row in a keyset ordered by `order_by` and then `id`.
+    """
+
+    order_by: str
+    value: Any
+    id: int
+    backward: bool = False
+
+    def encode(self) -> str:
+        return base64.urlsafe_b64encode(orjson.dumps(self.dict())).decode()
+
+    @classmethod
+    def decode(cls, token: str) -> "Cursor":
+        try:
+            return cls.parse_obj(orjson.loads(base64.urlsafe_b64decode(token)))
+        except (ValueError, TypeError, ValidationError):
+            raise ValueError("Invalid cursor")
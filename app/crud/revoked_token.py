@@ -0,0 +1,44 @@
+from datetime import datetime
+from typing import Any
+
+from databases import Database
+from pydantic import BaseModel
+from sqlalchemy import delete, exists, func, select
+from sqlalchemy.dialects.postgresql import insert
+
+from app.crud.base import CRUDBase
+from app.models import revoked_token
+from app.schemas.revoked_token import RevokedTokenIn
+
+
+class CRUDRevokedToken(CRUDBase[type(revoked_token), RevokedTokenIn, BaseModel]):
+    async def revoke(self, db: Database, *, obj_in: RevokedTokenIn) -> None:
+        await db.execute(
+            insert(self.model)
+            .values(**obj_in.dict())
+            .on_conflict_do_nothing(index_elements=[self.model.c.jti])
+        )
+
+    async def is_revoked(self, db: Database, *, jti: str) -> bool:
+        return await db.fetch_val(select(exists().where(self.model.c.jti == jti)))
+
+    async def get_active_since(
+        self, db: Database, *, since: datetime | None = None
+    ) -> list[Any]:
+        """
+        jti and revoked_at of unexpired revocations made at or after `since`.
+        """
+        query = select(self.model.c.jti, self.model.c.revoked_at).where(
+            self.model.c.expires_at > func.now()
+        )
+        if since is not None:
+            query = query.where(self.model.c.revoked_at >= since)
+        return await db.fetch_all(query)
+
+    async def remove_expired(self, db: Database) -> None:
+        await db.execute(
+            delete(self.model).where(self.model.c.expires_at <= func.now())
+        )
+
+
+revoked_token = CRUDRevokedToken(revoked_token)
@@ -1,48 +1,297 @@
-from typing import Any, Optional
+import functools
+from typing import Any, Iterable, Optional, Sequence
 
 from databases import Database
+from sqlalchemy import func, select, update
 
-from app.core.security import get_password_hash, verify_password
+from app.core.cache import TTLCache, create_cache_backend
+from app.core.config import settings
+from app.core.hashing import PasswordHasherBusyError
+from app.core.security import (
+    get_password_hash,
+    get_password_hash_async,
+    password_hasher,
+    password_policy,
+    verify_password_async,
+)
 from app.crud.base import CRUDBase
+from app.crud.filter import ExistenceFilter
+from app.db.database import DatabaseSession
 from app.models import user
 from app.schemas.user import UserIn, UserUpdate
 
+# Changes that make access tokens carrying the user's claims stale
+TOKEN_VERSION_FIELDS = ("is_active", "is_superuser", "hashed_password")
+_MISSING = object()
+# $2a$, $2b$ or $2y$ and a two-digit cost, other hashes have no bcrypt cost
+BCRYPT_HASH_PATTERN = r"^\$2[aby]\$[0-9]{2}\$"
+
 
 class CRUDUser(CRUDBase[type(user), UserIn, UserUpdate]):
-    async def get_by_email(self, db: Database, *, email: str) -> Any:
-        return await db.fetch_one(
-            self.model.select().where(self.model.c.email == email)
+    sortable_columns = ("id", "email")
+    cached_columns = ("id", "email")
+
+    def __init__(self, model: type(user)):
+        super().__init__(
+            model,
+            cache=create_cache_backend(
+                maxsize=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL
+            ),
+            cache_ttl=settings.USER_CACHE_TTL,
+        )
+        # token_version by user id, None for deleted users
+        self.token_versions = TTLCache(
+            maxsize=settings.USER_CACHE_SIZE, ttl=settings.TOKEN_VERSION_CACHE_TTL
+        )
+        # Emails of existing users, added here before every write that sets one
+        self.emails = ExistenceFilter(
+            model,
+            "email",
+            changed_column="updated_at",
+            capacity=settings.EMAIL_FILTER_CAPACITY,
+            error_rate=settings.EMAIL_FILTER_ERROR_RATE,
+            refresh_interval=settings.EMAIL_FILTER_REFRESH_INTERVAL,
+            overlap=settings.EMAIL_FILTER_OVERLAP,
+            rebuild_interval=settings.EMAIL_FILTER_REBUILD_INTERVAL,
+            # EmailType stores emails lowercased
+            normalize=str.lower,
+        )
+
+    async def invalidate(self, db_objs: Iterable[Any]) -> None:
+        db_objs = [db_obj for db_obj in db_objs if db_obj is not None]
+        await super().invalidate(db_objs)
+        for db_obj in db_objs:
+            self.token_versions.delete(db_obj.id)
+
+    async def invalidate_all(self) -> None:
+        await self.cache.clear()
+        self.token_versions.clear()
+
+    async def get_token_version(self, db: Database, *, model_id: int) -> int | None:
+        token_version = self.token_versions.get(model_id, _MISSING)
+        if token_version is _MISSING:
+            token_version = await db.fetch_val(
+                select(self.model.c.token_version).where(self.model.c.id == model_id)
+            )
+            self.token_versions.set(model_id, token_version)
+        return token_version
+
+    async def get_by_email(
+        self, db: Database, *, email: str, cached: bool = True, filtered: bool = False
+    ) -> Any:
+        """
+        With `filtered`, emails the filter has never seen are answered with None
+        without a query. An email written by another worker within the last
+        filter refresh interval may be missed.
+        """
+        # As EmailType stores it, so mixed-case lookups share the cache keys
+        email = email.lower()
+        if filtered and not self.emails.might_contain(email):
+            return None
+        return await self.get_by(db, column="email", value=email, cached=cached)
+
+    async def get_multi_by_email(
+        self, db: Database, *, emails: Sequence[str]
+    ) -> list[Any]:
+        return await db.fetch_all(
+            self.model.select().where(self.model.c.email.in_(emails))
         )
 
     async def create(self, db: Database, *, obj_in: UserIn) -> Any:
-        db_obj = obj_in.dict(exclude={"password"})
-        db_obj["hashed_password"] = get_password_hash(obj_in.password)
-        user_id = await db.execute(self.model.insert().values(**db_obj))
-        return await self.get(db, model_id=user_id)
+        db_obj = await db.fetch_one(
+            self.model.insert()
+            .values(**await self._hash_create_password(obj_in))
+            .returning(*self.model.c)
+        )
+        await self.invalidate([db_obj])
+        return db_obj
+
+    async def create_or_conflict(
+        self,
+        db: Database,
+        *,
+        obj_in: UserIn,
+        conflict_columns: Sequence[str] = ("email",),
+    ) -> Any:
+        """
+        Create the user unless the email is taken, None when it is.
+        """
+        values = await self._hash_create_password(obj_in)
+        return await self._create_or_conflict(
+            db, values=values, conflict_columns=conflict_columns
+        )
+
+    async def upsert(
+        self,
+        db: Database,
+        *,
+        obj_in: UserIn,
+        conflict_columns: Sequence[str] = ("email",),
+    ) -> Any:
+        """
+        Create the user or update the given fields of the one with the same
+        email. Updating revokes the user's tokens, the password may have changed.
+        """
+        values = await self._hash_create_password(obj_in, exclude_unset=True)
+        return await self._upsert(
+            db,
+            values=values,
+            conflict_columns=conflict_columns,
+            extra_updates=dict(token_version=self.model.c.token_version + 1),
+        )
+
+    async def _hash_create_password(
+        self, obj_in: UserIn, *, exclude_unset: bool = False
+    ) -> dict[str, Any]:
+        values = obj_in.dict(exclude={"password"}, exclude_unset=exclude_unset)
+        values["hashed_password"] = await get_password_hash_async(obj_in.password)
+        self.emails.add(obj_in.email)
+        return values
 
     async def update(
         self, db: Database, *, db_obj: user, obj_in: UserUpdate | dict[str, Any]
     ) -> Any:
+        update_data = self._bump_token_version(
+            db_obj, await self._hash_update_password(obj_in)
+        )
+        if update_data.get("email"):
+            self.emails.add(update_data["email"])
+        return await super().update(db, db_obj=db_obj, obj_in=update_data)
+
+    async def create_many(
+        self,
+        db: Database,
+        *,
+        objs_in: Sequence[UserIn],
+        chunk_size: int | None = None,
+        conflict_columns: Sequence[str] | None = None,
+    ) -> list[Any]:
+        hashed_passwords = await password_hasher.map(
+            functools.partial(get_password_hash, rounds=password_policy.rounds),
+            [obj_in.password for obj_in in objs_in],
+        )
+        rows = [
+            obj_in.dict(exclude={"password"}) | dict(hashed_password=hashed_password)
+            for obj_in, hashed_password in zip(objs_in, hashed_passwords)
+        ]
+        for row in rows:
+            self.emails.add(row["email"])
+        return await self._insert_many(
+            db, rows=rows, chunk_size=chunk_size, conflict_columns=conflict_columns
+        )
+
+    async def update_many(
+        self,
+        db: Database,
+        *,
+        objs_in: Sequence[tuple[Any, UserUpdate | dict[str, Any]]],
+        chunk_size: int | None = None,
+    ) -> list[Any]:
+        updates_data = [
+            obj_in if isinstance(obj_in, dict) else obj_in.dict(exclude_unset=True)
+            for _, obj_in in objs_in
+        ]
+        passwords = [
+            update_data["password"]
+            for update_data in updates_data
+            if update_data.get("password")
+        ]
+        hashed_passwords = iter(
+            await password_hasher.map(
+                functools.partial(get_password_hash, rounds=password_policy.rounds),
+                passwords,
+            )
+        )
+        updates = []
+        for (db_obj, _), update_data in zip(objs_in, updates_data):
+            update_data = dict(update_data)
+            if update_data.pop("password", None):
+                update_data["hashed_password"] = next(hashed_passwords)
+            updates.append((db_obj, self._bump_token_version(db_obj, update_data)))
+        for _, update_data in updates:
+            if update_data.get("email"):
+                self.emails.add(update_data["email"])
+        return await self._update_many(db, updates=updates, chunk_size=chunk_size)
+
+    @staticmethod
+    async def _hash_update_password(
+        obj_in: UserUpdate | dict[str, Any]
+    ) -> dict[str, Any]:
         if isinstance(obj_in, dict):
-            update_data = obj_in
+            update_data = dict(obj_in)
         else:
             update_data = obj_in.dict(exclude_unset=True)
-        if update_data.get("password"):
-            hashed_password = get_password_hash(update_data["password"])
-            del update_data["password"]
-            update_data["hashed_password"] = hashed_password
-        return await super().update(db, db_obj=db_obj, obj_in=update_data)
+        if "password" in update_data:
+            password = update_data.pop("password")
+            if password:
+                update_data["hashed_password"] = await password_hasher.run(
+                    get_password_hash,
+                    password,
+                    password_policy.rounds,
+                )
+        return update_data
+
+    @staticmethod
+    def _bump_token_version(db_obj: Any, update_data: dict[str, Any]) -> dict[str, Any]:
+        if any(
+            field in update_data and update_data[field] != db_obj[field]
+            for field in TOKEN_VERSION_FIELDS
+        ):
+            update_data["token_version"] = db_obj.token_version + 1
+        return update_data
 
     async def authenticate(
         self, db: Database, *, email: str, password: str
     ) -> Optional[Any]:
-        obj = await self.get_by_email(db, email=email)
+        # Uncached and from the primary: a password changed on another worker
+        # must not still log in
+        if isinstance(db, DatabaseSession):
+            db.use_primary()
+        obj = await self.get_by_email(db, email=email, cached=False)
         if not obj:
             return None
-        if not verify_password(password, obj.hashed_password):
+        if not await verify_password_async(password, obj.hashed_password):
             return None
+        if password_policy.needs_rehash(obj.hashed_password):
+            obj = await self._rehash_password(db, db_obj=obj, password=password)
         return obj
 
+    async def _rehash_password(
+        self, db: Database, *, db_obj: Any, password: str
+    ) -> Any:
+        """
+        Store the password hashed with the current policy. Skipped when the
+        hashing pool is busy, the next login tries again.
+        The hash changes but not the password, so issued tokens stay valid.
+        A password changed since `db_obj` was read is left as it is.
+        """
+        try:
+            hashed_password = await get_password_hash_async(password)
+        except PasswordHasherBusyError:
+            return db_obj
+        rehashed = await db.fetch_one(
+            update(self.model)
+            .where(self.model.c.id == db_obj.id)
+            .where(self.model.c.hashed_password == db_obj.hashed_password)
+            .values(hashed_password=hashed_password)
+            .returning(*self.model.c)
+        )
+        if not rehashed:
+            return db_obj
+        await self.invalidate([db_obj, rehashed])
+        password_policy.rehashed += 1
+        return rehashed
+
+    async def count_by_hash_rounds(self, db: Database) -> dict[int, int]:
+        rounds = func.substr(self.model.c.hashed_password, 5, 2)
+        rows = await db.fetch_all(
+            select(rounds.label("rounds"), func.count().label("users"))
+            .where(self.model.c.hashed_password.regexp_match(BCRYPT_HASH_PATTERN))
+            .group_by(rounds)
+            .order_by(rounds)
+        )
+        return {int(row.rounds): row.users for row in rows}
+
     def get_fullname(self, *, db_user: Any) -> str:
         return f"{db_user.first_name} {db_user.last_name}"
 
@@ -0,0 +1,364 @@
+import asyncio
+import contextvars
+import itertools
+import logging
+from contextlib import AsyncExitStack, asynccontextmanager
+from typing import Any, AsyncIterator
+
+from asyncpg import InterfaceError, PostgresConnectionError
+from databases import Database
+from sqlalchemy import Table
+from sqlalchemy.sql.dml import UpdateBase
+
+from app.core.config import settings
+from app.db.loader import RowLoader
+
+logger = logging.getLogger(__name__)
+
+# Seconds the replica is behind the primary, zero when it has replayed everything
+REPLICA_LAG_QUERY = """
+SELECT CASE
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+REPLICA_ERRORS = (OSError, InterfaceError, PostgresConnectionError)
+
+
+class PoolTimeoutError(Exception):
+    """No connection became free within POSTGRES_POOL_ACQUIRE_TIMEOUT."""
+
+
+class DatabasePool:
+    def __init__(self, url: str) -> None:
+        """
+        Application-lifetime connection pool.
+
+        **Parameters**
+
+        * `url`: A database DSN
+        """
+        self.database = Database(
+            url,
+            min_size=settings.POSTGRES_POOL_MIN_SIZE,
+            max_size=settings.POSTGRES_POOL_MAX_SIZE,
+            max_inactive_connection_lifetime=settings.POSTGRES_POOL_IDLE_TIMEOUT,
+        )
+        self.name = f"{self.database.url.hostname}:{self.database.url.port or 5432}"
+        self.waiters = 0
+        # Replication health, maintained by ReplicaRouter for replica pools
+        self.healthy = True
+        self.lag: float | None = None
+
+    @property
+    def is_connected(self) -> bool:
+        return self.database.is_connected
+
+    async def connect(self) -> None:
+        if not self.database.is_connected:
+            await self.database.connect()
+
+    async def disconnect(self) -> None:
+        if self.database.is_connected:
+            await self.database.disconnect()
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[Database]:
+        """
+        Borrow a connection for the current task.
+        Queries made through the yielded database reuse the borrowed connection.
+        """
+        connection = self.database.connection()
+        self.waiters += 1
+        try:
+            await asyncio.wait_for(
+                connection.__aenter__(), settings.POSTGRES_POOL_ACQUIRE_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            raise PoolTimeoutError("Timed out waiting for a database connection")
+        finally:
+            self.waiters -= 1
+        try:
+            yield self.database
+        finally:
+            await connection.__aexit__(None, None, None)
+
+    def stats(self) -> dict[str, int]:
+        pool = getattr(self.database._backend, "_pool", None)
+        if pool is None:
+            return dict(size=0, max_size=0, in_use=0, idle=0, waiters=self.waiters)
+        size, idle = pool.get_size(), pool.get_idle_size()
+        return dict(
+            size=size,
+            max_size=pool.get_max_size(),
+            in_use=size - idle,
+            idle=idle,
+            waiters=self.waiters,
+        )
+
+
+class ReplicaRouter:
+    def __init__(self, replicas: list[DatabasePool]) -> None:
+        """
+        Pick a streaming replica for reads and keep track of replication health.
+
+        **Parameters**
+
+        * `replicas`: Pools of the read replicas
+        """
+        self.replicas = replicas
+        self._round_robin = itertools.cycle(replicas)
+        self._monitor: asyncio.Task | None = None
+
+    def choose(self) -> DatabasePool | None:
+        """
+        Return a healthy replica or None when reads have to go to the primary.
+        """
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        if settings.REPLICA_SELECTION == "least_busy":
+            return min(
+                healthy,
+                key=lambda replica: replica.stats()["in_use"] + replica.waiters,
+            )
+        for replica in self._round_robin:
+            if replica.healthy:
+                return replica
+        return None  # pragma: no cover
+
+    async def check(self, replica: DatabasePool) -> None:
+        try:
+            await replica.connect()
+            replica.lag = await asyncio.wait_for(
+                replica.database.fetch_val(REPLICA_LAG_QUERY),
+                settings.REPLICA_CHECK_INTERVAL,
+            )
+        except (asyncio.TimeoutError, *REPLICA_ERRORS) as exc:
+            if replica.healthy:
+                logger.warning("Replica %s is down: %s", replica.name, exc)
+            replica.healthy, replica.lag = False, None
+            return
+
+        healthy = replica.lag <= settings.REPLICA_MAX_LAG
+        if replica.healthy and not healthy:
+            logger.warning("Replica %s lags %.1fs behind", replica.name, replica.lag)
+        replica.healthy = healthy
+
+    async def monitor(self) -> None:
+        while True:
+            await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+            await asyncio.sleep(settings.REPLICA_CHECK_INTERVAL)
+
+    async def connect(self) -> None:
+        if self.replicas:
+            await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+            self._monitor = asyncio.create_task(self.monitor())
+
+    async def disconnect(self) -> None:
+        if self._monitor is not None:
+            self._monitor.cancel()
+            self._monitor = None
+        for replica in self.replicas:
+            await replica.disconnect()
+
+    def stats(self) -> list[dict[str, Any]]:
+        return [
+            dict(name=replica.name, healthy=replica.healthy, lag=replica.lag)
+            | replica.stats()
+            for replica in self.replicas
+        ]
+
+
+class DatabaseSession:
+    def __init__(
+        self,
+        primary: DatabasePool,
+        router: ReplicaRouter,
+        detached: "DetachedReader | None" = None,
+    ) -> None:
+        """
+        Request-scoped database handle with the query interface of `Database`.
+
+        Reads go to a replica picked by the router, writes go to the primary.
+        After the first write (or transaction) all reads stay on the primary,
+        so a request always sees its own changes.
+
+        **Parameters**
+
+        * `primary`: Pool of the primary
+        * `router`: Router picking the replica reads go to
+        * `detached`: Reader for results shared with other requests,
+        one of the session's own when None
+        """
+        self.primary = primary
+        self.router = router
+        self._detached = detached
+        self.on_primary = False
+        self._stack = AsyncExitStack()
+        self._primary_db: Database | None = None
+        self._replica: DatabasePool | None = None
+        self._replica_db: Database | None = None
+        self._loaders: dict[str, RowLoader] = {}
+
+    def loader(self, table: Table) -> RowLoader:
+        """
+        Loader of `table` rows by id, batching lookups of this session.
+        """
+        loader = self._loaders.get(table.name)
+        if loader is None:
+            loader = self._loaders[table.name] = RowLoader(self, table)
+        return loader
+
+    @property
+    def detached(self) -> "DetachedReader":
+        """
+        Reader on the same pools that doesn't use the session's connections.
+        """
+        if self._detached is None:
+            self._detached = DetachedReader(self.primary, self.router)
+        return self._detached
+
+    async def close(self) -> None:
+        await self._stack.aclose()
+
+    def use_primary(self) -> None:
+        self.on_primary = True
+
+    async def _get_primary(self) -> Database:
+        if self._primary_db is None:
+            self._primary_db = await self._stack.enter_async_context(
+                self.primary.acquire()
+            )
+        return self._primary_db
+
+    async def _get_replica(self) -> Database | None:
+        if self._replica_db is None:
+            replica = self.router.choose()
+            if replica is None:
+                return None
+            try:
+                self._replica_db = await self._stack.enter_async_context(
+                    replica.acquire()
+                )
+            except PoolTimeoutError:
+                return None
+            self._replica = replica
+        return self._replica_db
+
+    async def _get_reader(self) -> Database:
+        if not self.on_primary:
+            replica_db = await self._get_replica()
+            if replica_db is not None:
+                return replica_db
+        return await self._get_primary()
+
+    def _replica_failed(self, exc: Exception) -> None:
+        assert self._replica is not None
+        logger.warning(
+            "Replica %s failed, reading from primary: %s", self._replica.name, exc
+        )
+        self._replica.healthy = False
+        self.on_primary = True
+
+    async def _read(self, method: str, query: Any, *args: Any, **kwargs: Any) -> Any:
+        if isinstance(query, UpdateBase):
+            # INSERT/UPDATE/DELETE ... RETURNING
+            self.on_primary = True
+        reader = await self._get_reader()
+        try:
+            return await getattr(reader, method)(query, *args, **kwargs)
+        except REPLICA_ERRORS as exc:
+            if reader is self._primary_db:
+                raise
+            self._replica_failed(exc)
+        return await getattr(await self._get_primary(), method)(query, *args, **kwargs)
+
+    async def fetch_all(self, query: Any, values: dict | None = None) -> list[Any]:
+        return await self._read("fetch_all", query, values)
+
+    async def fetch_one(self, query: Any, values: dict | None = None) -> Any:
+        return await self._read("fetch_one", query, values)
+
+    async def fetch_val(
+        self, query: Any, values: dict | None = None, column: Any = 0
+    ) -> Any:
+        return await self._read("fetch_val", query, values, column=column)
+
+    async def iterate(
+        self, query: Any, values: dict | None = None
+    ) -> AsyncIterator[Any]:
+        reader = await self._get_reader()
+        async for record in reader.iterate(query, values):
+            yield record
+
+    async def execute(self, query: Any, values: dict | None = None) -> Any:
+        self.on_primary = True
+        return await (await self._get_primary()).execute(query, values)
+
+    async def execute_many(self, query: Any, values: list) -> None:
+        self.on_primary = True
+        return await (await self._get_primary()).execute_many(query, values)
+
+    def transaction(self, **kwargs: Any) -> Any:
+        self.on_primary = True
+        return self.primary.database.transaction(**kwargs)
+
+    def connection(self) -> Any:
+        self.on_primary = True
+        return self.primary.database.connection()
+
+
+class DetachedReader:
+    def __init__(self, primary: DatabasePool, router: ReplicaRouter) -> None:
+        """
+        Reads whose result several requests wait for. Each query runs in a
+        session of its own, so it doesn't depend on the connections or the
+        lifetime of the request that happened to start it.
+
+        **Parameters**
+
+        * `primary`: Pool of the primary
+        * `router`: Router picking the replica reads go to
+        """
+        self.primary = primary
+        self.router = router
+        self._loaders: dict[str, RowLoader] = {}
+
+    def loader(self, table: Table) -> RowLoader:
+        """
+        Loader of `table` rows by id, batching lookups of all requests.
+        """
+        loader = self._loaders.get(table.name)
+        if loader is None:
+            loader = self._loaders[table.name] = RowLoader(self, table)
+        return loader
+
+    async def _read(self, method: str, query: Any, *args: Any, **kwargs: Any) -> Any:
+        async def read() -> Any:
+            session = DatabaseSession(self.primary, self.router, detached=self)
+            try:
+                return await getattr(session, method)(query, *args, **kwargs)
+            finally:
+                await session.close()
+
+        # Borrowed connections are kept in a context variable: in an empty
+        # context the session borrows its own instead of the caller's
+        return await contextvars.Context().run(asyncio.ensure_future, read())
+
+    async def fetch_all(self, query: Any, values: dict | None = None) -> list[Any]:
+        return await self._read("fetch_all", query, values)
+
+    async def fetch_one(self, query: Any, values: dict | None = None) -> Any:
+        return await self._read("fetch_one", query, values)
+
+    async def fetch_val(
+        self, query: Any, values: dict | None = None, column: Any = 0
+    ) -> Any:
+        return await self._read("fetch_val", query, values, column=column)
+
+
+postgres_pool = DatabasePool(settings.POSTGRES_URL)
+replica_router = ReplicaRouter([DatabasePool(url) for url in settings.REPLICA_URLS])
+detached_reader = DetachedReader(postgres_pool, replica_router)
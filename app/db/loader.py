@@ -0,0 +1,84 @@
+import asyncio
+from typing import Any, Iterable
+
+from databases import Database
+from sqlalchemy import Table, any_, bindparam
+from sqlalchemy.dialects.postgresql import ARRAY
+
+from app.core.config import settings
+
+
+class RowLoader:
+    def __init__(
+        self,
+        db: Database,
+        table: Table,
+        *,
+        column: str = "id",
+        max_batch_size: int | None = None,
+    ) -> None:
+        """
+        Batch lookups of single rows: every `load` made within one event loop
+        iteration is answered by one `SELECT ... WHERE column = ANY($1)`.
+
+        **Parameters**
+
+        * `db`: Database or session the rows are read from
+        * `table`: Table the rows belong to
+        * `column`: Unique column rows are looked up by
+        * `max_batch_size`: Values per query, CRUD_BULK_CHUNK_SIZE when None
+        """
+        self.db = db
+        self.table = table
+        self.column = table.c[column]
+        self.max_batch_size = max_batch_size or settings.CRUD_BULK_CHUNK_SIZE
+        self._pending: dict[Any, asyncio.Future] = {}
+        self.loads = 0
+        self.batches = 0
+
+    async def load(self, value: Any) -> Any:
+        """
+        Row where the column equals `value`, None when there is none.
+        """
+        self.loads += 1
+        future = self._pending.get(value)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            if not self._pending:
+                # Runs after the other callbacks ready in this iteration
+                loop.call_soon(self._dispatch)
+            future = self._pending[value] = loop.create_future()
+        # Callers of the same value share the future, one may be cancelled alone
+        return await asyncio.shield(future)
+
+    async def load_many(self, values: Iterable[Any]) -> list[Any]:
+        """
+        Rows in the order of `values`, None for values without a row.
+        """
+        return await asyncio.gather(*(self.load(value) for value in values))
+
+    def _dispatch(self) -> None:
+        pending, self._pending = list(self._pending.items()), {}
+        for start in range(0, len(pending), self.max_batch_size):
+            batch = dict(pending[start : start + self.max_batch_size])
+            asyncio.ensure_future(self._fetch(batch))
+
+    async def _fetch(self, batch: dict[Any, asyncio.Future]) -> None:
+        self.batches += 1
+        values = bindparam("values", list(batch), type_=ARRAY(self.column.type))
+        try:
+            rows = await self.db.fetch_all(
+                self.table.select().where(self.column == any_(values))
+            )
+        except Exception as exc:
+            for future in batch.values():
+                if not future.done():
+                    future.set_exception(exc)
+            return
+        rows_by_value = {row[self.column.name]: row for row in rows}
+        for value, future in batch.items():
+            if not future.done():
+                future.set_result(rows_by_value.get(value))
+
+    def stats(self) -> dict[str, Any]:
+        return dict(loads=self.loads, batches=self.batches)
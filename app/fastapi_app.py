@@ -1,15 +1,31 @@
+import math
+
 from fastapi import FastAPI, Request, status
-from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 
+from app import crud
+from app.api.middleware import (
+    CompressionMiddleware,
+    ErrorMiddleware,
+    RequestContextMiddleware,
+)
 from app.api.v1.router import api_router
 from app.core.config import settings
+from app.core.hashing import PasswordHasherBusyError
+from app.core.security import password_hasher
+from app.core.throttling import ThrottledError
+from app.db.database import PoolTimeoutError, postgres_pool, replica_router
+from app.services.token_revocation import token_revocation
 
 app = FastAPI(
-    title=settings.PROJECT_NAME, openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    title=settings.PROJECT_NAME,
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    default_response_class=ORJSONResponse,
 )
 
+app.add_middleware(ErrorMiddleware)
+
 # Set all CORS enabled origins
 if settings.BACKEND_CORS_ORIGINS:
     app.add_middleware(
@@ -20,16 +36,62 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_headers=["*"],
     )
 
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    levels=dict(
+        gzip=settings.COMPRESSION_GZIP_LEVEL, br=settings.COMPRESSION_BROTLI_QUALITY
+    ),
+    # The schema does not change while the app runs
+    cached_paths=[app.openapi_url],
+)
+
+# Outermost, so error and CORS responses carry the request id too
+app.add_middleware(RequestContextMiddleware, header=settings.REQUEST_ID_HEADER)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 
-@app.middleware("http")
-async def sql_middleware(request: Request, call_next):
-    """Catch all SQL exceptions"""
-    try:
-        return await call_next(request)
-    except Exception as exc:
-        return JSONResponse(
-            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
-            content=jsonable_encoder({"msg": str(exc)}),
-        )
+@app.on_event("startup")
+async def connect_databases() -> None:
+    await postgres_pool.connect()
+    await replica_router.connect()
+    await token_revocation.start()
+    await crud.user.emails.start(postgres_pool)
+
+
+@app.on_event("shutdown")
+async def disconnect_databases() -> None:
+    await token_revocation.stop()
+    await crud.user.emails.stop()
+    await replica_router.disconnect()
+    await postgres_pool.disconnect()
+    password_hasher.shutdown()
+
+
+@app.exception_handler(PoolTimeoutError)
+async def pool_timeout_handler(request: Request, exc: PoolTimeoutError) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Database is busy, try again later"},
+    )
+
+
+@app.exception_handler(PasswordHasherBusyError)
+async def password_hasher_busy_handler(
+    request: Request, exc: PasswordHasherBusyError
+) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Too many password checks in progress, try again later"},
+        headers={"Retry-After": str(settings.PASSWORD_HASHER_RETRY_AFTER)},
+    )
+
+
+@app.exception_handler(ThrottledError)
+async def throttled_handler(request: Request, exc: ThrottledError) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": "Too many attempts, try again later"},
+        headers={"Retry-After": str(math.ceil(exc.retry_after))},
+    )
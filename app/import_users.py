@@ -0,0 +1,44 @@
+import argparse
+import asyncio
+import logging
+
+from databases import Database
+
+from app.core.config import settings
+from app.services.user_import import import_users, read_file_lines
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Import users from CSV or NDJSON")
+    parser.add_argument("path", help="File with one user per row")
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    parser.add_argument("--on-conflict", choices=["skip", "update"], default="skip")
+    parser.add_argument("--batch-size", type=int, default=None)
+    return parser.parse_args()
+
+
+async def main() -> None:
+    args = parse_args()
+    postgres = Database(settings.POSTGRES_URL)
+
+    await postgres.connect()
+    try:
+        logger.info("Importing users from %s", args.path)
+        result = await import_users(
+            postgres,
+            read_file_lines(args.path),
+            import_format=args.format,
+            on_conflict=args.on_conflict,
+            batch_size=args.batch_size,
+        )
+    finally:
+        await postgres.disconnect()
+    logger.info("Users imported: %s", result)
+
+
+if __name__ == "__main__":
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(main())
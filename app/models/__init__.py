@@ -1 +1,2 @@
+from .revoked_token import revoked_token
 from .user import user
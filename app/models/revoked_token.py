@@ -0,0 +1,27 @@
+import sqlalchemy
+
+from app.db.metadata import postgres_metadata
+
+revoked_token = sqlalchemy.Table(
+    "revoked_token",
+    postgres_metadata,
+    sqlalchemy.Column("id", sqlalchemy.BigInteger, primary_key=True),
+    sqlalchemy.Column("jti", sqlalchemy.String, unique=True, nullable=False),
+    sqlalchemy.Column(
+        "user_id",
+        sqlalchemy.Integer,
+        sqlalchemy.ForeignKey("user.id", ondelete="CASCADE"),
+        nullable=True,
+    ),
+    # Rows are kept until the token would have expired anyway
+    sqlalchemy.Column(
+        "expires_at", sqlalchemy.DateTime(timezone=True), nullable=False, index=True
+    ),
+    sqlalchemy.Column(
+        "revoked_at",
+        sqlalchemy.DateTime(timezone=True),
+        nullable=False,
+        server_default=sqlalchemy.func.now(),
+        index=True,
+    ),
+)
@@ -16,4 +16,17 @@ user = sqlalchemy.Table(
     sqlalchemy.Column("last_name", sqlalchemy.String),
     sqlalchemy.Column("is_active", sqlalchemy.Boolean, default=True),
     sqlalchemy.Column("is_superuser", sqlalchemy.Boolean, default=False),
+    # Bumped whenever access tokens carrying the user's claims become stale
+    sqlalchemy.Column(
+        "token_version", sqlalchemy.Integer, nullable=False, server_default="0"
+    ),
+    # Set by every write, new and changed rows are read from here on
+    sqlalchemy.Column(
+        "updated_at",
+        sqlalchemy.DateTime(timezone=True),
+        nullable=False,
+        server_default=sqlalchemy.func.now(),
+        onupdate=sqlalchemy.func.now(),
+        index=True,
+    ),
 )
@@ -0,0 +1,59 @@
+import argparse
+import asyncio
+
+from databases import Database
+
+from app import crud
+from app.core.config import settings
+from app.core.security import calibrate_bcrypt_rounds, password_policy
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Tune and audit password hashing")
+    commands = parser.add_subparsers(dest="command", required=True)
+    calibrate = commands.add_parser(
+        "calibrate", help="Pick the bcrypt cost for PASSWORD_BCRYPT_ROUNDS"
+    )
+    calibrate.add_argument(
+        "--target-seconds", type=float, default=settings.PASSWORD_HASH_TARGET_SECONDS
+    )
+    commands.add_parser(
+        "report", help="Show how many stored hashes use each bcrypt cost"
+    )
+    return parser.parse_args()
+
+
+async def report() -> None:
+    postgres = Database(settings.POSTGRES_URL)
+
+    await postgres.connect()
+    try:
+        users_by_rounds = await crud.user.count_by_hash_rounds(postgres)
+    finally:
+        await postgres.disconnect()
+
+    total = sum(users_by_rounds.values())
+    for rounds, users in users_by_rounds.items():
+        current = " (current)" if rounds == password_policy.rounds else ""
+        print(f"cost {rounds}: {users} users{current}")
+    rehashed = sum(
+        users
+        for rounds, users in users_by_rounds.items()
+        if rounds >= password_policy.rounds
+    )
+    share = rehashed / total * 100 if total else 100.0
+    print(f"{rehashed} of {total} bcrypt users ({share:.1f}%) meet the current policy")
+
+
+async def main() -> None:
+    args = parse_args()
+    if args.command == "calibrate":
+        rounds = calibrate_bcrypt_rounds(args.target_seconds)
+        print(f"PASSWORD_BCRYPT_ROUNDS={rounds}")
+    else:
+        await report()
+
+
+if __name__ == "__main__":
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(main())
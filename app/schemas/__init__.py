@@ -7,6 +7,16 @@ class BaseSchema(BaseModel):
         orm_mode = True
 
 
+from .mapper import RowMapper, user_mapper
 from .message import Message
+from .revoked_token import RevokedTokenIn
 from .token import Token, TokenPayload
-from .user import User, UserIn, UserUpdate
+from .user import (
+    User,
+    UserBulkResult,
+    UserBulkUpdate,
+    UserImportResult,
+    UserImportRow,
+    UserIn,
+    UserUpdate,
+)
@@ -0,0 +1,78 @@
+import operator
+from typing import Any, Generic, Iterable, Sequence, TypeVar
+
+import orjson
+from pydantic import BaseModel
+from sqlalchemy import Table
+
+from app import models
+from app.schemas.user import User
+
+SchemaType = TypeVar("SchemaType", bound=BaseModel)
+
+
+class RowMapper(Generic[SchemaType]):
+    def __init__(
+        self,
+        schema: type[SchemaType],
+        table: Table,
+        fields: Sequence[str] | None = None,
+    ) -> None:
+        """
+        Convert rows of `table` to `schema` without validation. Rows read from
+        our own table already satisfy the schema, input stays validated.
+
+        **Parameters**
+
+        * `schema`: Output schema, every field has to be a column of `table`
+        * `table`: A SQLAlchemy table
+        * `fields`: Subset of the schema fields to map, all when None
+        """
+        missing = set(schema.__fields__) - set(table.c.keys())
+        if missing:
+            raise ValueError(f"{schema.__name__} fields not in {table.name}: {missing}")
+        self.schema = schema
+        self.table = table
+        self.fields = tuple(schema.__fields__ if fields is None else fields)
+        self.columns = tuple(table.c[field] for field in self.fields)
+        self._subsets: dict[tuple[str, ...], RowMapper[SchemaType]] = {}
+        getter = operator.itemgetter(*self.fields)
+        self._values = getter if len(self.fields) > 1 else lambda row: (getter(row),)
+
+    def only(self, fields: Sequence[str]) -> "RowMapper[SchemaType]":
+        """
+        Mapper of a subset of the fields, for sparse responses.
+        Raises `ValueError` for fields the schema doesn't have.
+        """
+        fields = tuple(dict.fromkeys(field.strip() for field in fields))
+        subset = self._subsets.get(fields)
+        if subset is None:
+            unknown = [field for field in fields if field not in self.schema.__fields__]
+            if unknown or not fields:
+                raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+            subset = self._subsets[fields] = RowMapper(
+                self.schema, self.table, fields=fields
+            )
+        return subset
+
+    def to_dict(self, row: Any) -> dict[str, Any]:
+        return dict(zip(self.fields, self._values(row)))
+
+    def to_model(self, row: Any) -> SchemaType:
+        return self.schema.construct(**self.to_dict(row))
+
+    def to_models(self, rows: Iterable[Any]) -> list[SchemaType]:
+        return [self.to_model(row) for row in rows]
+
+    def encode_one(self, row: Any) -> bytes:
+        return orjson.dumps(self.to_dict(row))
+
+    def encode(self, rows: Iterable[Any]) -> bytes:
+        """
+        Encode rows straight to a JSON array.
+        """
+        fields, values = self.fields, self._values
+        return orjson.dumps([dict(zip(fields, values(row))) for row in rows])
+
+
+user_mapper = RowMapper(User, models.user)
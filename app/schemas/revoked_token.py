@@ -0,0 +1,9 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class RevokedTokenIn(BaseModel):
+    jti: str
+    user_id: int | None
+    expires_at: datetime
@@ -8,3 +8,9 @@ class Token(BaseModel):
 
 class TokenPayload(BaseModel):
     sub: int | None = None
+    exp: int | None = None
+    jti: str | None = None
+    # Authorization claims, see TOKEN_AUTHZ_CLAIMS
+    is_active: bool | None = None
+    is_superuser: bool | None = None
+    token_version: int | None = None
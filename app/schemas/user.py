@@ -1,4 +1,7 @@
-from pydantic import EmailStr
+import re
+from typing import Any
+
+from pydantic import BaseModel, EmailStr, root_validator, validator
 
 from app.schemas import BaseSchema
 
@@ -23,3 +26,46 @@ class UserUpdate(UserIn):
 
 class User(BaseUser):
     id: int
+
+
+class UserBulkUpdate(UserUpdate):
+    id: int
+
+
+class UserBulkResult(BaseSchema):
+    index: int
+    user: User | None = None
+    error: Any = None
+
+
+BCRYPT_HASH_RE = re.compile(r"^\$2[aby]\$\d{2}\$[./A-Za-z0-9]{53}$")
+
+
+class UserImportRow(BaseUser):
+    password: str | None
+    hashed_password: str | None
+
+    @validator("email")
+    def normalize_email(cls, v: str) -> str:
+        return v.lower()
+
+    @validator("hashed_password")
+    def check_hashed_password(cls, v: str | None) -> str | None:
+        if v is not None and not BCRYPT_HASH_RE.match(v):
+            raise ValueError("hashed_password is not a bcrypt hash")
+        return v
+
+    @root_validator(skip_on_failure=True)
+    def check_password(cls, values: dict[str, Any]) -> dict[str, Any]:
+        if not values.get("password") and not values.get("hashed_password"):
+            raise ValueError("Either password or hashed_password is required")
+        return values
+
+
+class UserImportResult(BaseModel):
+    rows_read: int = 0
+    rows_invalid: int = 0
+    rows_merged: int = 0
+    rows_skipped: int = 0
+    seconds: float = 0.0
+    rows_per_second: float = 0.0
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Any
+
+from databases import Database
+
+from app import crud, schemas
+from app.core.bloom import BloomFilter
+from app.core.config import settings
+from app.db.database import DatabasePool, DatabaseSession, postgres_pool
+
+logger = logging.getLogger(__name__)
+
+
+class TokenRevocationList:
+    def __init__(self, pool: DatabasePool) -> None:
+        """
+        Per-worker Bloom filter of revoked token ids, refreshed in the background.
+        A token missing from the filter is not revoked, the database is only
+        asked about tokens the filter reports.
+
+        **Parameters**
+
+        * `pool`: Pool the filter is loaded from
+        """
+        self.pool = pool
+        self.filter = self._new_filter()
+        # Until the first load every check goes to the database
+        self.loaded = False
+        self._since: datetime | None = None
+        self._refresher: asyncio.Task | None = None
+
+        self.checks = 0
+        self.filter_hits = 0
+        self.false_positives = 0
+
+    @staticmethod
+    def _new_filter(count: int = 0) -> BloomFilter:
+        # Room to grow past `count`, a full filter is rebuilt on every refresh
+        return BloomFilter(
+            capacity=max(settings.TOKEN_REVOCATION_CAPACITY, 2 * count),
+            error_rate=settings.TOKEN_REVOCATION_ERROR_RATE,
+        )
+
+    def _add_rows(self, bloom: BloomFilter, rows: list[Any]) -> None:
+        for row in rows:
+            bloom.add(row.jti)
+            if self._since is None or row.revoked_at > self._since:
+                self._since = row.revoked_at
+
+    async def load(self, db: Database) -> None:
+        """
+        Build a new filter from all unexpired revocations.
+        """
+        await crud.revoked_token.remove_expired(db)
+        self._since = None
+        rows = await crud.revoked_token.get_active_since(db)
+        bloom = self._new_filter(len(rows))
+        self._add_rows(bloom, rows)
+        self.filter, self.loaded = bloom, True
+
+    async def refresh(self, db: Database) -> None:
+        """
+        Add revocations made since the last refresh. Rows committed late by
+        slow transactions are caught by re-reading an overlap window.
+        """
+        if not self.loaded or self.filter.is_full:
+            await self.load(db)
+            return
+        since = self._since and self._since - timedelta(
+            seconds=settings.TOKEN_REVOCATION_OVERLAP
+        )
+        self._add_rows(
+            self.filter, await crud.revoked_token.get_active_since(db, since=since)
+        )
+
+    async def refresh_forever(self) -> None:
+        while True:
+            try:
+                async with self.pool.acquire() as db:
+                    await self.refresh(db)
+            except Exception as exc:
+                logger.warning("Token revocation list refresh failed: %s", exc)
+            await asyncio.sleep(settings.TOKEN_REVOCATION_REFRESH_INTERVAL)
+
+    async def start(self) -> None:
+        self._refresher = asyncio.create_task(self.refresh_forever())
+
+    async def stop(self) -> None:
+        if self._refresher is not None:
+            self._refresher.cancel()
+            self._refresher = None
+
+    async def is_revoked(self, db: Database, jti: str) -> bool:
+        self.checks += 1
+        if self.loaded and jti not in self.filter:
+            return False
+        self.filter_hits += 1
+        if isinstance(db, DatabaseSession):
+            # A lagging replica still accepts a token just logged out
+            db.use_primary()
+        revoked = await crud.revoked_token.is_revoked(db, jti=jti)
+        if not revoked and self.loaded:
+            self.false_positives += 1
+        return revoked
+
+    async def revoke(self, db: Database, token_data: schemas.TokenPayload) -> None:
+        await crud.revoked_token.revoke(
+            db,
+            obj_in=schemas.RevokedTokenIn(
+                jti=token_data.jti,
+                user_id=token_data.sub,
+                expires_at=datetime.fromtimestamp(token_data.exp).astimezone(),
+            ),
+        )
+        # Visible to this worker at once, to the others after their next refresh
+        self.filter.add(token_data.jti)
+
+    def stats(self) -> dict[str, Any]:
+        # Checked tokens that were not revoked
+        negatives = self.checks - self.filter_hits + self.false_positives
+        observed_rate = self.false_positives / negatives if negatives else 0.0
+        return self.filter.stats() | dict(
+            loaded=self.loaded,
+            checks=self.checks,
+            filter_hits=self.filter_hits,
+            false_positives=self.false_positives,
+            observed_false_positive_rate=observed_rate,
+        )
+
+
+token_revocation = TokenRevocationList(postgres_pool)
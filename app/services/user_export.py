@@ -0,0 +1,64 @@
+import csv
+import io
+from typing import Any, AsyncIterable, AsyncIterator, Literal, Sequence
+
+import orjson
+
+from app import crud, schemas
+from app.core.config import settings
+
+ExportFormat = Literal["csv", "ndjson"]
+
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+EXPORT_FIELDS = schemas.user_mapper.fields
+
+
+async def encode_ndjson(
+    rows: AsyncIterable[Any], fields: Sequence[str]
+) -> AsyncIterator[bytes]:
+    chunk = bytearray()
+    size = 0
+    async for row in rows:
+        chunk += orjson.dumps({field: row[field] for field in fields})
+        chunk += b"\n"
+        size += 1
+        if size >= settings.USER_EXPORT_CHUNK_SIZE:
+            yield bytes(chunk)
+            chunk.clear()
+            size = 0
+    if chunk:
+        yield bytes(chunk)
+
+
+async def encode_csv(
+    rows: AsyncIterable[Any], fields: Sequence[str]
+) -> AsyncIterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    yield buffer.getvalue().encode()
+    buffer.seek(0)
+    buffer.truncate()
+
+    size = 0
+    async for row in rows:
+        writer.writerow([row[field] for field in fields])
+        size += 1
+        if size >= settings.USER_EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            size = 0
+    if size:
+        yield buffer.getvalue().encode()
+
+
+ENCODERS = {"csv": encode_csv, "ndjson": encode_ndjson}
+
+
+def export_users(db: Any, export_format: ExportFormat) -> AsyncIterator[bytes]:
+    """
+    Encode all users chunk by chunk while they are read from a server-side cursor.
+    """
+    rows = crud.user.iterate(db, columns=EXPORT_FIELDS)
+    return ENCODERS[export_format](rows, EXPORT_FIELDS)
@@ -0,0 +1,257 @@
+import codecs
+import csv
+import functools
+import logging
+import time
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Literal
+
+import orjson
+from databases import Database
+from pydantic import ValidationError
+
+from app import crud, schemas
+from app.core.config import settings
+from app.core.security import get_password_hash, password_hasher, password_policy
+
+logger = logging.getLogger(__name__)
+
+ImportFormat = Literal["csv", "ndjson"]
+ConflictAction = Literal["skip", "update"]
+
+STAGING_TABLE = "user_import"
+COLUMNS = (
+    "email",
+    "hashed_password",
+    "phone_number",
+    "first_name",
+    "last_name",
+    "is_active",
+    "is_superuser",
+)
+_columns = ", ".join(COLUMNS)
+# Passwords hashed per job on the password hasher pool
+HASH_JOB_SIZE = 8
+
+CREATE_STAGING_TABLE = f"""
+CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} AS
+SELECT {_columns} FROM "user" WITH NO DATA
+"""
+MERGE_STAGING_TABLE = f"""
+INSERT INTO "user" ({_columns})
+SELECT DISTINCT ON (email) {_columns} FROM {STAGING_TABLE} ORDER BY email
+ON CONFLICT (email) DO
+"""
+
+
+def merge_staging_table(on_conflict: ConflictAction, columns: set[str]) -> str:
+    """
+    Merge of the staging table into "user". Existing users are updated
+    only in `columns`, the ones the input provides: the staged values of
+    the others are defaults.
+    """
+    if on_conflict == "skip":
+        return f"{MERGE_STAGING_TABLE} NOTHING"
+    updates = [
+        f"{column} = EXCLUDED.{column}" for column in COLUMNS[1:] if column in columns
+    ]
+    updates.append('token_version = "user".token_version + 1')
+    updates.append("updated_at = now()")
+    return f"{MERGE_STAGING_TABLE} UPDATE SET {', '.join(updates)}"
+
+
+async def iter_lines(chunks: AsyncIterable[bytes]) -> AsyncIterator[str]:
+    """
+    Split a byte stream into text lines without reading it whole.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()
+    tail = ""
+    async for chunk in chunks:
+        *lines, tail = (tail + decoder.decode(chunk)).split("\n")
+        for line in lines:
+            yield line + "\n"
+    tail += decoder.decode(b"", final=True)
+    if tail:
+        yield tail
+
+
+async def read_file_lines(path: str) -> AsyncIterator[str]:
+    with open(path, encoding="utf-8-sig", newline="") as file:
+        for line in file:
+            yield line
+
+
+async def parse_csv(lines: AsyncIterable[str]) -> AsyncIterator[dict[str, Any]]:
+    """
+    Parse CSV with a header row, record by record.
+    Quoted values may contain line breaks.
+    """
+    header: list[str] | None = None
+    record = ""
+    async for line in lines:
+        record += line
+        if record.count('"') % 2:
+            # Line break inside a quoted value, the record continues
+            continue
+        values = next(csv.reader([record]))
+        record = ""
+        if not values:
+            continue
+        if header is None:
+            header = [value.strip() for value in values]
+            continue
+        yield {key: value for key, value in zip(header, values) if value != ""}
+
+
+async def parse_ndjson(lines: AsyncIterable[str]) -> AsyncIterator[dict[str, Any]]:
+    async for line in lines:
+        if not line.strip():
+            continue
+        try:
+            yield orjson.loads(line)
+        except orjson.JSONDecodeError:
+            yield {}
+
+
+PARSERS = {"csv": parse_csv, "ndjson": parse_ndjson}
+
+
+def hash_passwords(passwords: list[str], rounds: int) -> list[str]:
+    return [get_password_hash(password, rounds) for password in passwords]
+
+
+def provided_columns(batch: list[schemas.UserImportRow]) -> set[str]:
+    """
+    Columns set by at least one row of `batch`, a password sets the hash.
+    """
+    fields = set().union(*(row.__fields_set__ for row in batch))
+    if "password" in fields:
+        fields.add("hashed_password")
+    return fields
+
+
+class UserImporter:
+    def __init__(
+        self,
+        db: Database,
+        *,
+        on_conflict: ConflictAction = "skip",
+        batch_size: int | None = None,
+        on_progress: Callable[[schemas.UserImportResult], None] | None = None,
+    ) -> None:
+        """
+        Load users through COPY into a staging table merged into "user" per batch.
+
+        **Parameters**
+
+        * `db`: Database to load into
+        * `on_conflict`: Skip or update users whose email already exists
+        * `batch_size`: Rows per COPY and merge, bounds memory use
+        * `on_progress`: Called with running totals after every batch
+        """
+        self.db = db
+        self.on_conflict = on_conflict
+        self.batch_size = batch_size or settings.USER_IMPORT_BATCH_SIZE
+        self.on_progress = on_progress or log_progress
+        self.result = schemas.UserImportResult()
+        self._started = 0.0
+
+    async def run(
+        self, rows: AsyncIterable[dict[str, Any]]
+    ) -> schemas.UserImportResult:
+        self._started = time.perf_counter()
+        connection = self.db.connection()
+        async with connection:
+            raw_connection = connection.raw_connection
+            await raw_connection.execute(CREATE_STAGING_TABLE)
+            try:
+                batch: list[schemas.UserImportRow] = []
+                async for row in rows:
+                    self.result.rows_read += 1
+                    try:
+                        batch.append(schemas.UserImportRow.parse_obj(row))
+                    except ValidationError:
+                        self.result.rows_invalid += 1
+                        continue
+                    if len(batch) >= self.batch_size:
+                        await self._load(raw_connection, batch)
+                        batch = []
+                if batch:
+                    await self._load(raw_connection, batch)
+            finally:
+                await raw_connection.execute(f"DROP TABLE {STAGING_TABLE}")
+                if self.on_conflict == "update":
+                    await crud.user.invalidate_all()
+        self._update_timing()
+        return self.result
+
+    async def _hash(self, batch: list[schemas.UserImportRow]) -> None:
+        pending = [row for row in batch if not row.hashed_password]
+        if not pending:
+            return
+        # Short jobs, one round per worker at a time: logins share the pool
+        # and are queued behind a round, not behind the whole batch
+        parts = [
+            pending[start : start + HASH_JOB_SIZE]
+            for start in range(0, len(pending), HASH_JOB_SIZE)
+        ]
+        for start in range(0, len(parts), password_hasher.workers):
+            round_parts = parts[start : start + password_hasher.workers]
+            hashed = await password_hasher.map(
+                functools.partial(hash_passwords, rounds=password_policy.rounds),
+                [[row.password for row in part] for part in round_parts],
+            )
+            for part, hashes in zip(round_parts, hashed):
+                for row, hashed_password in zip(part, hashes):
+                    row.hashed_password = hashed_password
+
+    async def _load(
+        self, raw_connection: Any, batch: list[schemas.UserImportRow]
+    ) -> None:
+        await self._hash(batch)
+        for row in batch:
+            crud.user.emails.add(row.email)
+        async with raw_connection.transaction():
+            await raw_connection.copy_records_to_table(
+                STAGING_TABLE,
+                records=[
+                    tuple(getattr(row, column) for column in COLUMNS) for row in batch
+                ],
+                columns=COLUMNS,
+            )
+            status = await raw_connection.execute(
+                merge_staging_table(self.on_conflict, provided_columns(batch))
+            )
+            await raw_connection.execute(f"TRUNCATE {STAGING_TABLE}")
+        merged = int(status.split()[-1])
+        self.result.rows_merged += merged
+        self.result.rows_skipped += len(batch) - merged
+        self._update_timing()
+        self.on_progress(self.result)
+
+    def _update_timing(self) -> None:
+        self.result.seconds = time.perf_counter() - self._started
+        if self.result.seconds:
+            self.result.rows_per_second = self.result.rows_read / self.result.seconds
+
+
+def log_progress(result: schemas.UserImportResult) -> None:
+    logger.info(
+        "Imported %s rows (%s merged, %s skipped, %s invalid), %.0f rows/s",
+        result.rows_read,
+        result.rows_merged,
+        result.rows_skipped,
+        result.rows_invalid,
+        result.rows_per_second,
+    )
+
+
+async def import_users(
+    db: Database,
+    lines: AsyncIterable[str],
+    *,
+    import_format: ImportFormat = "csv",
+    on_conflict: ConflictAction = "skip",
+    batch_size: int | None = None,
+) -> schemas.UserImportResult:
+    importer = UserImporter(db, on_conflict=on_conflict, batch_size=batch_size)
+    return await importer.run(PARSERS[import_format](lines))
@@ -0,0 +1,88 @@
+"""
+Per-request overhead of the middleware stack.
+
+    python -m benchmarks.middleware [--number 5000]
+
+Sends requests in process to a trivial endpoint wrapped in no middleware, in
+the former `@app.middleware("http")` error handler (BaseHTTPMiddleware) and in
+the pure ASGI stack of `app.fastapi_app`. Needs no database.
+"""
+import argparse
+import asyncio
+import time
+
+from fastapi import FastAPI, Request, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+from httpx import AsyncClient
+
+from app.api.middleware import ErrorMiddleware, RequestContextMiddleware
+
+
+def create_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/", response_class=PlainTextResponse)
+    async def index() -> str:
+        return "ok"
+
+    return app
+
+
+def plain_app() -> FastAPI:
+    return create_app()
+
+
+def base_http_app() -> FastAPI:
+    app = create_app()
+
+    @app.middleware("http")
+    async def sql_middleware(request: Request, call_next):
+        try:
+            return await call_next(request)
+        except Exception as exc:
+            return JSONResponse(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                content={"msg": str(exc)},
+            )
+
+    return app
+
+
+def asgi_app() -> FastAPI:
+    app = create_app()
+    app.add_middleware(ErrorMiddleware)
+    app.add_middleware(RequestContextMiddleware)
+    return app
+
+
+async def measure(label: str, app: FastAPI, number: int) -> float:
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        for _ in range(100):
+            await client.get("/")
+        started = time.perf_counter()
+        for _ in range(number):
+            await client.get("/")
+        per_request = (time.perf_counter() - started) / number
+    print(f"{label:<30} {per_request * 1e6:8.1f} µs/request")
+    return per_request
+
+
+async def bench(number: int) -> None:
+    baseline = await measure("no middleware", plain_app(), number)
+    for label, app in (
+        ("BaseHTTPMiddleware (before)", base_http_app()),
+        ("pure ASGI stack", asgi_app()),
+    ):
+        per_request = await measure(label, app, number)
+        print(f"{'':<30} {(per_request - baseline) * 1e6:+8.1f} µs overhead")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=5000)
+    args = parser.parse_args()
+    asyncio.run(bench(args.number))
+
+
+if __name__ == "__main__":
+    main()
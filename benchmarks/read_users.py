@@ -0,0 +1,132 @@
+"""
+Latency and CPU of serializing `GET /user/?limit=1000`.
+
+    python -m benchmarks.read_users [--rows 1000] [--number 50]
+    python -m benchmarks.read_users --endpoint
+
+The default run compares response encodings on generated rows and needs no
+database. --endpoint requests the endpoint in process against POSTGRES_URL,
+which needs at least --rows users and the first superuser.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Any, Awaitable, Callable
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app import schemas
+from app.core.config import settings
+from app.schemas import user_mapper
+
+
+def generate_rows(count: int) -> list[dict[str, Any]]:
+    return [
+        dict(
+            id=i,
+            email=f"user{i}@example.com",
+            hashed_password="$2b$12$" + "x" * 53,
+            phone_number="+10000000000",
+            first_name=f"First{i}",
+            last_name=f"Last{i}",
+            is_active=True,
+            is_superuser=False,
+            token_version=0,
+        )
+        for i in range(count)
+    ]
+
+
+async def measure(label: str, func: Callable[[], Awaitable[Any]], number: int) -> None:
+    await func()
+    latencies = []
+    cpu_started = time.process_time()
+    for _ in range(number):
+        started = time.perf_counter()
+        await func()
+        latencies.append(time.perf_counter() - started)
+    cpu = (time.process_time() - cpu_started) / number
+    latencies.sort()
+    print(
+        f"{label:<30} p50 {statistics.median(latencies) * 1e3:7.2f} ms"
+        f"   p95 {latencies[int(len(latencies) * 0.95)] * 1e3:7.2f} ms"
+        f"   cpu {cpu * 1e3:7.2f} ms"
+    )
+
+
+async def bench_serialization(rows: int, number: int) -> None:
+    records = generate_rows(rows)
+    field = create_response_field(name="Response", type_=list[schemas.User])
+
+    async def validated(response_class: type[JSONResponse]) -> bytes:
+        content = await serialize_response(field=field, response_content=records)
+        return response_class(content).body
+
+    async def json_response() -> bytes:
+        return await validated(JSONResponse)
+
+    async def orjson_response() -> bytes:
+        return await validated(ORJSONResponse)
+
+    async def pre_serialized() -> bytes:
+        return user_mapper.encode(records)
+
+    async def validated_models() -> list[schemas.User]:
+        return [schemas.User.parse_obj(record) for record in records]
+
+    async def constructed_models() -> list[schemas.User]:
+        return user_mapper.to_models(records)
+
+    await measure("User.parse_obj per row", validated_models, number)
+    await measure("RowMapper.to_models", constructed_models, number)
+    await measure("JSONResponse (before)", json_response, number)
+    await measure("ORJSONResponse", orjson_response, number)
+    await measure("RowMapper.encode (read_users)", pre_serialized, number)
+
+
+async def bench_endpoint(rows: int, number: int) -> None:
+    from httpx import AsyncClient
+
+    from app import crud
+    from app.core.security import create_access_token
+    from app.db.database import postgres_pool
+    from app.fastapi_app import app
+
+    await app.router.startup()
+    try:
+        async with postgres_pool.acquire() as db:
+            superuser = await crud.user.get_by_email(
+                db, email=settings.FIRST_SUPERUSER_USERNAME
+            )
+        headers = dict(Authorization=f"Bearer {create_access_token(superuser.id)}")
+        async with AsyncClient(app=app, base_url=settings.SERVER_HOST) as client:
+
+            async def read_users() -> None:
+                response = await client.get(
+                    f"{settings.API_V1_STR}/user/",
+                    params=dict(limit=rows),
+                    headers=headers,
+                )
+                response.raise_for_status()
+
+            await measure(f"GET /user/?limit={rows}", read_users, number)
+    finally:
+        await app.router.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--number", type=int, default=50)
+    parser.add_argument("--endpoint", action="store_true")
+    args = parser.parse_args()
+
+    bench = bench_endpoint if args.endpoint else bench_serialization
+    asyncio.run(bench(args.rows, args.number))
+
+
+if __name__ == "__main__":
+    main()
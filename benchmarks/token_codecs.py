@@ -0,0 +1,74 @@
+"""
+Compare token backends: encode and decode of an access token.
+
+    python -m benchmarks.token_codecs [--number 20000]
+
+Asymmetric algorithms run on the pyjwt backend when `cryptography` is installed.
+"""
+import argparse
+import time
+import timeit
+
+from app.core.tokens import TOKEN_BACKENDS, Keyring, TokenKey, create_token_codec
+
+
+def hmac_keyring() -> Keyring:
+    return Keyring(
+        [TokenKey(kid="bench", algorithm="HS256", signing_key="s" * 32)],
+        signing_kid="bench",
+    )
+
+
+def asymmetric_keyrings() -> dict[str, Keyring]:
+    try:
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import ec, ed25519
+    except ImportError:
+        return {}
+
+    keyrings = {}
+    for algorithm, private_key in (
+        ("ES256", ec.generate_private_key(ec.SECP256R1())),
+        ("EdDSA", ed25519.Ed25519PrivateKey.generate()),
+    ):
+        pem = private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        ).decode()
+        keyrings[algorithm] = Keyring(
+            [TokenKey(kid="bench", algorithm=algorithm, signing_key=pem)],
+            signing_kid="bench",
+        )
+    return keyrings
+
+
+def bench(label: str, backend: str, keyring: Keyring, number: int) -> None:
+    try:
+        codec = create_token_codec(backend, keyring)
+    except (RuntimeError, ImportError, ValueError) as exc:
+        print(f"{label:<16} skipped: {exc}")
+        return
+    claims = dict(sub="42", exp=int(time.time()) + 3600)
+    token = codec.encode(claims)
+    encode = min(timeit.repeat(lambda: codec.encode(claims), number=number, repeat=3))
+    decode = min(timeit.repeat(lambda: codec.decode(token), number=number, repeat=3))
+    print(
+        f"{label:<16} encode {encode / number * 1e6:8.1f} us"
+        f"   decode {decode / number * 1e6:8.1f} us"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=20_000)
+    args = parser.parse_args()
+
+    for backend in TOKEN_BACKENDS:
+        bench(f"{backend} HS256", backend, hmac_keyring(), args.number)
+    for algorithm, keyring in asymmetric_keyrings().items():
+        bench(f"pyjwt {algorithm}", "pyjwt", keyring, args.number // 10)
+
+
+if __name__ == "__main__":
+    main()
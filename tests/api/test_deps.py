@@ -0,0 +1,27 @@
+import pytest
+from starlette.requests import Request
+
+from app.api.deps import get_client_address
+from app.core.config import settings
+
+
+def make_request(client: str, forwarded_for: str | None = None) -> Request:
+    headers = []
+    if forwarded_for is not None:
+        headers.append((b"x-forwarded-for", forwarded_for.encode()))
+    return Request({"type": "http", "client": (client, 50000), "headers": headers})
+
+
+def test_client_address_ignores_untrusted_forwarded_for() -> None:
+    assert get_client_address(make_request("192.0.2.1", "203.0.113.9")) == ("192.0.2.1")
+
+
+def test_client_address_behind_trusted_proxies(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr(settings, "TRUSTED_PROXIES", ["10.0.0.2", "10.0.0.3"])
+
+    # The client's own header is not trusted, only the hops the proxies added
+    request = make_request("10.0.0.2", "198.51.100.7, 203.0.113.9, 10.0.0.3")
+    assert get_client_address(request) == "203.0.113.9"
+    assert get_client_address(make_request("10.0.0.2")) == "10.0.0.2"
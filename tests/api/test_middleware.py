@@ -0,0 +1,235 @@
+import asyncio
+
+import pytest
+import pytest_asyncio
+from asyncpg import (
+    ConnectionDoesNotExistError,
+    QueryCanceledError,
+    UniqueViolationError,
+)
+from httpx import AsyncClient
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from app.api.middleware import (
+    CompressionMiddleware,
+    ErrorMiddleware,
+    RequestContextMiddleware,
+    negotiate_encoding,
+)
+
+pytestmark = pytest.mark.asyncio
+
+
+async def ok(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(request.state.request_id)
+
+
+async def conflict(request: Request) -> None:
+    raise UniqueViolationError("duplicate key value")
+
+
+async def timeout(request: Request) -> None:
+    raise QueryCanceledError("canceling statement due to statement timeout")
+
+
+async def connection_lost(request: Request) -> None:
+    raise ConnectionDoesNotExistError("connection was closed")
+
+
+async def other_timeout(request: Request) -> None:
+    raise asyncio.TimeoutError
+
+
+async def other_connection_lost(request: Request) -> None:
+    raise ConnectionResetError
+
+
+async def failure(request: Request) -> None:
+    raise RuntimeError("secret details")
+
+
+async def stream(request: Request) -> StreamingResponse:
+    async def chunks():
+        for chunk in (b"a", b"b", b"c"):
+            yield chunk
+
+    return StreamingResponse(chunks())
+
+
+def create_app() -> Starlette:
+    app = Starlette(
+        routes=[
+            Route(f"/{endpoint.__name__}", endpoint)
+            for endpoint in (
+                ok,
+                conflict,
+                timeout,
+                connection_lost,
+                other_timeout,
+                other_connection_lost,
+                failure,
+                stream,
+            )
+        ]
+    )
+    app.add_middleware(ErrorMiddleware)
+    app.add_middleware(RequestContextMiddleware)
+    return app
+
+
+@pytest_asyncio.fixture
+async def client() -> AsyncClient:
+    async with AsyncClient(app=create_app(), base_url="http://test") as client:
+        yield client
+
+
+async def test_request_id_generated(client: AsyncClient) -> None:
+    response = await client.get("/ok")
+
+    assert response.status_code == 200
+    assert response.headers["X-Request-ID"] == response.text
+    assert response.headers["Server-Timing"].startswith("app;dur=")
+
+
+async def test_request_id_from_client(client: AsyncClient) -> None:
+    response = await client.get("/ok", headers={"X-Request-ID": "abc-123"})
+    assert response.headers["X-Request-ID"] == "abc-123"
+
+    response = await client.get("/ok", headers={"X-Request-ID": "a b\tc"})
+    assert response.headers["X-Request-ID"] != "a b\tc"
+
+
+@pytest.mark.parametrize(
+    "path, status_code",
+    [
+        ("/conflict", 409),
+        ("/timeout", 504),
+        ("/connection_lost", 503),
+        ("/other_timeout", 500),
+        ("/other_connection_lost", 500),
+        ("/failure", 500),
+    ],
+)
+async def test_error_status(client: AsyncClient, path: str, status_code: int) -> None:
+    response = await client.get(path)
+
+    assert response.status_code == status_code
+    assert "secret" not in response.text
+    assert "X-Request-ID" in response.headers
+
+
+async def test_streaming_response(client: AsyncClient) -> None:
+    response = await client.get("/stream")
+
+    assert response.status_code == 200
+    assert response.text == "abc"
+
+
+BODY = b"x" * 2000
+schema_requests = 0
+
+
+async def large(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(BODY)
+
+
+async def small(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(b"small")
+
+
+async def large_stream(request: Request) -> StreamingResponse:
+    async def chunks():
+        for _ in range(4):
+            yield BODY
+
+    return StreamingResponse(chunks())
+
+
+async def schema(request: Request) -> PlainTextResponse:
+    global schema_requests
+    schema_requests += 1
+    return PlainTextResponse(BODY)
+
+
+@pytest_asyncio.fixture
+async def compressing_client() -> AsyncClient:
+    app = Starlette(
+        routes=[
+            Route(f"/{endpoint.__name__}", endpoint)
+            for endpoint in (large, small, large_stream, schema)
+        ]
+    )
+    app.add_middleware(
+        CompressionMiddleware, minimum_size=1000, cached_paths=["/schema"]
+    )
+    app.add_middleware(RequestContextMiddleware)
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, encoding",
+    [
+        ("gzip, deflate", "gzip"),
+        ("br;q=0.5, gzip;q=0.8", "gzip"),
+        ("br, gzip", "br"),
+        ("gzip;q=0", None),
+        ("identity", None),
+        ("*", "br"),
+    ],
+)
+def test_negotiate_encoding(accept_encoding: str, encoding: str | None) -> None:
+    assert negotiate_encoding(accept_encoding, ["br", "gzip"]) == encoding
+
+
+async def test_compress_large_response(compressing_client: AsyncClient) -> None:
+    response = await compressing_client.get("/large")
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert int(response.headers["Content-Length"]) < len(BODY)
+    assert response.content == BODY
+
+
+async def test_small_response_not_compressed(compressing_client: AsyncClient) -> None:
+    response = await compressing_client.get("/small")
+
+    assert "Content-Encoding" not in response.headers
+    assert response.content == b"small"
+
+
+async def test_identity_not_compressed(compressing_client: AsyncClient) -> None:
+    response = await compressing_client.get(
+        "/large", headers={"Accept-Encoding": "identity"}
+    )
+
+    assert "Content-Encoding" not in response.headers
+    assert response.content == BODY
+
+
+async def test_compress_streaming_response(compressing_client: AsyncClient) -> None:
+    response = await compressing_client.get("/large_stream")
+
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Content-Length" not in response.headers
+    assert response.content == BODY * 4
+
+
+async def test_cached_path_compressed_once(compressing_client: AsyncClient) -> None:
+    global schema_requests
+    schema_requests = 0
+
+    for _ in range(3):
+        response = await compressing_client.get(
+            "/schema", headers={"Accept-Encoding": "gzip"}
+        )
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.content == BODY
+        assert response.headers.get_list("X-Request-ID") == [
+            response.headers["X-Request-ID"]
+        ]
+
+    assert schema_requests == 1
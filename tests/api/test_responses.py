@@ -0,0 +1,53 @@
+import orjson
+import pytest
+
+from app import models, schemas
+from app.api.responses import rows_response
+from app.schemas import RowMapper
+
+ROW = dict(
+    id=1,
+    email="user@example.com",
+    hashed_password="secret",
+    phone_number=None,
+    first_name="First",
+    last_name="Last",
+    is_active=True,
+    is_superuser=False,
+    token_version=0,
+)
+
+
+def test_rows_response_includes_schema_fields_only() -> None:
+    row = ROW
+
+    response = rows_response([row], schemas.user_mapper, headers={"Link": "<next>"})
+
+    assert response.media_type == "application/json"
+    assert response.headers["Link"] == "<next>"
+    assert orjson.loads(response.body) == [schemas.User.parse_obj(row).dict()]
+
+
+def test_row_mapper_builds_models_without_validation() -> None:
+    row = dict(ROW, email="not-an-email")
+
+    user = schemas.user_mapper.to_model(row)
+
+    assert isinstance(user, schemas.User)
+    assert user.email == "not-an-email"
+    assert user.dict() == {field: row[field] for field in schemas.User.__fields__}
+
+
+def test_row_mapper_rejects_schema_fields_missing_from_table() -> None:
+    with pytest.raises(ValueError):
+        RowMapper(schemas.UserIn, models.user)
+
+
+def test_row_mapper_subset() -> None:
+    mapper = schemas.user_mapper.only(["email", "id", "email"])
+
+    assert mapper.fields == ("email", "id")
+    assert schemas.user_mapper.only(["email", "id"]) is mapper
+    assert orjson.loads(mapper.encode_one(ROW)) == dict(email=ROW["email"], id=1)
+    with pytest.raises(ValueError):
+        schemas.user_mapper.only(["hashed_password"])
@@ -1,6 +1,14 @@
+import pytest
+from databases import Database
 from httpx import AsyncClient
 
+from app import models
 from app.core.config import settings
+from app.crud.filter import ExistenceFilter
+from tests.utils.user import create_random_user
+from tests.utils.utils import random_email
+
+pytestmark = pytest.mark.usefixtures("use_postgres")
 
 
 async def test_get_access_token(api_client: AsyncClient) -> None:
@@ -15,3 +23,116 @@ async def test_get_access_token(api_client: AsyncClient) -> None:
     assert response.status_code == 200
     assert "access_token" in tokens
     assert tokens["access_token"]
+
+
+async def test_logout_revokes_token(
+    api_client: AsyncClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    response = await api_client.post(
+        f"{settings.API_V1_STR}/login/logout", headers=normal_user_token_headers
+    )
+    assert response.status_code == 200
+
+    response = await api_client.get(
+        f"{settings.API_V1_STR}/user/me", headers=normal_user_token_headers
+    )
+    assert response.status_code == 403
+
+
+async def test_superuser_revokes_token(
+    api_client: AsyncClient,
+    superuser_token_headers: dict[str, str],
+    normal_user_token_headers: dict[str, str],
+) -> None:
+    token = normal_user_token_headers["Authorization"].removeprefix("Bearer ")
+    response = await api_client.post(
+        f"{settings.API_V1_STR}/login/revoke",
+        headers=superuser_token_headers,
+        json=dict(token=token),
+    )
+    assert response.status_code == 200
+
+    response = await api_client.get(
+        f"{settings.API_V1_STR}/user/me", headers=normal_user_token_headers
+    )
+    assert response.status_code == 403
+
+
+async def test_login_throttled_per_account(api_client: AsyncClient) -> None:
+    login_data = {"username": "nobody@example.com", "password": "wrong"}
+    for _ in range(settings.LOGIN_THROTTLE_PER_ACCOUNT):
+        response = await api_client.post(
+            f"{settings.API_V1_STR}/login/access-token", data=login_data
+        )
+        assert response.status_code == 400
+
+    response = await api_client.post(
+        f"{settings.API_V1_STR}/login/access-token", data=login_data
+    )
+
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) > 0
+
+
+async def test_password_recovery_throttled_per_account(
+    api_client: AsyncClient,
+) -> None:
+    for _ in range(settings.PASSWORD_RECOVERY_THROTTLE_PER_ACCOUNT):
+        response = await api_client.post(
+            f"{settings.API_V1_STR}/login/password-recovery",
+            json="nobody@example.com",
+        )
+        assert response.status_code == 404
+
+    response = await api_client.post(
+        f"{settings.API_V1_STR}/login/password-recovery", json="nobody@example.com"
+    )
+
+    assert response.status_code == 429
+
+
+@pytest.mark.usefixtures("email_filter")
+async def test_password_recovery_mixed_case_email(
+    api_client: AsyncClient, pg_db: Database
+) -> None:
+    user = await create_random_user(pg_db)
+    local_part, domain = user.email.split("@")
+
+    response = await api_client.post(
+        f"{settings.API_V1_STR}/login/password-recovery",
+        json=f"{local_part.upper()}@{domain.title()}",
+    )
+
+    assert response.status_code == 200
+
+
+async def test_password_recovery_email_changed_elsewhere(
+    api_client: AsyncClient, pg_db: Database, email_filter: ExistenceFilter
+) -> None:
+    user = await create_random_user(pg_db)
+    email = random_email()
+    # As another worker would, without adding the email to this filter
+    await pg_db.execute(
+        models.user.update().where(models.user.c.id == user.id).values(email=email)
+    )
+
+    await email_filter.refresh(pg_db)
+
+    response = await api_client.post(
+        f"{settings.API_V1_STR}/login/password-recovery", json=email
+    )
+
+    assert response.status_code == 200
+    assert email_filter.might_contain(email)
+
+
+async def test_password_recovery_unknown_email(
+    api_client: AsyncClient, email_filter: ExistenceFilter
+) -> None:
+    response = await api_client.post(
+        f"{settings.API_V1_STR}/login/password-recovery", json=random_email()
+    )
+
+    assert response.status_code == 404
+    # Answered by the filter
+    assert email_filter.negatives == 1
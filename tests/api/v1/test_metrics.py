@@ -0,0 +1,32 @@
+import pytest
+from httpx import AsyncClient
+
+from app.core.config import settings
+
+pytestmark = pytest.mark.usefixtures("use_postgres")
+
+
+async def test_read_metrics_superuser(
+    api_client: AsyncClient, superuser_token_headers: dict[str, str]
+) -> None:
+    response = await api_client.get(
+        f"{settings.API_V1_STR}/metrics/", headers=superuser_token_headers
+    )
+    metrics = response.json()
+
+    assert response.status_code == 200
+    pool = metrics["postgres_pool"]
+    assert pool["in_use"] >= 0
+    assert pool["idle"] >= 0
+    assert pool["waiters"] == 0
+    assert pool["size"] <= pool["max_size"]
+
+
+async def test_read_metrics_normal_user(
+    api_client: AsyncClient, normal_user_token_headers: dict[str, str]
+) -> None:
+    response = await api_client.get(
+        f"{settings.API_V1_STR}/metrics/", headers=normal_user_token_headers
+    )
+
+    assert response.status_code == 400
@@ -1,3 +1,7 @@
+import asyncio
+import csv
+import io
+import json
 from typing import Dict
 
 import pytest
@@ -7,6 +11,7 @@ from httpx import AsyncClient
 from app import crud
 from app.core.config import settings
 from app.schemas import UserIn
+from tests.utils.user import create_random_user, user_authentication_headers
 from tests.utils.utils import random_email, random_lower_string
 
 pytestmark = pytest.mark.usefixtures("use_postgres")
@@ -190,3 +195,330 @@ async def test_open_sign_up(api_client: AsyncClient, pg_db: Database):
         assert user.email == created_user["email"]
         assert user.is_active is True
         assert user.is_superuser is False
+
+
+async def test_concurrent_sign_ups_with_one_email(api_client: AsyncClient):
+    if settings.USERS_OPEN_SIGN_UP:
+        data = {"email": random_email(), "password": random_lower_string()}
+
+        responses = await asyncio.gather(
+            *(
+                api_client.post(f"{settings.API_V1_STR}/user/sign-up", json=data)
+                for _ in range(2)
+            )
+        )
+
+        assert sorted(response.status_code for response in responses) == [201, 400]
+
+
+async def test_create_users_bulk(
+    api_client: AsyncClient, superuser_token_headers: dict, pg_db: Database
+) -> None:
+    existing_user = await create_random_user(pg_db)
+    username = random_email()
+    data = [
+        {"email": username, "password": random_lower_string()},
+        {"email": "not-an-email", "password": random_lower_string()},
+        {"email": existing_user.email, "password": random_lower_string()},
+        {"email": username.upper(), "password": random_lower_string()},
+    ]
+
+    response = await api_client.post(
+        f"{settings.API_V1_STR}/user/bulk",
+        headers=superuser_token_headers,
+        json=data,
+    )
+
+    assert response.status_code == 200
+    results = response.json()
+    assert [result["index"] for result in results] == [0, 1, 2, 3]
+    assert results[0]["user"]["email"] == username
+    assert results[0]["error"] is None
+    assert results[1]["user"] is None
+    assert results[1]["error"]
+    assert results[2]["user"] is None
+    assert results[2]["error"]
+    assert results[3]["user"] is None
+    assert results[3]["error"]
+    assert await crud.user.get_by_email(pg_db, email=username)
+
+
+async def test_update_users_bulk(
+    api_client: AsyncClient, superuser_token_headers: dict, pg_db: Database
+) -> None:
+    user = await create_random_user(pg_db)
+    user_2 = await create_random_user(pg_db)
+    first_name = random_lower_string()
+    data = [
+        {"id": user.id, "first_name": first_name},
+        {"id": user_2.id, "email": user.email},
+        {"id": -1, "first_name": first_name},
+    ]
+
+    response = await api_client.patch(
+        f"{settings.API_V1_STR}/user/bulk",
+        headers=superuser_token_headers,
+        json=data,
+    )
+
+    assert response.status_code == 200
+    results = response.json()
+    assert results[0]["user"]["first_name"] == first_name
+    assert results[1]["error"]
+    assert results[2]["error"]
+    db_user_2 = await crud.user.get(pg_db, model_id=user_2.id)
+    assert db_user_2.email == user_2.email
+
+
+async def test_delete_users_bulk(
+    api_client: AsyncClient, superuser_token_headers: dict, pg_db: Database
+) -> None:
+    user = await create_random_user(pg_db)
+
+    response = await api_client.request(
+        "DELETE",
+        f"{settings.API_V1_STR}/user/bulk",
+        headers=superuser_token_headers,
+        json=[user.id, -1],
+    )
+
+    assert response.status_code == 200
+    results = response.json()
+    assert results[0]["user"]["id"] == user.id
+    assert results[1]["error"]
+    assert await crud.user.get(pg_db, model_id=user.id) is None
+
+
+async def test_import_users_csv(
+    api_client: AsyncClient, superuser_token_headers: dict, pg_db: Database
+) -> None:
+    existing_user = await create_random_user(pg_db)
+    username = random_email()
+    password = random_lower_string()
+    content = (
+        "email,password,first_name\n"
+        f"{username},{password},{random_lower_string()}\n"
+        f"{existing_user.email},{random_lower_string()},\n"
+        f"not-an-email,{random_lower_string()},\n"
+    )
+
+    response = await api_client.post(
+        f"{settings.API_V1_STR}/user/import",
+        headers=superuser_token_headers,
+        params={"format": "csv"},
+        content=content,
+    )
+
+    assert response.status_code == 200
+    result = response.json()
+    assert result["rows_read"] == 3
+    assert result["rows_invalid"] == 1
+    assert result["rows_merged"] == 1
+    assert result["rows_skipped"] == 1
+    user = await crud.user.authenticate(pg_db, email=username, password=password)
+    assert user
+
+
+async def test_import_users_update_keeps_omitted_columns(
+    api_client: AsyncClient, superuser_token_headers: dict, pg_db: Database
+) -> None:
+    user = await create_random_user(pg_db)
+    user = await crud.user.update(
+        pg_db, db_obj=user, obj_in=dict(is_superuser=True, phone_number="+100")
+    )
+    first_name = random_lower_string()
+
+    response = await api_client.post(
+        f"{settings.API_V1_STR}/user/import",
+        headers=superuser_token_headers,
+        params={"format": "csv", "on_conflict": "update"},
+        content=f"email,hashed_password,first_name\n"
+        f"{user.email},{user.hashed_password},{first_name}\n",
+    )
+
+    assert response.status_code == 200
+    assert response.json()["rows_merged"] == 1
+    db_user = await crud.user.get(pg_db, model_id=user.id)
+    assert db_user.first_name == first_name
+    assert db_user.last_name == user.last_name
+    assert db_user.phone_number == "+100"
+    assert db_user.is_superuser
+
+
+async def test_retrieve_users_cursor_pages(
+    api_client: AsyncClient, superuser_token_headers: dict, pg_db: Database
+) -> None:
+    for _ in range(3):
+        await create_random_user(pg_db)
+
+    first_page = await api_client.get(
+        f"{settings.API_V1_STR}/user/",
+        headers=superuser_token_headers,
+        params={"limit": 2},
+    )
+    assert first_page.status_code == 200
+    assert "prev" not in first_page.links
+    second_page = await api_client.get(
+        first_page.links["next"]["url"], headers=superuser_token_headers
+    )
+    assert second_page.status_code == 200
+    back_page = await api_client.get(
+        second_page.links["prev"]["url"], headers=superuser_token_headers
+    )
+
+    first_ids = [user["id"] for user in first_page.json()]
+    second_ids = [user["id"] for user in second_page.json()]
+    assert len(first_ids) == 2
+    assert first_ids[-1] < second_ids[0]
+    assert second_ids == sorted(second_ids)
+    assert [user["id"] for user in back_page.json()] == first_ids
+
+
+async def test_retrieve_users_invalid_cursor(
+    api_client: AsyncClient, superuser_token_headers: dict
+) -> None:
+    response = await api_client.get(
+        f"{settings.API_V1_STR}/user/",
+        headers=superuser_token_headers,
+        params={"cursor": "not-a-cursor"},
+    )
+
+    assert response.status_code == 400
+
+
+async def test_export_users_ndjson(
+    api_client: AsyncClient, superuser_token_headers: dict, pg_db: Database
+) -> None:
+    user = await create_random_user(pg_db)
+
+    response = await api_client.get(
+        f"{settings.API_V1_STR}/user/export",
+        headers=superuser_token_headers,
+        params={"format": "ndjson"},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert {"id": user.id, "email": user.email} in [
+        {"id": item["id"], "email": item["email"]} for item in exported
+    ]
+    assert all("hashed_password" not in item for item in exported)
+
+
+async def test_export_users_csv(
+    api_client: AsyncClient, superuser_token_headers: dict, pg_db: Database
+) -> None:
+    user = await create_random_user(pg_db)
+
+    response = await api_client.get(
+        f"{settings.API_V1_STR}/user/export",
+        headers=superuser_token_headers,
+        params={"format": "csv"},
+    )
+
+    assert response.status_code == 200
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert user.email in [row["email"] for row in rows]
+    assert "hashed_password" not in rows[0]
+
+
+async def test_superuser_authorized_from_token_claims(
+    api_client: AsyncClient, pg_db: Database, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(settings, "TOKEN_AUTHZ_CLAIMS", True)
+    password = random_lower_string()
+    user = await crud.user.create(
+        pg_db,
+        obj_in=UserIn(email=random_email(), password=password, is_superuser=True),
+    )
+    headers = await user_authentication_headers(
+        api_client=api_client, email=user.email, password=password
+    )
+
+    response = await api_client.get(f"{settings.API_V1_STR}/user/", headers=headers)
+    assert response.status_code == 200
+
+    await crud.user.update(pg_db, db_obj=user, obj_in=dict(is_superuser=False))
+    response = await api_client.get(f"{settings.API_V1_STR}/user/", headers=headers)
+    assert response.status_code == 403
+
+
+async def test_retrieve_users_sparse_fields(
+    api_client: AsyncClient, superuser_token_headers: dict, pg_db: Database
+) -> None:
+    await create_random_user(pg_db)
+
+    response = await api_client.get(
+        f"{settings.API_V1_STR}/user/",
+        headers=superuser_token_headers,
+        params=dict(fields="id,email"),
+    )
+
+    assert response.status_code == 200
+    assert all(set(user) == {"id", "email"} for user in response.json())
+
+
+async def test_retrieve_users_sparse_fields_cursor_pages(
+    api_client: AsyncClient, superuser_token_headers: dict, pg_db: Database
+) -> None:
+    for _ in range(2):
+        await create_random_user(pg_db)
+
+    first_page = await api_client.get(
+        f"{settings.API_V1_STR}/user/",
+        headers=superuser_token_headers,
+        params=dict(fields="email", limit=1),
+    )
+    assert first_page.status_code == 200
+    second_page = await api_client.get(
+        first_page.links["next"]["url"], headers=superuser_token_headers
+    )
+
+    assert second_page.status_code == 200
+    for page in (first_page, second_page):
+        assert [set(user) for user in page.json()] == [{"email"}]
+
+
+async def test_retrieve_users_sparse_fields_offset(
+    api_client: AsyncClient, superuser_token_headers: dict, pg_db: Database
+) -> None:
+    for _ in range(2):
+        await create_random_user(pg_db)
+
+    response = await api_client.get(
+        f"{settings.API_V1_STR}/user/",
+        headers=superuser_token_headers,
+        params=dict(fields="id,email", skip=1),
+    )
+
+    assert response.status_code == 200
+    assert response.json()
+    assert all(set(user) == {"id", "email"} for user in response.json())
+
+
+async def test_get_user_sparse_fields(
+    api_client: AsyncClient, superuser_token_headers: dict, pg_db: Database
+) -> None:
+    user = await create_random_user(pg_db)
+
+    response = await api_client.get(
+        f"{settings.API_V1_STR}/user/{user.id}",
+        headers=superuser_token_headers,
+        params=dict(fields="email"),
+    )
+
+    assert response.status_code == 200
+    assert response.json() == dict(email=user.email)
+
+
+async def test_retrieve_users_unknown_field(
+    api_client: AsyncClient, superuser_token_headers: dict
+) -> None:
+    response = await api_client.get(
+        f"{settings.API_V1_STR}/user/",
+        headers=superuser_token_headers,
+        params=dict(fields="email,hashed_password"),
+    )
+
+    assert response.status_code == 400
@@ -0,0 +1,39 @@
+from app.core.bloom import BloomFilter
+
+
+def test_bloom_filter_has_no_false_negatives() -> None:
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    items = [f"item-{i}" for i in range(1000)]
+    for item in items:
+        bloom.add(item)
+
+    assert all(item in bloom for item in items)
+
+
+def test_bloom_filter_counts_new_items_only() -> None:
+    bloom = BloomFilter(capacity=10, error_rate=0.01)
+    bloom.add("a")
+    bloom.add("a")
+    bloom.add("b")
+
+    assert len(bloom) == 2
+
+
+def test_bloom_filter_false_positive_rate() -> None:
+    bloom = BloomFilter(capacity=10_000, error_rate=0.01)
+    for i in range(10_000):
+        bloom.add(f"revoked-{i}")
+
+    false_positives = sum(f"other-{i}" in bloom for i in range(10_000))
+
+    assert false_positives / 10_000 < 0.02
+    assert 0.005 < bloom.false_positive_rate() < 0.015
+
+
+def test_bloom_filter_size() -> None:
+    stats = BloomFilter(capacity=100_000, error_rate=0.001).stats()
+
+    # About 1.8 bytes per item at 0.1%
+    assert 170_000 < stats["memory_bytes"] < 190_000
+    assert stats["hashes"] == 10
+    assert stats["count"] == 0
@@ -0,0 +1,119 @@
+import time
+from typing import AsyncIterator
+
+import pytest
+
+from app.core.cache import (
+    CachedRow,
+    KeyValueCacheBackend,
+    MemoryKeyValueStore,
+    TTLCache,
+)
+
+
+def test_cache_get_and_set() -> None:
+    cache = TTLCache(maxsize=10, ttl=60)
+
+    assert cache.get("key") is None
+    cache.set("key", "value")
+
+    assert cache.get("key") == "value"
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+    assert cache.stats()["hit_ratio"] == 0.5
+
+
+def test_cache_evicts_least_recently_used() -> None:
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_entries_expire() -> None:
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("key", "value", ttl=0.01)
+
+    time.sleep(0.02)
+
+    assert cache.get("key") is None
+    assert len(cache) == 0
+
+
+def test_cache_delete_and_disable() -> None:
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("key", "value")
+    cache.delete("key")
+    disabled = TTLCache(maxsize=10, ttl=0)
+    disabled.set("key", "value")
+
+    assert cache.get("key") is None
+    assert disabled.get("key") is None
+
+
+@pytest.mark.asyncio
+async def test_key_value_backend_round_trip() -> None:
+    backend = KeyValueCacheBackend(MemoryKeyValueStore())
+    row = CachedRow(id=1, email="user@example.com")
+
+    await backend.set("user:id:1", row, ttl=60)
+    cached = await backend.get("user:id:1")
+
+    assert cached == row
+    assert cached.email == "user@example.com"
+    await backend.delete("user:id:1")
+    assert await backend.get("user:id:1") is None
+
+
+@pytest.mark.asyncio
+async def test_key_value_backend_clear() -> None:
+    store = MemoryKeyValueStore()
+    backend = KeyValueCacheBackend(store, prefix="crud:")
+    await store.set("other", b"1", px=60_000)
+    await backend.set("user:id:1", CachedRow(id=1), ttl=60)
+
+    await backend.clear()
+
+    assert await backend.get("user:id:1") is None
+    assert await store.get("other") == b"1"
+
+
+class UnreachableStore(MemoryKeyValueStore):
+    async def get(self, name: str) -> bytes | None:
+        raise ConnectionRefusedError
+
+    async def set(self, name: str, value: bytes, *, px: int, nx: bool = False) -> None:
+        raise ConnectionRefusedError
+
+    async def delete(self, *names: str) -> int:
+        raise ConnectionRefusedError
+
+    async def scan_iter(self, match: str) -> AsyncIterator[str]:
+        raise ConnectionRefusedError
+        yield
+
+
+@pytest.mark.asyncio
+async def test_key_value_backend_store_unreachable() -> None:
+    backend = KeyValueCacheBackend(UnreachableStore())
+
+    await backend.set("user:id:1", CachedRow(id=1), ttl=60)
+    assert await backend.get("user:id:1") is None
+    await backend.delete("user:id:1")
+    await backend.clear()
+
+    assert backend.stats()["errors"] == 4
+
+
+@pytest.mark.asyncio
+async def test_key_value_backend_raises_other_errors() -> None:
+    backend = KeyValueCacheBackend(UnreachableStore(), client_errors=(TimeoutError,))
+
+    with pytest.raises(ConnectionRefusedError):
+        await backend.get("user:id:1")
@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+import pytest
+
+from app.core.hashing import PasswordHasher, PasswordHasherBusyError
+from app.core.security import (
+    get_password_hash_async,
+    verify_password,
+    verify_password_async,
+)
+from tests.utils.utils import random_lower_string
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_hash_and_verify_password_async() -> None:
+    password = random_lower_string()
+
+    hashed_password = await get_password_hash_async(password)
+
+    assert verify_password(password, hashed_password)
+    assert await verify_password_async(password, hashed_password)
+    assert not await verify_password_async(random_lower_string(), hashed_password)
+
+
+async def test_hasher_rejects_when_queue_is_full() -> None:
+    hasher = PasswordHasher(workers=1, max_queue=1, executor_type="thread")
+    try:
+        running = asyncio.create_task(hasher.run(time.sleep, 0.2))
+        queued = asyncio.create_task(hasher.run(time.sleep, 0))
+        await asyncio.sleep(0.05)
+
+        assert hasher.stats()["running"] == 1
+        assert hasher.stats()["queued"] == 1
+        with pytest.raises(PasswordHasherBusyError):
+            await hasher.run(time.sleep, 0)
+
+        await asyncio.gather(running, queued)
+        stats = hasher.stats()
+        assert stats["completed"] == 2
+        assert stats["rejected"] == 1
+        assert stats["wait_seconds_max"] > 0
+    finally:
+        hasher.shutdown()
+
+
+async def test_hasher_map_waits_for_workers() -> None:
+    hasher = PasswordHasher(workers=1, max_queue=0, executor_type="thread")
+    try:
+        assert await hasher.map(abs, [-1, -2, -3]) == [1, 2, 3]
+    finally:
+        hasher.shutdown()
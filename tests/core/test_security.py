@@ -0,0 +1,75 @@
+from datetime import timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app.core import security
+from app.core.tokens import InvalidTokenError
+
+
+def test_decode_access_token_is_cached() -> None:
+    token = security.create_access_token(42)
+    hits = security.token_cache.hits
+
+    token_data = security.decode_access_token(token)
+    cached_token_data = security.decode_access_token(token)
+
+    assert token_data.sub == 42
+    assert cached_token_data is token_data
+    assert security.token_cache.hits == hits + 1
+
+
+def test_decode_expired_access_token() -> None:
+    token = security.create_access_token(42, expires_delta=timedelta(seconds=-1))
+
+    with pytest.raises(InvalidTokenError):
+        security.decode_access_token(token)
+
+
+def test_decode_invalid_access_token() -> None:
+    with pytest.raises(InvalidTokenError):
+        security.decode_access_token("not-a-token")
+
+
+def test_password_reset_token() -> None:
+    token = security.generate_password_reset_token(user_id=42)
+
+    assert security.verify_password_reset_token(token) == 42
+    with pytest.raises(InvalidTokenError):
+        security.decode_access_token(token)
+
+
+def test_access_token_is_not_a_password_reset_token() -> None:
+    token = security.create_access_token(42)
+
+    assert security.verify_password_reset_token(token) is None
+
+
+def test_access_token_authz_claims() -> None:
+    user = SimpleNamespace(id=42, is_active=True, is_superuser=False, token_version=3)
+    token = security.create_access_token(user.id, claims=security.authz_claims(user))
+
+    token_data = security.decode_access_token(token)
+
+    assert token_data.sub == 42
+    assert token_data.is_superuser is False
+    assert token_data.token_version == 3
+
+
+def test_password_hash_uses_policy_rounds(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(security.password_policy, "rounds", 10)
+    hashed_password = security.get_password_hash("secret")
+
+    assert hashed_password.startswith("$2b$10$")
+    assert security.verify_password("secret", hashed_password)
+    assert not security.password_policy.needs_rehash(hashed_password)
+    assert not security.password_policy.needs_rehash(
+        security.get_password_hash("secret", rounds=11)
+    )
+    monkeypatch.setattr(security.password_policy, "rounds", 11)
+    assert security.password_policy.needs_rehash(hashed_password)
+
+
+def test_calibrate_bcrypt_rounds() -> None:
+    assert security.calibrate_bcrypt_rounds(0.001) == security.BCRYPT_MIN_ROUNDS
+    assert security.calibrate_bcrypt_rounds(3600) == security.BCRYPT_MAX_ROUNDS
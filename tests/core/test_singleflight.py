@@ -0,0 +1,92 @@
+import asyncio
+
+import pytest
+
+from app.core.singleflight import SingleFlight
+
+pytestmark = pytest.mark.asyncio
+
+
+async def test_concurrent_calls_shared() -> None:
+    flights = SingleFlight()
+    calls = 0
+
+    async def query() -> int:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    results = await asyncio.gather(*(flights.do("key", query) for _ in range(5)))
+
+    assert results == [1] * 5
+    assert calls == 1
+    assert flights.stats()["shared"] == 4
+    assert len(flights) == 0
+
+
+async def test_different_keys_not_shared() -> None:
+    flights = SingleFlight()
+
+    async def query(value: int) -> int:
+        await asyncio.sleep(0)
+        return value
+
+    results = await asyncio.gather(
+        flights.do(1, lambda: query(1)), flights.do(2, lambda: query(2))
+    )
+
+    assert results == [1, 2]
+    assert flights.stats()["shared"] == 0
+
+
+async def test_error_raised_to_every_caller() -> None:
+    flights = SingleFlight()
+
+    async def query() -> None:
+        await asyncio.sleep(0)
+        raise ValueError("failed")
+
+    results = await asyncio.gather(
+        *(flights.do("key", query) for _ in range(3)), return_exceptions=True
+    )
+
+    assert all(isinstance(result, ValueError) for result in results)
+
+
+async def test_cancelled_caller_does_not_cancel_call() -> None:
+    flights = SingleFlight()
+    started = asyncio.Event()
+
+    async def query() -> str:
+        started.set()
+        await asyncio.sleep(0.01)
+        return "row"
+
+    first = asyncio.create_task(flights.do("key", query))
+    await started.wait()
+    second = asyncio.create_task(flights.do("key", query))
+    await asyncio.sleep(0)
+    first.cancel()
+
+    assert await second == "row"
+
+
+async def test_forget_starts_new_call() -> None:
+    flights = SingleFlight()
+    calls = 0
+
+    async def query() -> int:
+        nonlocal calls
+        calls += 1
+        call = calls
+        await asyncio.sleep(0.01)
+        return call
+
+    first = asyncio.create_task(flights.do("key", query))
+    await asyncio.sleep(0)
+    flights.forget("key")
+    second = asyncio.create_task(flights.do("key", query))
+
+    assert await first == 1
+    assert await second == 2
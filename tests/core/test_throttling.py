@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from app.core.cache import MemoryKeyValueStore
+from app.core.throttling import (
+    KeyValueThrottleBackend,
+    MemoryThrottleBackend,
+    ThrottledError,
+    Throttler,
+    ThrottleRule,
+)
+
+pytestmark = pytest.mark.asyncio
+
+rule = ThrottleRule(name="login", limit=3, window=60)
+
+
+async def test_throttle_after_limit() -> None:
+    throttler = Throttler(MemoryThrottleBackend())
+    for _ in range(3):
+        await throttler.hit(rule, "127.0.0.1")
+
+    with pytest.raises(ThrottledError) as exc_info:
+        await throttler.hit(rule, "127.0.0.1")
+
+    assert 0 < exc_info.value.retry_after <= 60
+    assert throttler.stats()["throttled"] == dict(login=1)
+    # Other keys are counted separately
+    await throttler.hit(rule, "10.0.0.1")
+
+
+async def test_throttle_window_slides() -> None:
+    throttler = Throttler(MemoryThrottleBackend())
+    short_rule = ThrottleRule(name="login", limit=1, window=0.01)
+    await throttler.hit(short_rule, "user@example.com")
+
+    with pytest.raises(ThrottledError):
+        await throttler.hit(short_rule, "user@example.com")
+    await asyncio.sleep(0.02)
+    await throttler.hit(short_rule, "user@example.com")
+
+
+async def test_throttle_reset() -> None:
+    throttler = Throttler(MemoryThrottleBackend())
+    for _ in range(3):
+        await throttler.hit(rule, "user@example.com")
+
+    await throttler.reset(rule, "user@example.com")
+
+    await throttler.hit(rule, "user@example.com")
+
+
+async def test_memory_backend_bounds_keys() -> None:
+    backend = MemoryThrottleBackend(max_keys=2)
+    for key in ("a", "b", "c"):
+        await backend.hit(key, limit=1, window=60)
+
+    assert backend.stats()["keys"] == 2
+    # "a" was dropped, its attempts are forgotten
+    assert await backend.hit("a", limit=1, window=60) == 0
+
+
+async def test_key_value_backend_shared_by_workers() -> None:
+    store = MemoryKeyValueStore()
+    workers = [Throttler(KeyValueThrottleBackend(store)) for _ in range(3)]
+    for worker in workers:
+        await worker.hit(rule, "127.0.0.1")
+
+    with pytest.raises(ThrottledError) as exc_info:
+        await workers[0].hit(rule, "127.0.0.1")
+
+    assert 0 < exc_info.value.retry_after <= 60
+    await workers[1].reset(rule, "127.0.0.1")
+    await workers[2].hit(rule, "127.0.0.1")
+
+
+async def test_key_value_backend_window_expires() -> None:
+    backend = KeyValueThrottleBackend(MemoryKeyValueStore())
+    assert await backend.hit("a", limit=1, window=0.01) == 0
+    assert await backend.hit("a", limit=1, window=0.01) > 0
+
+    await asyncio.sleep(0.02)
+
+    assert await backend.hit("a", limit=1, window=0.01) == 0
@@ -0,0 +1,196 @@
+import time
+
+import pytest
+
+from app.core.tokens import InvalidTokenError, Keyring, TokenKey, create_token_codec
+
+pytest.importorskip("jwt")
+serialization = pytest.importorskip("cryptography.hazmat.primitives.serialization")
+ec = pytest.importorskip("cryptography.hazmat.primitives.asymmetric.ec")
+ed25519 = pytest.importorskip("cryptography.hazmat.primitives.asymmetric.ed25519")
+
+SYMMETRIC_BACKENDS = ["hmac", "pyjwt", "jose"]
+OLD_SECRET = "o" * 32
+NEW_SECRET = "n" * 32
+
+
+def hmac_keyring(signing_kid: str | None = "new") -> Keyring:
+    return Keyring(
+        [
+            TokenKey(kid="old", algorithm="HS256", signing_key=OLD_SECRET),
+            TokenKey(kid="new", algorithm="HS256", signing_key=NEW_SECRET),
+        ],
+        signing_kid=signing_kid,
+    )
+
+
+def private_pem(key) -> str:
+    return key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    ).decode()
+
+
+def public_pem(key) -> str:
+    return (
+        key.public_key()
+        .public_bytes(
+            serialization.Encoding.PEM,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+        .decode()
+    )
+
+
+@pytest.mark.parametrize("backend", SYMMETRIC_BACKENDS)
+def test_encode_decode(backend: str) -> None:
+    codec = create_token_codec(backend, hmac_keyring())
+    claims = dict(sub="42", exp=int(time.time()) + 60)
+
+    assert codec.decode(codec.encode(claims)) == claims
+
+
+@pytest.mark.parametrize("encoder", SYMMETRIC_BACKENDS)
+@pytest.mark.parametrize("decoder", SYMMETRIC_BACKENDS)
+def test_backends_are_interchangeable(encoder: str, decoder: str) -> None:
+    claims = dict(sub="42", exp=int(time.time()) + 60)
+    token = create_token_codec(encoder, hmac_keyring()).encode(claims)
+
+    assert create_token_codec(decoder, hmac_keyring()).decode(token) == claims
+
+
+@pytest.mark.parametrize("backend", SYMMETRIC_BACKENDS)
+def test_key_rotation(backend: str) -> None:
+    old_token = create_token_codec(backend, hmac_keyring("old")).encode(dict(sub="1"))
+    codec = create_token_codec(backend, hmac_keyring("new"))
+
+    assert codec.decode(old_token) == dict(sub="1")
+
+    retired = Keyring(
+        [TokenKey(kid="new", algorithm="HS256", signing_key=NEW_SECRET)],
+        signing_kid="new",
+    )
+    with pytest.raises(InvalidTokenError):
+        create_token_codec(backend, retired).decode(old_token)
+
+
+@pytest.mark.parametrize("backend", SYMMETRIC_BACKENDS)
+def test_retired_secret_as_verifying_key(backend: str) -> None:
+    old_token = create_token_codec(backend, hmac_keyring("old")).encode(dict(sub="1"))
+    keyring = Keyring(
+        [
+            TokenKey(
+                kid="old", algorithm="HS256", signing_key=None, verifying_key=OLD_SECRET
+            ),
+            TokenKey(kid="new", algorithm="HS256", signing_key=NEW_SECRET),
+        ],
+        signing_kid="new",
+    )
+
+    assert create_token_codec(backend, keyring).decode(old_token) == dict(sub="1")
+
+
+@pytest.mark.parametrize("backend", SYMMETRIC_BACKENDS)
+@pytest.mark.parametrize(
+    "claims",
+    [dict(exp=int(time.time()) - 1), dict(nbf=int(time.time()) + 60)],
+)
+def test_time_claims(backend: str, claims: dict) -> None:
+    codec = create_token_codec(backend, hmac_keyring())
+
+    with pytest.raises(InvalidTokenError):
+        codec.decode(codec.encode(claims))
+
+
+@pytest.mark.parametrize("backend", SYMMETRIC_BACKENDS)
+def test_tampered_token(backend: str) -> None:
+    codec = create_token_codec(backend, hmac_keyring())
+    header, payload, signature = codec.encode(dict(sub="1")).split(".")
+    forged = create_token_codec(backend, hmac_keyring()).encode(dict(sub="2"))
+
+    with pytest.raises(InvalidTokenError):
+        codec.decode(".".join([header, forged.split(".")[1], signature]))
+    with pytest.raises(InvalidTokenError):
+        codec.decode("not-a-token")
+
+
+@pytest.mark.parametrize(
+    "algorithm, private_key",
+    [
+        ("ES256", ec.generate_private_key(ec.SECP256R1())),
+        ("EdDSA", ed25519.Ed25519PrivateKey.generate()),
+    ],
+)
+def test_asymmetric_verify_with_public_key_only(algorithm: str, private_key) -> None:
+    signer = create_token_codec(
+        "pyjwt",
+        Keyring(
+            [
+                TokenKey(
+                    kid="a", algorithm=algorithm, signing_key=private_pem(private_key)
+                )
+            ],
+            signing_kid="a",
+        ),
+    )
+    # A service holding only the public key
+    verifier = create_token_codec(
+        "pyjwt",
+        Keyring(
+            [
+                TokenKey(
+                    kid="a",
+                    algorithm=algorithm,
+                    signing_key=None,
+                    verifying_key=public_pem(private_key),
+                ),
+                TokenKey(kid="b", algorithm="HS256", signing_key="b" * 32),
+            ],
+            signing_kid="b",
+        ),
+    )
+
+    assert verifier.decode(signer.encode(dict(sub="42"))) == dict(sub="42")
+
+
+def test_verify_only_keyring() -> None:
+    private_key = ec.generate_private_key(ec.SECP256R1())
+    signer = create_token_codec(
+        "pyjwt",
+        Keyring(
+            [
+                TokenKey(
+                    kid="a", algorithm="ES256", signing_key=private_pem(private_key)
+                )
+            ],
+            signing_kid="a",
+        ),
+    )
+    verifier = create_token_codec(
+        "pyjwt",
+        Keyring(
+            [
+                TokenKey(
+                    kid="a",
+                    algorithm="ES256",
+                    signing_key=None,
+                    verifying_key=public_pem(private_key),
+                )
+            ],
+            signing_kid="a",
+        ),
+    )
+
+    assert verifier.decode(signer.encode(dict(sub="42"))) == dict(sub="42")
+    with pytest.raises(ValueError):
+        verifier.encode(dict(sub="42"))
+
+
+def test_hmac_backend_rejects_asymmetric_keys() -> None:
+    keyring = Keyring(
+        [TokenKey(kid="1", algorithm="ES256", signing_key="pem")], signing_kid="1"
+    )
+
+    with pytest.raises(ValueError):
+        create_token_codec("hmac", keyring)
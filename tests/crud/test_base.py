@@ -0,0 +1,47 @@
+import pytest
+from databases import Database
+from pydantic import BaseModel
+
+from app import models
+from app.crud.base import CRUDBase
+from tests.utils.utils import random_email, random_lower_string
+
+pytestmark = pytest.mark.asyncio
+
+
+class UserRow(BaseModel):
+    email: str
+    hashed_password: str
+    token_version: int | None
+
+
+crud_user_rows = CRUDBase(models.user)
+
+
+async def test_create_many_server_defaults(pg_db: Database) -> None:
+    rows_in = [
+        UserRow(email=random_email(), hashed_password=random_lower_string()),
+        UserRow(
+            email=random_email(), hashed_password=random_lower_string(), token_version=3
+        ),
+        UserRow(email=random_email(), hashed_password=random_lower_string()),
+    ]
+
+    rows = await crud_user_rows.create_many(pg_db, objs_in=rows_in)
+
+    assert [row.token_version for row in rows] == [0, 3, 0]
+    assert all(row.is_active for row in rows)
+
+
+async def test_create_many_in_input_order(pg_db: Database) -> None:
+    rows_in = [
+        UserRow(email=random_email(), hashed_password=random_lower_string())
+        for _ in range(5)
+    ]
+
+    rows = await crud_user_rows.create_many(pg_db, objs_in=rows_in, chunk_size=2)
+
+    assert [row.email for row in rows] == [row_in.email for row_in in rows_in]
+    assert [row.hashed_password for row in rows] == [
+        row_in.hashed_password for row_in in rows_in
+    ]
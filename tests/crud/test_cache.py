@@ -0,0 +1,88 @@
+import pytest
+
+from app import models
+from app.core.cache import KeyValueCacheBackend, MemoryCacheBackend, MemoryKeyValueStore
+from app.crud.cache import RowCache
+
+pytestmark = pytest.mark.asyncio
+
+ROW = dict(id=1, email="user@example.com")
+
+
+def create_cache(backend=None) -> RowCache:
+    return RowCache(
+        models.user,
+        backend or MemoryCacheBackend(maxsize=10, ttl=60),
+        columns=("id", "email"),
+        ttl=60,
+    )
+
+
+@pytest.fixture(params=["memory", "key_value"])
+def cache(request) -> RowCache:
+    if request.param == "memory":
+        return create_cache()
+    return create_cache(KeyValueCacheBackend(MemoryKeyValueStore()))
+
+
+async def test_read_through(cache: RowCache) -> None:
+    fetched = []
+
+    async def fetch():
+        fetched.append(1)
+        return ROW
+
+    row = await cache.get("id", 1, fetch)
+    assert row.email == ROW["email"]
+    assert await cache.get("email", ROW["email"], fetch) == ROW
+    assert len(fetched) == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["hit_ratio"] == 0.5
+
+
+async def test_missing_row_not_cached(cache: RowCache) -> None:
+    async def fetch():
+        return None
+
+    assert await cache.get("id", 1, fetch) is None
+    assert await cache.get("id", 1, fetch) is None
+    assert cache.stats()["misses"] == 2
+
+
+async def test_invalidate_drops_every_key(cache: RowCache) -> None:
+    async def fetch():
+        return ROW
+
+    await cache.get("id", 1, fetch)
+    await cache.invalidate([ROW])
+
+    assert await cache.backend.get(cache.key("id", 1)) is None
+    assert await cache.backend.get(cache.key("email", ROW["email"])) is None
+
+
+async def test_row_read_during_invalidation_not_stored(cache: RowCache) -> None:
+    async def fetch():
+        await cache.invalidate([ROW])
+        return ROW
+
+    await cache.get("id", 1, fetch)
+
+    assert await cache.backend.get(cache.key("id", 1)) is None
+
+
+async def test_invalidated_key_held() -> None:
+    cache = RowCache(
+        models.user,
+        MemoryCacheBackend(maxsize=10, ttl=60),
+        columns=("id", "email"),
+        ttl=60,
+        hold=60,
+    )
+
+    async def fetch():
+        return ROW
+
+    await cache.invalidate([ROW])
+    await cache.get("id", 1, fetch)
+
+    assert await cache.backend.get(cache.key("id", 1)) is None
@@ -0,0 +1,98 @@
+import time
+
+import pytest
+from databases import Database
+
+from app import crud, models
+from app.crud.filter import ExistenceFilter
+from tests.utils.user import create_random_user
+from tests.utils.utils import random_email
+
+pytestmark = pytest.mark.asyncio
+
+
+def create_filter() -> ExistenceFilter:
+    return ExistenceFilter(
+        models.user,
+        "email",
+        changed_column="updated_at",
+        capacity=1000,
+        error_rate=0.01,
+        refresh_interval=1,
+        overlap=30,
+        rebuild_interval=60,
+        normalize=str.lower,
+    )
+
+
+async def test_everything_may_exist_before_load() -> None:
+    emails = create_filter()
+
+    assert emails.might_contain(random_email())
+    assert emails.stats()["negatives"] == 0
+
+
+async def test_load_and_refresh(pg_db: Database) -> None:
+    user = await create_random_user(pg_db)
+    emails = create_filter()
+
+    await emails.load(pg_db)
+    assert emails.might_contain(user.email)
+    assert not emails.might_contain(random_email())
+
+    user_2 = await create_random_user(pg_db)
+    await emails.refresh(pg_db)
+    assert emails.might_contain(user_2.email)
+
+
+async def test_values_normalized(pg_db: Database) -> None:
+    emails = create_filter()
+    await emails.load(pg_db)
+
+    emails.add("Someone@Example.com")
+
+    assert emails.might_contain("someone@example.com")
+    assert emails.might_contain("SOMEONE@EXAMPLE.COM")
+
+
+async def test_filtered_get_by_email(
+    pg_db: Database, email_filter: ExistenceFilter
+) -> None:
+    assert (
+        await crud.user.get_by_email(pg_db, email=random_email(), filtered=True) is None
+    )
+    assert email_filter.negatives == 1
+
+    # Added before the insert, found without a refresh
+    user = await create_random_user(pg_db)
+    db_user = await crud.user.get_by_email(pg_db, email=user.email, filtered=True)
+    assert db_user.id == user.id
+
+
+async def test_refresh_adds_changed_values(pg_db: Database) -> None:
+    user = await create_random_user(pg_db)
+    emails = create_filter()
+    await emails.load(pg_db)
+    email = random_email()
+
+    # As another worker would, without adding the email to this filter
+    await pg_db.execute(
+        models.user.update().where(models.user.c.id == user.id).values(email=email)
+    )
+    await emails.refresh(pg_db)
+
+    assert emails.might_contain(email)
+
+
+async def test_stale_filter_gives_no_negatives(
+    pg_db: Database, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    emails = create_filter()
+    await emails.load(pg_db)
+    assert not emails.might_contain(random_email())
+
+    # The refreshes stopped
+    monkeypatch.setattr(emails, "_refreshed_at", time.monotonic() - 60)
+
+    assert not emails.is_fresh
+    assert emails.might_contain(random_email())
@@ -1,10 +1,13 @@
+import asyncio
+
 import pytest
 from databases import Database
 from fastapi.encoders import jsonable_encoder
 
 from app import crud
-from app.core.security import verify_password
+from app.core.security import get_password_hash, password_policy, verify_password
 from app.schemas.user import UserIn, UserUpdate
+from tests.utils.user import create_random_user
 from tests.utils.utils import random_email, random_lower_string
 
 pytestmark = pytest.mark.asyncio
@@ -27,6 +30,35 @@ async def test_create_user(pg_db: Database) -> None:
     assert verify_password(password, user.hashed_password)
 
 
+async def test_create_user_or_conflict(pg_db: Database) -> None:
+    user_in = UserIn(email=random_email(), password=random_lower_string())
+
+    user = await crud.user.create_or_conflict(pg_db, obj_in=user_in)
+    assert user.email == user_in.email
+
+    assert await crud.user.create_or_conflict(pg_db, obj_in=user_in) is None
+
+
+async def test_upsert_user(pg_db: Database) -> None:
+    email = random_email()
+    user = await crud.user.upsert(
+        pg_db, obj_in=UserIn(email=email, password="old", first_name="First")
+    )
+    new_password = random_lower_string()
+
+    upserted = await crud.user.upsert(
+        pg_db, obj_in=UserIn(email=email, password=new_password)
+    )
+
+    assert upserted.id == user.id
+    assert upserted.first_name == "First"
+    assert verify_password(new_password, upserted.hashed_password)
+    assert upserted.token_version == user.token_version + 1
+    assert (await crud.user.get(pg_db, model_id=user.id)).hashed_password == (
+        upserted.hashed_password
+    )
+
+
 async def test_authenticate_user(pg_db: Database) -> None:
     email = random_email()
     password = random_lower_string()
@@ -172,3 +204,185 @@ async def test_remove_user(pg_db: Database) -> None:
     non_existing_user = await crud.user.get_by_email(pg_db, email=email)
 
     assert non_existing_user is None
+
+
+async def test_update_user_without_changes(pg_db: Database) -> None:
+    user = await create_random_user(pg_db)
+
+    same_user = await crud.user.update(
+        pg_db, db_obj=user, obj_in=dict(first_name=user.first_name)
+    )
+    empty_update = await crud.user.update(pg_db, db_obj=user, obj_in=UserUpdate())
+
+    assert same_user is user
+    assert empty_update is user
+
+
+async def test_update_user_returns_updated_row(pg_db: Database) -> None:
+    user = await create_random_user(pg_db)
+    first_name = random_lower_string()
+
+    updated_user = await crud.user.update(
+        pg_db, db_obj=user, obj_in=UserUpdate(first_name=first_name)
+    )
+
+    assert updated_user.id == user.id
+    assert updated_user.first_name == first_name
+    assert updated_user.last_name == user.last_name
+
+
+async def test_create_many_users(pg_db: Database) -> None:
+    users_in = [
+        UserIn(email=random_email(), password=random_lower_string()) for _ in range(5)
+    ]
+
+    users = await crud.user.create_many(pg_db, objs_in=users_in, chunk_size=2)
+
+    assert [user.email for user in users] == [user_in.email for user_in in users_in]
+    assert verify_password(users_in[0].password, users[0].hashed_password)
+
+
+async def test_create_many_users_skips_conflicts(pg_db: Database) -> None:
+    existing_user = await create_random_user(pg_db)
+    email = random_email()
+    users_in = [
+        UserIn(email=email, password=random_lower_string()),
+        UserIn(email=existing_user.email, password=random_lower_string()),
+        UserIn(email=email, password=random_lower_string()),
+    ]
+
+    users = await crud.user.create_many(
+        pg_db, objs_in=users_in, conflict_columns=("email",)
+    )
+
+    assert users[0].email == email
+    assert users[1:] == [None, None]
+
+
+async def test_update_many_users(pg_db: Database) -> None:
+    user = await create_random_user(pg_db)
+    user_2 = await create_random_user(pg_db)
+    first_name = random_lower_string()
+    new_password = random_lower_string()
+
+    users = await crud.user.update_many(
+        pg_db,
+        objs_in=[
+            (user, UserUpdate(first_name=first_name)),
+            (user_2, UserUpdate(password=new_password, is_active=False)),
+        ],
+    )
+
+    assert [db_user.id for db_user in users] == [user.id, user_2.id]
+    assert users[0].first_name == first_name
+    assert users[1].is_active is False
+    assert verify_password(new_password, users[1].hashed_password)
+
+
+async def test_remove_many_users(pg_db: Database) -> None:
+    user = await create_random_user(pg_db)
+    user_2 = await create_random_user(pg_db)
+
+    removed = await crud.user.remove_many(pg_db, model_ids=[user.id, user_2.id])
+
+    assert {db_user.id for db_user in removed} == {user.id, user_2.id}
+    assert await crud.user.get(pg_db, model_id=user.id) is None
+
+
+async def test_cached_user_invalidated_on_update(pg_db: Database) -> None:
+    user = await create_random_user(pg_db)
+
+    cached_user = await crud.user.get(pg_db, model_id=user.id)
+    assert await crud.user.get(pg_db, model_id=user.id) is cached_user
+    assert await crud.user.get_by_email(pg_db, email=user.email) is cached_user
+
+    await crud.user.update(pg_db, db_obj=user, obj_in=dict(is_active=False))
+    updated_user = await crud.user.get(pg_db, model_id=user.id)
+
+    assert updated_user.is_active is False
+
+
+async def test_cached_user_email_change(pg_db: Database) -> None:
+    user = await create_random_user(pg_db)
+    await crud.user.get_by_email(pg_db, email=user.email)
+    new_email = random_email()
+
+    await crud.user.update(pg_db, db_obj=user, obj_in=dict(email=new_email))
+
+    assert await crud.user.get_by_email(pg_db, email=user.email) is None
+    assert (await crud.user.get_by_email(pg_db, email=new_email)).id == user.id
+
+
+async def test_cached_user_removed(pg_db: Database) -> None:
+    user = await create_random_user(pg_db)
+    await crud.user.get(pg_db, model_id=user.id)
+
+    await crud.user.remove(pg_db, model_id=user.id)
+
+    assert await crud.user.get(pg_db, model_id=user.id) is None
+    assert await crud.user.get_by_email(pg_db, email=user.email) is None
+
+
+async def test_concurrent_gets_share_one_query(pg_db: Database) -> None:
+    user = await create_random_user(pg_db)
+    shared = crud.user.flights.shared
+
+    users = await asyncio.gather(
+        *(crud.user.get(pg_db, model_id=user.id) for _ in range(5))
+    )
+
+    assert {db_user.email for db_user in users} == {user.email}
+    assert crud.user.flights.shared - shared == 4
+
+
+async def test_token_version_bumped_on_privilege_change(pg_db: Database) -> None:
+    user = await create_random_user(pg_db)
+    assert await crud.user.get_token_version(pg_db, model_id=user.id) == 0
+
+    user = await crud.user.update(pg_db, db_obj=user, obj_in=dict(first_name="x"))
+    assert user.token_version == 0
+
+    user = await crud.user.update(pg_db, db_obj=user, obj_in=dict(is_superuser=True))
+    assert user.token_version == 1
+    assert await crud.user.get_token_version(pg_db, model_id=user.id) == 1
+
+    user = await crud.user.update(pg_db, db_obj=user, obj_in=UserUpdate(password="x"))
+    assert user.token_version == 2
+
+
+async def test_authenticate_rehashes_outdated_password(pg_db: Database) -> None:
+    email = random_email()
+    password = random_lower_string()
+    user = await crud.user.create(pg_db, obj_in=UserIn(email=email, password=password))
+    user = await crud.user.update(
+        pg_db,
+        db_obj=user,
+        obj_in=dict(hashed_password=get_password_hash(password, rounds=10)),
+    )
+    rehashed = password_policy.rehashed
+
+    authenticated_user = await crud.user.authenticate(
+        pg_db, email=email, password=password
+    )
+
+    assert not password_policy.needs_rehash(authenticated_user.hashed_password)
+    assert verify_password(password, authenticated_user.hashed_password)
+    assert authenticated_user.token_version == user.token_version
+    assert password_policy.rehashed == rehashed + 1
+
+
+async def test_rehash_keeps_password_changed_meanwhile(pg_db: Database) -> None:
+    email = random_email()
+    password = random_lower_string()
+    stale_user = await crud.user.create(
+        pg_db, obj_in=UserIn(email=email, password=password)
+    )
+    new_password = random_lower_string()
+    await crud.user.update(pg_db, db_obj=stale_user, obj_in={"password": new_password})
+
+    user = await crud.user._rehash_password(pg_db, db_obj=stale_user, password=password)
+
+    assert user is stale_user
+    user = await crud.user.get_by_email(pg_db, email=email, cached=False)
+    assert verify_password(new_password, user.hashed_password)
+    assert not verify_password(password, user.hashed_password)
@@ -0,0 +1,159 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator
+
+import pytest
+import pytest_asyncio
+from databases import Database
+
+from app import crud
+from app.core.config import settings
+from app.db.database import DatabasePool, DatabaseSession, ReplicaRouter
+from tests.utils.user import create_random_user
+from tests.utils.utils import random_email
+
+pytestmark = pytest.mark.asyncio
+
+
+@pytest_asyncio.fixture
+async def pg_pool(pg_db: Database) -> AsyncIterator[DatabasePool]:
+    pool = DatabasePool(settings.TEST_POSTGRES_URL)
+    await pool.connect()
+    yield pool
+    await pool.disconnect()
+
+
+async def test_session_reads_from_replica(pg_pool: DatabasePool) -> None:
+    replica = DatabasePool(settings.TEST_POSTGRES_URL)
+    router = ReplicaRouter([replica])
+    await router.connect()
+    session = DatabaseSession(pg_pool, router)
+    try:
+        user = await create_random_user(pg_pool.database)
+        db_user = await session.fetch_one(
+            crud.user.model.select().where(crud.user.model.c.id == user.id)
+        )
+
+        assert db_user.email == user.email
+        assert not session.on_primary
+        assert replica.stats()["in_use"] == 1
+        assert pg_pool.stats()["in_use"] == 0
+    finally:
+        await session.close()
+        await router.disconnect()
+
+
+async def test_session_reads_own_writes_from_primary(pg_pool: DatabasePool) -> None:
+    replica = DatabasePool(settings.TEST_POSTGRES_URL)
+    router = ReplicaRouter([replica])
+    await router.connect()
+    session = DatabaseSession(pg_pool, router)
+    try:
+        user = await create_random_user(session)
+
+        assert session.on_primary
+        db_user = await crud.user.get(session, model_id=user.id)
+        assert db_user.email == user.email
+        assert replica.stats()["in_use"] == 0
+    finally:
+        await session.close()
+        await router.disconnect()
+
+
+async def test_session_batches_gets_by_id(pg_pool: DatabasePool) -> None:
+    router = ReplicaRouter([])
+    session = DatabaseSession(pg_pool, router)
+    try:
+        users = [await create_random_user(pg_pool.database) for _ in range(3)]
+        model_ids = [user.id for user in reversed(users)] + [0]
+
+        db_users = await asyncio.gather(
+            *(crud.user.get(session, model_id=model_id) for model_id in model_ids)
+        )
+
+        assert [db_user and db_user.id for db_user in db_users] == [
+            *model_ids[:3],
+            None,
+        ]
+        assert session.detached.loader(crud.user.model).stats()["batches"] == 1
+        # Read on connections of their own, already returned
+        assert pg_pool.stats()["in_use"] == 0
+    finally:
+        await session.close()
+
+
+async def test_router_skips_unhealthy_replica(pg_pool: DatabasePool) -> None:
+    replica = DatabasePool(settings.TEST_POSTGRES_URL)
+    router = ReplicaRouter([replica])
+    replica.healthy = False
+
+    assert router.choose() is None
+
+    session = DatabaseSession(pg_pool, router)
+    try:
+        assert await session.fetch_val("SELECT 1") == 1
+        assert pg_pool.stats()["in_use"] == 1
+    finally:
+        await session.close()
+
+
+class FakeConnection:
+    def __init__(self, pool: "FakePool") -> None:
+        self.pool = pool
+        self.released = False
+        self.released_mid_query = False
+
+    async def fetch_one(self, query: Any, values: dict | None = None) -> Any:
+        await self.pool.answer.wait()
+        self.released_mid_query = self.released
+        return dict(id=1, email=self.pool.email)
+
+
+class FakePool:
+    name = "fake"
+
+    def __init__(self, email: str) -> None:
+        self.email = email
+        self.answer = asyncio.Event()
+        self.connections: list[FakeConnection] = []
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[FakeConnection]:
+        connection = FakeConnection(self)
+        self.connections.append(connection)
+        try:
+            yield connection
+        finally:
+            connection.released = True
+
+
+async def test_shared_get_survives_cancelled_leader() -> None:
+    email = random_email()
+    pool = FakePool(email)
+    router = ReplicaRouter([])
+    leader_session = DatabaseSession(pool, router)
+    follower_session = DatabaseSession(pool, router)
+    shared = crud.user.flights.shared
+
+    def get(session: DatabaseSession) -> Any:
+        return crud.user.get_by(session, column="email", value=email, cached=False)
+
+    leader = asyncio.create_task(get(leader_session))
+    while not pool.connections:
+        await asyncio.sleep(0)
+    follower = asyncio.create_task(get(follower_session))
+    await asyncio.sleep(0)
+    leader.cancel()
+    await leader_session.close()
+    pool.answer.set()
+
+    db_user = await follower
+    await follower_session.close()
+
+    assert db_user["email"] == email
+    assert crud.user.flights.shared - shared == 1
+    [connection] = pool.connections
+    assert not connection.released_mid_query
+    assert connection.released
+    with pytest.raises(asyncio.CancelledError):
+        await leader
@@ -0,0 +1,73 @@
+import asyncio
+from typing import Any
+
+import pytest
+
+from app import models
+from app.db.loader import RowLoader
+
+pytestmark = pytest.mark.asyncio
+
+
+class RecordingDatabase:
+    def __init__(self, ids: set[int]) -> None:
+        self.ids = ids
+        self.queries: list[list[int]] = []
+
+    async def fetch_all(self, query: Any) -> list[dict[str, Any]]:
+        values = query.compile().params["values"]
+        self.queries.append(values)
+        return [dict(id=value) for value in values if value in self.ids]
+
+
+async def test_loads_batched_in_one_query() -> None:
+    db = RecordingDatabase({1, 2, 3})
+    loader = RowLoader(db, models.user)
+
+    rows = await asyncio.gather(*(loader.load(value) for value in (3, 1, 4, 1)))
+
+    assert [row and row["id"] for row in rows] == [3, 1, None, 1]
+    assert db.queries == [[3, 1, 4]]
+    assert loader.stats() == dict(loads=4, batches=1)
+
+
+async def test_load_many_in_order() -> None:
+    db = RecordingDatabase({1, 2})
+    loader = RowLoader(db, models.user)
+
+    rows = await loader.load_many([2, 5, 1])
+
+    assert rows == [dict(id=2), None, dict(id=1)]
+
+
+async def test_batches_split_by_size() -> None:
+    db = RecordingDatabase({1, 2, 3})
+    loader = RowLoader(db, models.user, max_batch_size=2)
+
+    await loader.load_many([1, 2, 3])
+
+    assert db.queries == [[1, 2], [3]]
+
+
+async def test_later_loads_in_new_batch() -> None:
+    db = RecordingDatabase({1, 2})
+    loader = RowLoader(db, models.user)
+
+    await loader.load(1)
+    await loader.load(2)
+
+    assert db.queries == [[1], [2]]
+
+
+async def test_error_raised_to_every_caller() -> None:
+    class FailingDatabase:
+        async def fetch_all(self, query: Any) -> None:
+            raise ConnectionResetError
+
+    loader = RowLoader(FailingDatabase(), models.user)
+
+    results = await asyncio.gather(
+        loader.load(1), loader.load(2), return_exceptions=True
+    )
+
+    assert all(isinstance(result, ConnectionResetError) for result in results)
@@ -6,6 +6,7 @@ from databases import Database
 from httpx import AsyncClient
 
 from app.core.config import settings
+from app.core.throttling import MemoryThrottleBackend, throttler
 from app.fastapi_app import app
 from tests.utils.user import authentication_token_from_email
 from tests.utils.utils import get_superuser_token_headers, random_email
@@ -13,8 +14,12 @@ from tests.utils.utils import get_superuser_token_headers, random_email
 
 @pytest_asyncio.fixture
 async def api_client() -> AsyncClient:
-    async with AsyncClient(app=app, base_url=settings.SERVER_HOST) as client:
-        yield client
+    await app.router.startup()
+    try:
+        async with AsyncClient(app=app, base_url=settings.SERVER_HOST) as client:
+            yield client
+    finally:
+        await app.router.shutdown()
 
 
 @pytest.fixture(autouse=True)
@@ -23,6 +28,14 @@ def reset_dependency_overrides() -> Generator:
     app.dependency_overrides = {}
 
 
+@pytest.fixture(autouse=True)
+def reset_throttling() -> Generator:
+    backend = throttler.backend
+    throttler.backend = MemoryThrottleBackend()
+    yield
+    throttler.backend = backend
+
+
 @pytest_asyncio.fixture
 async def superuser_token_headers(api_client: AsyncClient) -> dict[str, str]:
     return await get_superuser_token_headers(api_client)
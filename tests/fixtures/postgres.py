@@ -9,8 +9,10 @@ from sqlalchemy_utils import create_database, database_exists, drop_database
 
 from alembic import command
 from alembic.config import Config
+from app import crud
 from app.api.deps import get_db_pg
 from app.core.config import settings
+from app.crud.filter import ExistenceFilter
 from app.db.init_db import init_db
 from app.db.metadata import postgres_metadata
 from app.fastapi_app import app
@@ -67,3 +69,27 @@ def pg_db_override(pg_db: Generator) -> None:
 @pytest.fixture
 def use_postgres(pg_db_override: Generator) -> None:
     pass
+
+
+@pytest_asyncio.fixture
+async def email_filter(
+    pg_db: Database, monkeypatch: pytest.MonkeyPatch
+) -> ExistenceFilter:
+    """
+    A loaded email filter in place of the user CRUD's for the duration of a test.
+    """
+    emails = crud.user.emails
+    loaded = ExistenceFilter(
+        emails.table,
+        emails.column.name,
+        changed_column=emails.changed_column.name,
+        capacity=emails.capacity,
+        error_rate=emails.error_rate,
+        refresh_interval=emails.refresh_interval,
+        overlap=emails.overlap,
+        rebuild_interval=emails.rebuild_interval,
+        normalize=emails.normalize,
+    )
+    await loaded.load(pg_db)
+    monkeypatch.setattr(crud.user, "emails", loaded)
+    return loaded